@@ -1,20 +1,90 @@
-from django.contrib import admin
-from .models import Book, Review, UserInfo, UserProfile
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.db.models import Q
+from .admin_performance import LargeTableAdminMixin, StockLevelFilter, prefix_range
+from .models import Book, Review, StockAdjustment, UserInfo, UserProfile
+
+class StockActionForm(ActionForm):
+    stock_operation = forms.ChoiceField(
+        choices=[("set", "Set stock to"), ("delta", "Add to stock (negative removes)")],
+        required=False,
+    )
+    stock_amount = forms.IntegerField(required=False)
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("title", "author", "price", "copies_available")
-    list_filter = ("copies_available",)
+    list_filter = (StockLevelFilter,)
     search_fields = ("title", "author", "isbn")
     list_editable = ("price", "copies_available")
+    action_form = StockActionForm
+    actions = ["adjust_stock"]
+    
+    @admin.action(description="Adjust stock of selected books")
+    def adjust_stock(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        operation = form.cleaned_data["stock_operation"] if form.is_valid() else None
+        amount = form.cleaned_data["stock_amount"] if operation else None
+        if amount is None or (operation == "set" and amount < 0):
+            self.message_user(request, "Choose an operation and a valid amount.", messages.ERROR)
+            return
+        from .inventory import apply_stock_changes
+
+        # One set-based update per batch instead of a save() per book
+        result = apply_stock_changes(
+            [{"book": pk, operation: amount} for pk in queryset.values_list("pk", flat=True)],
+            source="admin",
+            user=request.user,
+        )
+        self.message_user(request, f"Updated stock for {result['updated']} books.", messages.SUCCESS)
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Imported here: catalog pulls in the search index, which the admin
+        # autodiscovery of every process (workers included) shouldn't pay for
+        from .catalog import find_by_isbn
+
+        # An ISBN is answered from the unique index instead of scanning with LIKE
+        isbn_matches = find_by_isbn(search_term.strip(), queryset)
+        if isbn_matches is not None and isbn_matches.exists():
+            return isbn_matches, False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_performance_search_results(self, request, queryset, search_term):
+        # Title/author prefixes, as typed or capitalised, through their indexes
+        condition = Q()
+        for term in {search_term, search_term.title()}:
+            condition |= Q(**prefix_range("title", term)) | Q(**prefix_range("author", term))
+        return queryset.filter(condition), False
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("book", "user", "rating", "created_at")
     list_filter = ("rating", "created_at")
+    list_select_related = ("book", "user")
     search_fields = ("book__title", "user__username", "comment")
     date_hierarchy = "created_at"
 
+    def get_performance_search_results(self, request, queryset, search_term):
+        # An exact username or a book title prefix, instead of LIKE over every comment
+        books = Book.objects.none()
+        for term in {search_term, search_term.title()}:
+            books |= Book.objects.filter(**prefix_range("title", term))
+        condition = Q(user__username=search_term) | Q(book__in=books.values("pk"))
+        return queryset.filter(condition), False
+
+@admin.register(StockAdjustment)
+class StockAdjustmentAdmin(admin.ModelAdmin):
+    list_display = ("book", "previous_count", "new_count", "source", "user", "created_at")
+    list_filter = ("source",)
+    list_select_related = ("book", "user")
+    search_fields = ("book__title",)
+    readonly_fields = [f.name for f in StockAdjustment._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(UserInfo)
 class UserInfoAdmin(admin.ModelAdmin):
     list_display = ("name", "email", "text")
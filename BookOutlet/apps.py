@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class BookOutletConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'BookOutlet'
\ No newline at end of file
+    name = 'BookOutlet'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,91 @@
+"""
+Order history archival.
+
+Delivered orders older than a cutoff are copied into ArchivedOrder /
+ArchivedOrderItem / ArchivedOrderEvent and deleted from the hot Order /
+OrderItem / OrderEvent tables, one batch per transaction so the tables are
+never locked for long. Deleting an Order cascades to its status history, so
+the events are copied first.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderEvent, ArchivedOrderItem, Order
+
+ARCHIVABLE_STATUSES = ('delivered',)
+
+
+def archive_cutoff(months):
+    return timezone.now() - timedelta(days=30 * months)
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+
+
+def archive_batch(order_ids):
+    """Move one batch of orders into the archive tables; returns the number moved"""
+    with transaction.atomic():
+        # Re-check inside the transaction in case an order changed since it was selected
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status__in=ARCHIVABLE_STATUSES)
+            .prefetch_related('items__book', 'events')
+        )
+        if not orders:
+            return 0
+
+        archived = ArchivedOrder.objects.bulk_create([
+            ArchivedOrder(
+                original_id=order.id,
+                user_id=order.user_id,
+                order_number=order.order_number,
+                total_amount=order.total_amount,
+                status=order.status,
+                created_at=order.created_at,
+                shipping_address=order.shipping_address,
+                payment_status=order.payment_status,
+            )
+            for order in orders
+        ])
+
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                order=archived_order,
+                book_id=item.book_id,
+                book_title=item.book.title,
+                quantity=item.quantity,
+                price=item.price,
+            )
+            for order, archived_order in zip(orders, archived)
+            for item in order.items.all()
+        ])
+
+        ArchivedOrderEvent.objects.bulk_create([
+            ArchivedOrderEvent(
+                order=archived_order,
+                from_status=event.from_status,
+                to_status=event.to_status,
+                idempotency_key=event.idempotency_key,
+                created_at=event.created_at,
+            )
+            for order, archived_order in zip(orders, archived)
+            for event in order.events.all()
+        ])
+
+        Order.objects.filter(id__in=[order.id for order in orders]).delete()
+        return len(orders)
+
+
+def archive_orders(cutoff, batch_size=500):
+    """Archive every eligible order created before ``cutoff``; returns the total moved"""
+    total = 0
+    while True:
+        ids = list(
+            archivable_orders(cutoff).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += archive_batch(ids)
@@ -0,0 +1,117 @@
+"""
+Async versions of the read-heavy catalog views.
+
+Under ASGI a sync view is run in a worker thread via sync_to_async; these use
+Django's async ORM instead and issue independent queries concurrently. They
+are wired up in urls.py when ``settings.ASYNC_CATALOG_VIEWS`` is on (the ASGI
+entry point turns it on by default).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+
+from .catalog import (
+    STORE_STATS_CACHE_KEY, book_page_queryset, genre_choices, parse_book_cursor, search_books,
+    split_book_page, store_stats,
+)
+from .models import Book, BookRecommendation, Review
+from .reviews import review_page, parse_review_sort
+from .throttling import throttle
+
+# Template rendering runs context processors that still use the sync ORM
+arender = sync_to_async(render)
+
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def _none():
+    return None
+
+
+async def _book_list_page(request):
+    rows = await _alist(book_page_queryset(parse_book_cursor(request.GET.get('after'))))
+    books, next_cursor = split_book_page(rows)
+    return {"books": books, "next_cursor": next_cursor}
+
+
+async def book_list_template(request):
+    context, stats = await asyncio.gather(_book_list_page(request), sync_to_async(store_stats)())
+    context["total_books"] = stats['total_books']
+    return await arender(request, "book_outlet/book_list.html", context)
+
+
+async def book_list_page(request):
+    """The next page of book cards as an HTML fragment, fetched while scrolling"""
+    return await arender(request, "book_outlet/includes/book_list_page.html", await _book_list_page(request))
+
+
+async def book_detail(request, pk):
+    user = await request.auser()
+
+    user_review = _none()
+    if user.is_authenticated:
+        user_review = Review.objects.filter(book_id=pk, user=user).afirst()
+
+    review_sort = parse_review_sort(request.GET.get('reviews_sort'))
+    book, reviews, user_review, recommendations = await asyncio.gather(
+        Book.objects.filter(pk=pk).afirst(),
+        # The first page usually comes from the cache
+        sync_to_async(review_page)(pk, review_sort, request.GET.get('reviews_page')),
+        user_review,
+        _alist(BookRecommendation.objects.filter(book_id=pk).select_related('recommended')),
+    )
+    if book is None:
+        raise Http404("No Book matches the given query.")
+
+    return await arender(request, "book_outlet/book_details.html", {
+        "book": book,
+        "reviews": reviews,
+        "review_sort": review_sort,
+        "user_review": user_review,
+        "recommendations": recommendations
+    })
+
+
+@throttle('search')
+async def book_search_view(request):
+    # search_books may check for exact matches before falling back to fuzzy search
+    books, current_filters = await sync_to_async(search_books)(request.GET)
+
+    books, genres = await asyncio.gather(
+        _alist(books.select_related('created_by')),
+        _alist(genre_choices()),
+    )
+
+    return await arender(request, 'book_outlet/book_search.html', {
+        'books': books,
+        'genres': genres,
+        'search_query': request.GET.get('q', ''),
+        'current_filters': current_filters,
+    })
+
+
+@throttle('api')
+async def books_api_json(request):
+    """Simple JSON API for React components"""
+    books = await _alist(Book.objects.all().values('id', 'title', 'author', 'genre', 'price', 'rating'))
+    return JsonResponse(books, safe=False)
+
+
+async def book_stats_api(request):
+    """API endpoint for book statistics"""
+    stats = await cache.aget(STORE_STATS_CACHE_KEY)
+    if stats is None:
+        # The same computation and cache entry as the sync pages
+        stats = await sync_to_async(store_stats)()
+
+    return JsonResponse({
+        'total_books': stats['total_books'],
+        'total_reviews': stats['total_reviews'],
+        'average_rating': stats['average_rating'],
+        'featured_books': stats['featured_books'],
+    })
@@ -0,0 +1,189 @@
+"""
+Catalog queries shared by the sync views in views.py and their async
+counterparts in async_views.py.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db.models import Avg, Case, Q, When
+
+from . import search_index
+from .isbn import looks_like_isbn
+from .models import Book, Review
+
+STORE_STATS_CACHE_KEY = 'store_stats'
+
+SORT_ORDERS = {
+    'price_low': 'price',
+    'price_high': '-price',
+    'rating': '-rating',
+    'title': 'title',
+    'newest': '-created_at',
+}
+
+
+# Near matches considered when a search falls back to typo-tolerant mode
+FUZZY_RESULTS = 50
+
+
+def find_by_isbn(query, books=None):
+    """
+    If ``query`` is an ISBN, the books with exactly that ISBN (a unique
+    index lookup); otherwise None.
+    """
+    isbn = looks_like_isbn(query)
+    if isbn is None:
+        return None
+    if books is None:
+        books = Book.objects.all()
+    return books.filter(isbn=isbn)
+
+
+def search_books(params):
+    """
+    Build the filtered/sorted book queryset for the advanced search page.
+
+    A query that is a known ISBN goes straight to that book. When
+    ``fuzzy=1`` is passed, or the text search finds nothing, the query
+    is matched typo-tolerantly against the in-memory trigram index and the
+    results are ordered by similarity unless a sort order was chosen.
+
+    Returns ``(queryset, current_filters)``. The queryset is not evaluated,
+    but choosing between the ISBN, text and fuzzy paths runs EXISTS queries.
+    """
+    books = Book.objects.all()
+
+    search_query = params.get('q', '')
+    genre_filter = params.get('genre', '')
+    min_price = params.get('min_price', '')
+    max_price = params.get('max_price', '')
+    min_rating = params.get('min_rating', '')
+    # The default: close matches by similarity, anything else newest first
+    sort_by = params.get('sort_by') or 'relevance'
+
+    if genre_filter:
+        books = books.filter(genre__iexact=genre_filter)
+
+    for value, lookup in ((min_price, 'price__gte'), (max_price, 'price__lte'), (min_rating, 'rating__gte')):
+        if value:
+            try:
+                books = books.filter(**{lookup: float(value)})
+            except ValueError:
+                pass
+
+    fuzzy = False
+    isbn_matches = find_by_isbn(search_query, books) if search_query else None
+    if isbn_matches is not None and isbn_matches.exists():
+        books = isbn_matches
+    elif search_query:
+        fuzzy = params.get('fuzzy') == '1'
+        if not fuzzy:
+            matches = books.filter(
+                Q(title__icontains=search_query) |
+                Q(author__icontains=search_query)
+            )
+            fuzzy = not matches.exists()
+            books = matches if not fuzzy else books
+
+    if fuzzy:
+        ranked = [book_id for book_id, _ in search_index.fuzzy_search(search_query, FUZZY_RESULTS)]
+        if not ranked:
+            books = books.none()
+        elif sort_by in SORT_ORDERS:
+            books = books.filter(pk__in=ranked).order_by(SORT_ORDERS[sort_by])
+        else:
+            relevance = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ranked)])
+            books = books.filter(pk__in=ranked).order_by(relevance)
+    else:
+        books = books.order_by(SORT_ORDERS.get(sort_by, '-created_at'))
+
+    current_filters = {
+        'genre': genre_filter,
+        'min_price': min_price,
+        'max_price': max_price,
+        'min_rating': min_rating,
+        'sort_by': sort_by,
+        'fuzzy': fuzzy,
+    }
+    return books, current_filters
+
+
+def filter_api_books(params):
+    """
+    Book queryset for the API list. ``isbn`` is an exact lookup; ``q`` tries
+    the ISBN index before searching titles and authors. Raises ValueError
+    for an ``isbn`` that is not a valid ISBN.
+    """
+    books = Book.objects.all().order_by('-id')
+
+    if params.get('isbn'):
+        isbn = looks_like_isbn(params['isbn'])
+        if isbn is None:
+            raise ValueError('Enter a valid ISBN-10 or ISBN-13.')
+        return books.filter(isbn=isbn)
+
+    query = params.get('q', '')
+    if query:
+        isbn_matches = find_by_isbn(query, books)
+        if isbn_matches is not None and isbn_matches.exists():
+            return isbn_matches
+        books = books.filter(Q(title__icontains=query) | Q(author__icontains=query))
+    return books
+
+
+def genre_choices():
+    """Distinct non-empty genres for the search filter dropdown"""
+    return Book.objects.exclude(genre__isnull=True).exclude(genre='').values_list('genre', flat=True).distinct()
+
+
+def compute_store_stats():
+    return {
+        'total_books': Book.objects.count(),
+        'total_reviews': Review.objects.count(),
+        'total_users': User.objects.count(),
+        'average_rating': Book.objects.exclude(rating__isnull=True).aggregate(Avg('rating'))['rating__avg'] or 0,
+        'featured_books': Book.objects.filter(is_featured=True).count(),
+    }
+
+
+def store_stats():
+    """
+    Catalog-wide counts, cached. The refresh_store_stats task rebuilds the
+    cache entry whenever books, reviews or users are added or removed.
+    """
+    return cache.get_or_set(STORE_STATS_CACHE_KEY, compute_store_stats, settings.STORE_STATS_CACHE_TTL)
+
+
+def parse_book_cursor(value):
+    """The ``after`` cursor of a book list page, or None for the first page"""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise BadRequest('Invalid cursor.')
+
+
+def book_page_queryset(after=None):
+    """
+    One page of the book list, newest first, plus one extra row that tells
+    whether another page follows.
+
+    Pages are keyed on the primary key: ``after`` is the id of the last book
+    already shown, so every page is a short index range scan however far the
+    reader scrolls (an OFFSET would read and discard every earlier row), and
+    books added meanwhile never shift or repeat cards.
+    """
+    books = Book.objects.order_by('-id')
+    if after is not None:
+        books = books.filter(id__lt=after)
+    return books[:settings.BOOK_LIST_PAGE_SIZE + 1]
+
+
+def split_book_page(rows):
+    """``(books, next_cursor)`` from the rows of book_page_queryset()"""
+    size = settings.BOOK_LIST_PAGE_SIZE
+    if len(rows) > size:
+        return rows[:size], rows[size - 1].id
+    return rows, None
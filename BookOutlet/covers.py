@@ -0,0 +1,130 @@
+"""
+Cover image variants.
+
+The originals in ``book_covers/`` are full-size scans (70-320 KB each). This
+module resizes them into a few thumbnail widths, re-encodes them as AVIF/WebP
+(plus a JPEG fallback) and writes them under ``COVER_VARIANTS_DIR`` with the
+source's content hash in the filename, so they can be cached forever.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+COVER_WIDTHS = (160, 320, 480)
+
+# Preferred order: smallest files first, JPEG always last as the <img> fallback
+COVER_FORMATS = {
+    'avif': {'mime': 'image/avif', 'pil_format': 'AVIF', 'options': {'quality': 50}},
+    'webp': {'mime': 'image/webp', 'pil_format': 'WEBP', 'options': {'quality': 75, 'method': 4}},
+    'jpg': {'mime': 'image/jpeg', 'pil_format': 'JPEG', 'options': {'quality': 80, 'optimize': True, 'progressive': True}},
+}
+
+
+def available_formats():
+    """Return the output formats this Pillow build can encode"""
+    from PIL import features
+
+    formats = []
+    for ext in COVER_FORMATS:
+        if ext == 'jpg':
+            formats.append(ext)
+            continue
+        try:
+            if features.check(ext):
+                formats.append(ext)
+        except ValueError:
+            # Older Pillow releases don't know about the feature at all
+            pass
+    return formats
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def variant_filename(source, digest, width, ext):
+    stem = os.path.splitext(source)[0]
+    return f'{stem}.{digest}.{width}.{ext}'
+
+
+def generate_cover_variants(source, formats=None, source_dir=None, target_dir=None):
+    """
+    Build every width/format variant for one cover file.
+
+    Returns the metadata stored on ``Book.cover_variants``, or an empty dict
+    when the source file doesn't exist. The directories can be passed in so
+    pool workers don't need configured settings.
+    """
+    from PIL import Image
+
+    source_dir = source_dir or settings.COVER_SOURCE_DIR
+    target_dir = target_dir or settings.COVER_VARIANTS_DIR
+    source_path = os.path.join(source_dir, source)
+    if not os.path.exists(source_path):
+        return {}
+
+    digest = content_hash(source_path)
+    formats = formats or available_formats()
+    os.makedirs(target_dir, exist_ok=True)
+
+    with Image.open(source_path) as image:
+        image = image.convert('RGB')
+        # Never upscale: widths wider than the original are skipped
+        widths = [w for w in COVER_WIDTHS if w < image.width] or [image.width]
+
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for ext in formats:
+                target = os.path.join(
+                    target_dir,
+                    variant_filename(source, digest, width, ext),
+                )
+                if os.path.exists(target):
+                    # Content-hashed names mean an existing file is already correct
+                    continue
+                spec = COVER_FORMATS[ext]
+                resized.save(target, spec['pil_format'], **spec['options'])
+
+    return {
+        'source': source,
+        'hash': digest,
+        'widths': widths,
+        'formats': formats,
+    }
+
+
+def build_cover_variants(sources, workers=None):
+    """Generate variants for many covers in a process pool"""
+    sources = sorted(set(sources))
+    if len(sources) <= 1 or workers == 1:
+        return {source: generate_cover_variants(source) for source in sources}
+
+    formats = available_formats()
+    count = len(sources)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            generate_cover_variants,
+            sources,
+            [formats] * count,
+            [str(settings.COVER_SOURCE_DIR)] * count,
+            [str(settings.COVER_VARIANTS_DIR)] * count,
+        )
+        return dict(zip(sources, results))
+
+
+def variant_url(variants, width, ext):
+    filename = variant_filename(variants['source'], variants['hash'], width, ext)
+    return f'{settings.COVER_VARIANTS_URL}{filename}'
+
+
+def srcset(variants, ext):
+    return ', '.join(
+        f'{variant_url(variants, width, ext)} {width}w' for width in variants['widths']
+    )
@@ -0,0 +1,173 @@
+"""
+Personalised home page feeds.
+
+``refresh_home_feeds()`` ranks books for a batch of users from their
+favourite genres, the genres and co-purchase neighbours (see
+recommendations.py) of books they bought or rated highly, and overall
+rating. It stores each user's list of book ids in the cache under
+``home_feed:<user id>`` for ``HOME_FEED_CACHE_TTL`` seconds. The ranking
+queries are shared by the whole batch; home_view does a cache get and loads
+the few books by primary key, so prices and stock are always current.
+
+Feeds are rebuilt by the build_home_feeds command and, for one user at a
+time, by the build_home_feed task when their history changes or their
+entry is missing. A missing entry queues at most one build per
+``FEED_BUILD_PENDING_TTL`` seconds, so page views don't write to the task
+table while the build waits for a worker.
+"""
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import Lower, RowNumber
+
+from .models import Book, BookRecommendation, OrderItem, Review, UserProfile
+from .tasks import enqueue
+
+# Candidates considered per preferred genre
+GENRE_CANDIDATES = 50
+
+FAVORITE_GENRE_WEIGHT = 3.0
+HISTORY_GENRE_WEIGHT = 2.0
+NEIGHBOUR_WEIGHT = 2.0
+RATING_WEIGHT = 1.0
+
+# Seconds a missing feed waits for its queued build before another is queued
+FEED_BUILD_PENDING_TTL = 5 * 60
+
+
+def feed_cache_key(user_id):
+    return f'home_feed:{user_id}'
+
+
+def feed_pending_key(user_id):
+    return f'home_feed_pending:{user_id}'
+
+
+def get_home_feed(user_id):
+    """The cached feed for a user as a list of Books, or None if it has not been built"""
+    book_ids = cache.get(feed_cache_key(user_id))
+    if book_ids is None:
+        return None
+    books = Book.objects.in_bulk(book_ids)
+    return [books[book_id] for book_id in book_ids if book_id in books]
+
+
+def request_home_feed(user_id):
+    """Queue a build of a user's missing feed unless one is already pending"""
+    if cache.add(feed_pending_key(user_id), True, FEED_BUILD_PENDING_TTL):
+        enqueue('build_home_feed', user_id=user_id)
+
+
+def parse_genres(favorite_genres):
+    return {genre.strip().lower() for genre in favorite_genres.split(',') if genre.strip()}
+
+
+def _user_histories(user_ids):
+    """Books each user bought or rated at least RECOMMENDATION_MIN_RATING, and everything they reviewed"""
+    liked = defaultdict(set)
+    seen = defaultdict(set)
+    purchases = OrderItem.objects.filter(order__user__in=user_ids).values_list('order__user', 'book')
+    for user_id, book_id in purchases:
+        liked[user_id].add(book_id)
+        seen[user_id].add(book_id)
+    for user_id, book_id, rating in Review.objects.filter(user__in=user_ids).values_list('user', 'book', 'rating'):
+        seen[user_id].add(book_id)
+        if rating >= settings.RECOMMENDATION_MIN_RATING:
+            liked[user_id].add(book_id)
+    return liked, seen
+
+
+def _top_books_by_genre(genres):
+    if not genres:
+        return {}
+    ranked = (
+        Book.objects.annotate(genre_key=Lower('genre'))
+        .filter(genre_key__in=genres)
+        .annotate(position=Window(
+            RowNumber(),
+            partition_by=[F('genre_key')],
+            order_by=[F('rating').desc(nulls_last=True), F('id').desc()],
+        ))
+        .filter(position__lte=GENRE_CANDIDATES)
+        .values_list('genre_key', 'id')
+    )
+    by_genre = defaultdict(list)
+    for genre, book_id in ranked:
+        by_genre[genre].append(book_id)
+    return by_genre
+
+
+def rank_feeds(user_ids, size=None):
+    """Return ``{user_id: [Book, ...]}`` for a batch of users"""
+    size = size or settings.HOME_FEED_SIZE
+    favorites = {
+        user_id: parse_genres(genres)
+        for user_id, genres in UserProfile.objects.filter(user__in=user_ids).values_list('user', 'favorite_genres')
+    }
+    liked, seen = _user_histories(user_ids)
+
+    liked_books = set().union(*liked.values())
+    liked_genres = {
+        book_id: (genre or '').lower()
+        for book_id, genre in Book.objects.filter(pk__in=liked_books).values_list('id', 'genre')
+    }
+    neighbours = defaultdict(list)
+    for book_id, recommended_id, score in BookRecommendation.objects.filter(
+        book__in=liked_books
+    ).values_list('book', 'recommended', 'score'):
+        neighbours[book_id].append((recommended_id, score))
+
+    history_genres = {
+        user_id: Counter(liked_genres[book_id] for book_id in books if liked_genres.get(book_id))
+        for user_id, books in liked.items()
+    }
+    wanted_genres = set().union(*favorites.values(), *(set(c) for c in history_genres.values()))
+    genre_books = _top_books_by_genre(wanted_genres)
+
+    scores = {}
+    for user_id in user_ids:
+        user_scores = defaultdict(float)
+        for genre in favorites.get(user_id, ()):
+            for book_id in genre_books.get(genre, ()):
+                user_scores[book_id] += FAVORITE_GENRE_WEIGHT
+        genre_counts = history_genres.get(user_id, Counter())
+        total = sum(genre_counts.values())
+        for genre, count in genre_counts.items():
+            for book_id in genre_books.get(genre, ()):
+                user_scores[book_id] += HISTORY_GENRE_WEIGHT * count / total
+        for book_id in liked.get(user_id, ()):
+            for recommended_id, score in neighbours.get(book_id, ()):
+                user_scores[recommended_id] += NEIGHBOUR_WEIGHT * score
+        for book_id in seen.get(user_id, ()):
+            user_scores.pop(book_id, None)
+        scores[user_id] = user_scores
+
+    candidates = set().union(*(s.keys() for s in scores.values()))
+    books = Book.objects.in_bulk(candidates)
+    # Users without any signal (or too few candidates) get the newest books
+    fallback = list(Book.objects.order_by('-id')[:size + 20])
+
+    feeds = {}
+    for user_id, user_scores in scores.items():
+        for book_id in user_scores:
+            if book_id in books:
+                user_scores[book_id] += RATING_WEIGHT * (books[book_id].rating or 0) / 5
+        ranked = sorted(user_scores, key=lambda book_id: (-user_scores[book_id], -book_id))
+        feed = [books[book_id] for book_id in ranked if book_id in books][:size]
+        chosen = {book.pk for book in feed} | seen.get(user_id, set())
+        feed += [book for book in fallback if book.pk not in chosen][:size - len(feed)]
+        feeds[user_id] = feed
+    return feeds
+
+
+def refresh_home_feeds(user_ids):
+    """Rank and cache feeds for the given users"""
+    feeds = rank_feeds(list(user_ids))
+    cache.set_many(
+        {feed_cache_key(user_id): [book.pk for book in feed] for user_id, feed in feeds.items()},
+        settings.HOME_FEED_CACHE_TTL,
+    )
+    cache.delete_many([feed_pending_key(user_id) for user_id in feeds])
+    return len(feeds)
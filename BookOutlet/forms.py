@@ -2,6 +2,17 @@ from django import forms
 from .models import Book, UserInfo, Review
 
 class BookForm(forms.ModelForm):
+    # Longer than the stored 13 digits so hyphenated ISBNs can be typed in;
+    # Book normalises them
+    isbn = forms.CharField(
+        required=False,
+        max_length=17,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Optional ISBN'
+        })
+    )
+    
     class Meta:
         model = Book
         fields = ['title', 'author', 'price', 'copies_available', 'isbn']
@@ -26,10 +37,6 @@ class BookForm(forms.ModelForm):
                 'placeholder': '1',
                 'min': '0'
             }),
-            'isbn': forms.TextInput(attrs={
-                'class': 'form-control',
-                'placeholder': 'Optional ISBN'
-            }),
         }
         error_messages = {
             'title': {
@@ -0,0 +1,120 @@
+"""
+Bulk stock adjustments.
+
+Warehouse syncs and staff change stock for thousands of books at once.
+Going through ``Book.save()`` would run ``full_clean()`` and one UPDATE per
+book, so ``apply_stock_changes`` instead works in batches: it reads the
+batch's current stock and versions with one locking SELECT, computes the new
+counts and versions in Python, and then runs two set-based statements over a
+``VALUES`` list of (book, new count, new version): an INSERT ... SELECT that
+records a StockAdjustment per changed book, and an UPDATE ... FROM that
+writes the counts and versions. (Django's ``Case``/``When`` builds the same
+UPDATE but spends seconds compiling thousands of expressions.)
+
+A change may carry the ``version`` (Book.stock_version) the client last saw;
+if the book has changed since, that change is skipped and reported as a
+conflict so the client can re-read and retry it. Every stock change, bulk or
+per-book, bumps the version, including each of several changes to one book
+in the same request: a later one must carry the version the earlier one
+produced.
+"""
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Book, StockAdjustment
+
+# Books per transaction; keeps every UPDATE well inside SQLite's parameter limit
+BATCH_SIZE = 1000
+
+BOOKS = Book._meta.db_table
+ADJUSTMENTS = StockAdjustment._meta.db_table
+
+INSERT_ADJUSTMENTS = f'''
+    WITH new_stock (id, copies, version) AS (VALUES {{values}})
+    INSERT INTO {ADJUSTMENTS}
+        (book_id, previous_count, new_count, source, reason, batch, user_id, created_at)
+    SELECT {BOOKS}.id, {BOOKS}.copies_available, new_stock.copies, %s, %s, %s, %s, %s
+    FROM new_stock JOIN {BOOKS} ON {BOOKS}.id = new_stock.id
+'''
+
+# UPDATE ... FROM needs SQLite >= 3.33 (or PostgreSQL)
+UPDATE_STOCK = f'''
+    WITH new_stock (id, copies, version) AS (VALUES {{values}})
+    UPDATE {BOOKS}
+    SET copies_available = new_stock.copies, stock_version = new_stock.version
+    FROM new_stock
+    WHERE {BOOKS}.id = new_stock.id
+'''
+
+
+def _db_value(field, value):
+    return StockAdjustment._meta.get_field(field).get_db_prep_value(value, connection)
+
+
+def apply_stock_changes(changes, source, user=None, reason=''):
+    """
+    Apply ``changes``, a list of ``{'book': id, 'set': count}`` or
+    ``{'book': id, 'delta': n}`` dicts with an optional ``'version'``.
+
+    Deltas never take stock below zero. Changes to the same book apply in
+    order. Each batch commits on its own, so a failure part way leaves the
+    earlier batches applied. Returns a summary with the audit batch id.
+    """
+    result = {
+        'batch': uuid.uuid4(),
+        'updated': 0,
+        'unchanged': 0,
+        'conflicts': [],
+        'missing': [],
+    }
+    changes = list(changes)
+    for start in range(0, len(changes), BATCH_SIZE):
+        _apply_batch(changes[start:start + BATCH_SIZE], source, user, reason, result)
+    return result
+
+
+def _apply_batch(changes, source, user, reason, result):
+    with transaction.atomic():
+        current = {
+            pk: (copies, version)
+            for pk, copies, version in Book.objects.select_for_update()
+            .filter(pk__in={change['book'] for change in changes})
+            .values_list('pk', 'copies_available', 'stock_version')
+        }
+
+        # Each book's running (count, version) as the batch's changes apply in order
+        stock = {}
+        for change in changes:
+            book_id = change['book']
+            if book_id not in current:
+                result['missing'].append(book_id)
+                continue
+            copies, version = stock.get(book_id, current[book_id])
+            expected = change.get('version')
+            if expected is not None and expected != version:
+                result['conflicts'].append({'book': book_id, 'version': version})
+                continue
+            count = change['set'] if 'set' in change else max(0, copies + change['delta'])
+            stock[book_id] = (count, version + 1 if count != copies else version)
+
+        changed = {book_id: new for book_id, new in stock.items() if new[0] != current[book_id][0]}
+        result['unchanged'] += len(stock) - len(changed)
+        if not changed:
+            return
+
+        values = ', '.join(['(%s, %s, %s)'] * len(changed))
+        params = [value for book_id, (count, version) in changed.items() for value in (book_id, count, version)]
+        audit = [
+            source,
+            reason,
+            _db_value('batch', result['batch']),
+            user.pk if user is not None else None,
+            _db_value('created_at', timezone.now()),
+        ]
+        with connection.cursor() as cursor:
+            # Audit first, while the table still holds the previous counts
+            cursor.execute(INSERT_ADJUSTMENTS.format(values=values), params + audit)
+            cursor.execute(UPDATE_STOCK.format(values=values), params)
+        result['updated'] += len(changed)
@@ -0,0 +1,174 @@
+"""
+Inventory analytics.
+
+InventoryReport holds, per book: copies in stock, units sold over the last
+``INVENTORY_SALES_WINDOW_DAYS`` (confirmed, shipped and delivered orders),
+average daily sales, sell-through rate (sold / (sold + in stock)), days of
+stock remaining at the current sales rate, a low-stock flag and the book's
+rank among selling books.
+
+``refresh_inventory_report`` recomputes rows with set-based SQL: one
+INSERT ... SELECT ... ON CONFLICT statement aggregates the order lines of
+the books that need it, and a RANK() window re-ranks the sellers. Only books
+whose figures can have moved since the last run are recomputed:
+
+* books without a row yet, or whose stock_version changed;
+* books in orders placed or edited since the last run: saving an order or
+  changing its status clears ``Order.inventory_run``, and each run first
+  claims the cleared orders by writing its own number there with one
+  UPDATE, so an order committed while a run is going is left for the next
+  one instead of being skipped;
+* books in orders that have left the sales window since the last run (a
+  JobCheckpoint holds its time).
+
+The summary numbers for the dashboard are cached after each refresh, so
+reading the report never aggregates the whole table.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import Book, InventoryReport, JobCheckpoint, Order, OrderItem
+from .sales_rollups import SOLD_STATUSES
+
+CHECKPOINT = 'inventory_report'
+SUMMARY_CACHE_KEY = 'inventory_report:summary'
+
+BOOKS = Book._meta.db_table
+REPORT = InventoryReport._meta.db_table
+ORDERS = Order._meta.db_table
+ITEMS = OrderItem._meta.db_table
+
+CLAIM_CHANGED_ORDERS = f'UPDATE {ORDERS} SET inventory_run = %(run)s WHERE inventory_run IS NULL'
+
+REFRESH_ROWS = f'''
+    WITH dirty (book_id) AS (
+        SELECT b.id FROM {BOOKS} b LEFT JOIN {REPORT} r ON r.book_id = b.id
+        {{stock_filter}}
+        UNION
+        SELECT i.book_id FROM {ITEMS} i JOIN {ORDERS} o ON o.id = i.order_id
+        WHERE o.inventory_run = %(run)s
+           OR (o.created_at >= %(aged_since)s AND o.created_at < %(window_start)s)
+    ),
+    sales (book_id, units) AS (
+        SELECT i.book_id, SUM(i.quantity) FROM {ITEMS} i JOIN {ORDERS} o ON o.id = i.order_id
+        WHERE o.status IN ({", ".join(f"'{status}'" for status in SOLD_STATUSES)})
+          AND o.created_at >= %(window_start)s
+          AND i.book_id IN (SELECT book_id FROM dirty)
+        GROUP BY i.book_id
+    )
+    INSERT INTO {REPORT} (book_id, copies_available, stock_version, units_sold, daily_sales,
+                          sell_through_rate, days_of_stock, is_low_stock, refreshed_at)
+    SELECT b.id, b.copies_available, b.stock_version, COALESCE(s.units, 0),
+           COALESCE(s.units, 0) * 1.0 / %(window_days)s,
+           CASE WHEN COALESCE(s.units, 0) + b.copies_available > 0
+                THEN COALESCE(s.units, 0) * 1.0 / (COALESCE(s.units, 0) + b.copies_available)
+                ELSE 0 END,
+           CASE WHEN s.units > 0 THEN b.copies_available * 1.0 * %(window_days)s / s.units END,
+           CASE WHEN b.copies_available <= %(low_copies)s
+                  OR (COALESCE(s.units, 0) > 0
+                      AND b.copies_available * 1.0 * %(window_days)s / s.units <= %(low_days)s)
+                THEN TRUE ELSE FALSE END,
+           %(now)s
+    FROM {BOOKS} b JOIN dirty d ON d.book_id = b.id LEFT JOIN sales s ON s.book_id = b.id
+    WHERE TRUE
+    ON CONFLICT (book_id) DO UPDATE SET
+        copies_available = excluded.copies_available,
+        stock_version = excluded.stock_version,
+        units_sold = excluded.units_sold,
+        daily_sales = excluded.daily_sales,
+        sell_through_rate = excluded.sell_through_rate,
+        days_of_stock = excluded.days_of_stock,
+        is_low_stock = excluded.is_low_stock,
+        refreshed_at = excluded.refreshed_at
+'''
+
+# Only selling books are ranked, so this touches a small part of the table
+RANK_SELLERS = f'''
+    UPDATE {REPORT} SET sales_rank = ranked.position
+    FROM (
+        SELECT book_id, RANK() OVER (ORDER BY units_sold DESC) AS position
+        FROM {REPORT} WHERE units_sold > 0
+    ) ranked
+    WHERE {REPORT}.book_id = ranked.book_id
+'''
+
+
+def refresh_inventory_report(full=False):
+    """Recompute the rows that may have changed (all of them with ``full``); returns the row count"""
+    now = timezone.now()
+    window = timedelta(days=settings.INVENTORY_SALES_WINDOW_DAYS)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        checkpoint, _ = JobCheckpoint.objects.select_for_update().get_or_create(name=CHECKPOINT)
+        since = datetime.fromtimestamp(0 if full else checkpoint.position, tz=dt_timezone.utc)
+        stock_filter = '' if full else 'WHERE r.book_id IS NULL OR r.stock_version <> b.stock_version'
+        params = {
+            # Unique per run: runs are serialised by the checkpoint row lock
+            'run': int(now.timestamp() * 1_000_000),
+            'aged_since': _db_datetime(since - window),
+            'window_start': _db_datetime(now - window),
+            'window_days': settings.INVENTORY_SALES_WINDOW_DAYS,
+            'low_copies': settings.LOW_STOCK_COPIES,
+            'low_days': settings.LOW_STOCK_DAYS,
+            'now': _db_datetime(now),
+        }
+        cursor.execute(CLAIM_CHANGED_ORDERS, params)
+        cursor.execute(REFRESH_ROWS.format(stock_filter=stock_filter), params)
+        # rowcount isn't reported for statements starting with WITH on SQLite
+        rows = InventoryReport.objects.filter(refreshed_at=now).count()
+
+        InventoryReport.objects.filter(units_sold=0, sales_rank__isnull=False).update(sales_rank=None)
+        cursor.execute(RANK_SELLERS)
+
+        checkpoint.position = int(now.timestamp())
+        checkpoint.save(update_fields=['position', 'updated_at'])
+
+    summary = compute_summary()
+    summary['refreshed_at'] = now
+    cache.set(SUMMARY_CACHE_KEY, summary, None)
+    return rows
+
+
+def _db_datetime(value):
+    return connection.ops.adapt_datetimefield_value(value)
+
+
+def compute_summary():
+    return InventoryReport.objects.aggregate(
+        books=Count('pk'),
+        low_stock=Count('pk', filter=Q(is_low_stock=True)),
+        out_of_stock=Count('pk', filter=Q(copies_available=0)),
+        copies=Sum('copies_available', default=0),
+        units_sold=Sum('units_sold', default=0),
+    )
+
+
+def report_summary():
+    """Dashboard totals from the last refresh, or None if the report was never built"""
+    summary = cache.get(SUMMARY_CACHE_KEY)
+    if summary is None:
+        checkpoint = JobCheckpoint.objects.filter(name=CHECKPOINT).first()
+        if checkpoint is None:
+            return None
+        summary = compute_summary()
+        summary['refreshed_at'] = checkpoint.updated_at
+        cache.set(SUMMARY_CACHE_KEY, summary, None)
+    return summary
+
+
+def low_stock_alerts(limit=50):
+    """Low-stock books, those that will sell out soonest first"""
+    return (
+        InventoryReport.objects.filter(is_low_stock=True)
+        .select_related('book')
+        .order_by(F('days_of_stock').asc(nulls_last=True), 'copies_available')[:limit]
+    )
+
+
+def top_sellers(limit=20):
+    return InventoryReport.objects.filter(sales_rank__isnull=False).select_related('book').order_by('sales_rank')[:limit]
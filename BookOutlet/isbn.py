@@ -0,0 +1,56 @@
+"""
+ISBN normalisation.
+
+Books store ISBNs as 13 digits with no separators. ISBN-10s are converted
+(978 prefix plus a recomputed check digit), so the same book can't be
+entered twice in different spellings and lookups can use the unique index
+on ``Book.isbn``.
+"""
+import re
+
+_SEPARATORS = re.compile(r'[\s-]')
+_ISBN10 = re.compile(r'^\d{9}[\dX]$')
+_ISBN13 = re.compile(r'^97[89]\d{10}$')
+
+
+def _isbn10_check_digit(first9):
+    total = sum((10 - i) * int(digit) for i, digit in enumerate(first9))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+
+def _isbn13_check_digit(first12):
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def isbn10_to_isbn13(isbn10):
+    first12 = '978' + isbn10[:9]
+    return first12 + _isbn13_check_digit(first12)
+
+
+def normalize_isbn(value):
+    """
+    Return ``value`` as a 13-digit ISBN.
+
+    Hyphens and spaces are ignored. Raises ValueError if the value is not
+    a well-formed ISBN-10 or ISBN-13 or its check digit is wrong.
+    """
+    isbn = _SEPARATORS.sub('', value or '').upper()
+    if _ISBN10.match(isbn):
+        if isbn[-1] != _isbn10_check_digit(isbn[:9]):
+            raise ValueError('ISBN-10 check digit is incorrect.')
+        return isbn10_to_isbn13(isbn)
+    if _ISBN13.match(isbn):
+        if isbn[-1] != _isbn13_check_digit(isbn[:12]):
+            raise ValueError('ISBN-13 check digit is incorrect.')
+        return isbn
+    raise ValueError('Enter a 10 or 13 digit ISBN.')
+
+
+def looks_like_isbn(query):
+    """The normalised ISBN if a search query is one, otherwise None"""
+    try:
+        return normalize_isbn(query)
+    except ValueError:
+        return None
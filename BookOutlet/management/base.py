@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+
+class MaintenanceCommand(BaseCommand):
+    """
+    Base for scheduled jobs and workers. They don't serve requests, so they
+    skip the system checks: the URL checks import the URLconf, every view
+    and DRF, which costs more than many of these jobs take to run. Run
+    ``manage.py check`` in CI/deploys instead.
+    """
+    requires_system_checks = []
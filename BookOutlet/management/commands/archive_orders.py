@@ -0,0 +1,30 @@
+from django.conf import settings
+
+from BookOutlet.archive import archivable_orders, archive_cutoff, archive_orders
+from BookOutlet.management.base import MaintenanceCommand
+
+
+class Command(MaintenanceCommand):
+    help = "Move old delivered orders into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months', type=int, default=settings.ORDER_ARCHIVE_AFTER_MONTHS,
+            help='Archive delivered orders older than this many months',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many orders would be archived',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['months'])
+
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(f"{count} order(s) created before {cutoff:%Y-%m-%d} would be archived.")
+            return
+
+        count = archive_orders(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {count} order(s)."))
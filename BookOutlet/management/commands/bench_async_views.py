@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory
+
+from BookOutlet import async_views, views
+from BookOutlet.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec of the sync and async catalog views when many "
+        "requests are dispatched concurrently on one event loop, the way an "
+        "ASGI server such as uvicorn runs them. Read-only; uses the configured database."
+    )
+
+    VIEWS = {
+        'book_detail': ('/book-outlet/books/{pk}/', 'book_detail', True),
+        'book_list': ('/book-outlet/books/', 'book_list_template', False),
+        'search': ('/book-outlet/search/?q=the', 'book_search_view', False),
+        'books_json': ('/book-outlet/api/books/json/', 'books_api_json', False),
+        'stats': ('/book-outlet/api/stats/', 'book_stats_api', False),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--view', choices=sorted(self.VIEWS), action='append',
+                            help='View(s) to benchmark (default: all)')
+
+    def handle(self, *args, **options):
+        book = Book.objects.order_by('id').first()
+        if book is None:
+            raise CommandError("The benchmark needs at least one book in the database.")
+
+        for name in options['view'] or sorted(self.VIEWS):
+            path, view_name, takes_pk = self.VIEWS[name]
+            kwargs = {'pk': book.pk} if takes_pk else {}
+            path = path.format(pk=book.pk)
+
+            # This is how Django's ASGI handler runs a sync view
+            sync_view = sync_to_async(getattr(views, view_name))
+            async_view = getattr(async_views, view_name)
+
+            sync_rps = asyncio.run(self.run(sync_view, path, kwargs, options))
+            async_rps = asyncio.run(self.run(async_view, path, kwargs, options))
+            self.stdout.write(
+                f"{name:<12} sync {sync_rps:8.1f} req/s   async {async_rps:8.1f} req/s   "
+                f"({async_rps / sync_rps:.2f}x)"
+            )
+
+    async def run(self, view, path, kwargs, options):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+
+        async def anonymous():
+            return AnonymousUser()
+
+        async def one_request():
+            async with semaphore:
+                request = factory.get(path)
+                request.user = AnonymousUser()
+                request.auser = anonymous
+                response = await view(request, **kwargs)
+                if response.status_code != 200:
+                    raise CommandError(f"{path} returned {response.status_code}")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(options['requests'])))
+        return options['requests'] / (time.perf_counter() - start)
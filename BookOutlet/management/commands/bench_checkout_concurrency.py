@@ -0,0 +1,83 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from BookOutlet.models import Book, Order, OrderItem, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure catalog read throughput while checkout-style writes run "
+        "concurrently, and count 'database is locked' failures. Run it once "
+        "per BOOKVERSE_DB_PROFILE to compare. Writes benchmark rows to the "
+        "configured database and deletes them afterwards, so point "
+        "BOOKVERSE_DB_PATH at a scratch copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(f'bench-{uuid.uuid4().hex[:8]}')
+        book = Book.objects.create(title="Benchmark Book", author="Bench Mark", price=100)
+        stop = threading.Event()
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def record(key):
+            with lock:
+                counts[key] += 1
+
+        def reader():
+            try:
+                while not stop.is_set():
+                    list(Book.objects.order_by('-id')[:50])
+                    Book.objects.count()
+                    record('reads')
+            finally:
+                connection.close()
+
+        def writer():
+            try:
+                while not stop.is_set():
+                    try:
+                        with transaction.atomic():
+                            order = Order.objects.create(
+                                user=user,
+                                order_number=f'BENCH{uuid.uuid4().hex[:15]}',
+                                total_amount=book.price,
+                                shipping_address='Benchmark',
+                            )
+                            OrderItem.objects.create(order=order, book=book, quantity=1, price=book.price)
+                        record('writes')
+                    except OperationalError:
+                        record('locked')
+            finally:
+                connection.close()
+
+        threads = (
+            [threading.Thread(target=reader) for _ in range(options['readers'])] +
+            [threading.Thread(target=writer) for _ in range(options['writers'])]
+        )
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(options['seconds'])
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            user.delete()
+            book.delete()
+
+        seconds = options['seconds']
+        self.stdout.write(f"profile:  {settings.DB_PROFILE} ({connection.vendor})")
+        self.stdout.write(f"reads/s:  {counts['reads'] / seconds:.1f}")
+        self.stdout.write(f"writes/s: {counts['writes'] / seconds:.1f}")
+        self.stdout.write(f"locked:   {counts['locked']}")
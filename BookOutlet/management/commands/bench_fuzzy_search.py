@@ -0,0 +1,96 @@
+import gc
+import random
+import string
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from BookOutlet.search_index import FuzzyIndex
+
+ONSETS = list("bcdfghjklmnprstvwz") + "bl br ch cr dr fl gr pl pr sh sk sl sp st str th tr wh".split()
+VOWELS = list("aeiouy") + "ai ea ee ie oa oo ou".split()
+CODAS = [''] * 6 + "ck ld lt m n nd ng nt r rd rk rn s sh st t th x".split()
+STOPWORDS = ["the", "of", "and", "a", "in"]
+
+
+def make_word(rng):
+    """A pronounceable made-up word, so trigram statistics resemble real text"""
+    return ''.join(
+        rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+        for _ in range(rng.randint(1, 3))
+    )
+
+
+def add_typo(word, rng):
+    """One random deletion, insertion, substitution or transposition"""
+    i = rng.randrange(len(word))
+    kind = rng.choice(('delete', 'insert', 'substitute', 'transpose'))
+    if kind == 'delete' and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    if kind == 'insert':
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if kind == 'transpose' and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], '')) + word[i + 1:]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure recall and latency of typo-tolerant search on a synthetic "
+        "in-memory catalog (does not touch the database). Each query is a "
+        "book's title or author with one typo in one word."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000)
+        parser.add_argument('--vocabulary', type=int, default=50000)
+        parser.add_argument('--queries', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        vocabulary = list({make_word(rng) for _ in range(options['vocabulary'])})
+        first_names = [make_word(rng).title() for _ in range(2000)]
+        surnames = vocabulary[:len(vocabulary) // 10]
+        rows = []
+        for book_id in range(1, options['books'] + 1):
+            words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 3))]
+            if rng.random() < 0.3:
+                words.insert(0, rng.choice(STOPWORDS))
+            author = f"{rng.choice(first_names)} {rng.choice(surnames).title()}"
+            rows.append((book_id, ' '.join(words).title(), author, None))
+
+        started = time.perf_counter()
+        index = FuzzyIndex(rows)
+        build_seconds = time.perf_counter() - started
+        # As build_index() does for the live index
+        gc.freeze()
+
+        timings = []
+        hits_at_1 = hits_at_10 = 0
+        for _ in range(options['queries']):
+            book_id, title, author, _ = rng.choice(rows)
+            words = title.lower().split()
+            candidates = [i for i, word in enumerate(words) if word not in STOPWORDS and len(word) > 3]
+            if not candidates:
+                continue
+            typo_at = rng.choice(candidates)
+            words[typo_at] = add_typo(words[typo_at], rng)
+            query = ' '.join(words)
+
+            started = time.perf_counter()
+            results = [result_id for result_id, _ in index.search(query, limit=10)]
+            timings.append(time.perf_counter() - started)
+
+            hits_at_1 += bool(results) and results[0] == book_id
+            hits_at_10 += book_id in results
+
+        timings.sort()
+        queries = len(timings)
+        self.stdout.write(f"books:       {options['books']}")
+        self.stdout.write(f"build:       {build_seconds:.2f}s")
+        self.stdout.write(f"queries:     {queries}")
+        self.stdout.write(f"recall@1:    {hits_at_1 / queries:.3f}")
+        self.stdout.write(f"recall@10:   {hits_at_10 / queries:.3f}")
+        self.stdout.write(f"p50:         {statistics.median(timings) * 1000:.2f} ms")
+        self.stdout.write(f"p99:         {timings[int(queries * 0.99)] * 1000:.2f} ms")
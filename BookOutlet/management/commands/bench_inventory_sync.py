@@ -0,0 +1,63 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from BookOutlet.inventory import apply_stock_changes
+from BookOutlet.models import Book
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time a warehouse stock sync through apply_stock_changes against "
+        "per-book saves. Works on synthetic books inside a transaction that "
+        "is rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skus', type=int, default=50000)
+        parser.add_argument('--saves', type=int, default=500,
+                            help="Books updated with save() for the per-book comparison")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create(
+                    (Book(title=f"Sync Book {i}", author="Bench Author", copies_available=10)
+                     for i in range(options['skus'])),
+                    batch_size=5000,
+                )
+                books = list(Book.objects.filter(author="Bench Author").values_list('pk', 'stock_version'))
+                changes = []
+                for book_id, version in books:
+                    if rng.random() < 0.5:
+                        changes.append({'book': book_id, 'set': rng.randint(0, 50), 'version': version})
+                    else:
+                        changes.append({'book': book_id, 'delta': rng.randint(-15, 15)})
+
+                started = time.perf_counter()
+                result = apply_stock_changes(changes, source='sync', reason='benchmark')
+                bulk_seconds = time.perf_counter() - started
+
+                sample = Book.objects.filter(author="Bench Author")[:options['saves']]
+                started = time.perf_counter()
+                for book in sample:
+                    book.copies_available += 1
+                    book.save()
+                per_save = (time.perf_counter() - started) / max(len(sample), 1)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"skus:        {len(changes)}")
+        self.stdout.write(f"updated:     {result['updated']} ({result['unchanged']} unchanged, "
+                          f"{len(result['conflicts'])} conflicts)")
+        self.stdout.write(f"bulk:        {bulk_seconds:.2f}s ({len(changes) / bulk_seconds:,.0f} books/s)")
+        self.stdout.write(f"save():      {per_save * 1000:.2f} ms/book, "
+                          f"~{per_save * len(changes):.1f}s for the same sync")
@@ -0,0 +1,60 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from BookOutlet.search_index import PrefixIndex
+
+WORDS = (
+    "the of and a in to great old man sea war peace pride prejudice night day "
+    "house garden river city road shadow light dark fire ice stone song king "
+    "queen secret history little lost last first world story winter summer"
+).split()
+NAMES = "Jane Mark Leo Ana Paulo Harper Ernest Virginia Gabriel Toni Haruki Chinua".split()
+SURNAMES = "Austen Twain Tolstoy Coelho Lee Hemingway Woolf Marquez Morrison Murakami Achebe".split()
+
+
+def synthetic_rows(count, rng):
+    for book_id in range(1, count + 1):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title()
+        author = f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}"
+        isbn = ''.join(rng.choice('0123456789') for _ in range(13))
+        yield book_id, f"{title} {book_id}", author, isbn
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure search suggestion latency per keystroke on a synthetic "
+        "in-memory catalog (does not touch the database)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        rows = list(synthetic_rows(options['books'], rng))
+
+        started = time.perf_counter()
+        index = PrefixIndex(rows)
+        build_seconds = time.perf_counter() - started
+
+        timings = []
+        for _ in range(options['queries']):
+            _, title, author, isbn = rng.choice(rows)
+            text = rng.choice((title, author, isbn))
+            # Replay every keystroke of the typed text
+            for end in range(1, min(len(text), 12) + 1):
+                started = time.perf_counter()
+                index.suggest(text[:end])
+                timings.append(time.perf_counter() - started)
+
+        timings.sort()
+        self.stdout.write(f"books:       {len(index)}")
+        self.stdout.write(f"build:       {build_seconds:.2f}s")
+        self.stdout.write(f"keystrokes:  {len(timings)}")
+        self.stdout.write(f"p50:         {statistics.median(timings) * 1000:.3f} ms")
+        self.stdout.write(f"p99:         {timings[int(len(timings) * 0.99)] * 1000:.3f} ms")
+        self.stdout.write(f"max:         {timings[-1] * 1000:.3f} ms")
@@ -0,0 +1,108 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What each kind of process imports before it does any work
+SCENARIOS = {
+    'setup': "import django; django.setup()",
+    'worker': (
+        "import django; django.setup(); "
+        "from BookOutlet.management.commands.run_task_worker import Command"
+    ),
+    'web': (
+        "from django.core.wsgi import get_wsgi_application; get_wsgi_application(); "
+        "from django.urls import get_resolver; get_resolver().url_patterns"
+    ),
+}
+
+# Median import time (ms) above which a scenario counts as a regression
+DEFAULT_LIMITS = {'setup': 600, 'worker': 650, 'web': 900}
+
+# Modules only the web processes should load
+WEB_ONLY_MODULES = ('BookOutlet.views', 'BookOutlet.search_index', 'books_api.views', 'rest_framework.views')
+
+
+def parse_importtime(stderr):
+    """
+    ``-X importtime`` output as ``{module: cumulative microseconds}`` for
+    every module and for the top-level imports only (which sum to the total)
+    """
+    modules, top_level = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+        if not name.startswith('  '):
+            top_level[name.strip()] = int(cumulative)
+    return modules, top_level
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure process startup import cost (python -X importtime) for "
+        "plain setup, task workers and web processes, and fail when a scenario "
+        "exceeds its limit or a non-web process loads web-only modules"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                            help='Scenario to measure (repeatable; default: all)')
+        parser.add_argument('--limit', action='append', default=[], metavar='SCENARIO=MS',
+                            help='Override a scenario limit, e.g. --limit worker=500')
+        parser.add_argument('--top', type=int, default=10, help='Slowest top-level imports to list')
+
+    def handle(self, *args, **options):
+        limits = dict(DEFAULT_LIMITS)
+        for override in options['limit']:
+            name, _, value = override.partition('=')
+            if name not in SCENARIOS or not value.isdigit():
+                raise CommandError(f"Bad --limit {override!r}")
+            limits[name] = int(value)
+
+        # Deployed processes import from cached bytecode, so allow writing it
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'BookStore.settings'))
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+        failures = []
+        for name in options['scenario'] or list(SCENARIOS):
+            totals, walls = [], []
+            for run in range(options['runs'] + 1):
+                started = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, '-X', 'importtime', '-c', SCENARIOS[name]],
+                    cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+                )
+                wall = time.perf_counter() - started
+                if result.returncode:
+                    raise CommandError(f"{name} failed:\n{result.stderr[-2000:]}")
+                modules, top_level = parse_importtime(result.stderr)
+                if run:  # the first run only warms the bytecode cache
+                    totals.append(sum(top_level.values()) / 1000)
+                    walls.append(wall * 1000)
+
+            import_ms = statistics.median(totals)
+            self.stdout.write(
+                f"{name:<8} imports {import_ms:7.1f} ms   process {statistics.median(walls):7.1f} ms   "
+                f"limit {limits[name]} ms"
+            )
+            top = sorted(((cumulative, module) for module, cumulative in top_level.items()), reverse=True)
+            top = top[:options['top']]
+            for cumulative, module in top:
+                self.stdout.write(f"    {cumulative / 1000:7.1f} ms  {module}")
+
+            if import_ms > limits[name]:
+                failures.append(f"{name}: {import_ms:.0f} ms > {limits[name]} ms")
+            if name != 'web':
+                loaded = [module for module in WEB_ONLY_MODULES if module in modules]
+                if loaded:
+                    failures.append(f"{name} imports web-only modules: {', '.join(loaded)}")
+
+        if failures:
+            raise CommandError('Startup regression: ' + '; '.join(failures))
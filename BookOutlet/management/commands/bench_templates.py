@@ -0,0 +1,91 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from BookOutlet.models import Book
+
+GENRES = ('Fiction', 'Mystery', 'Science', 'History', 'Poetry')
+
+TEMPLATES = {
+    'book_list': ('book_outlet/book_list.html', lambda books: {'books': books, 'total_books': len(books)}),
+    'book_search': ('book_outlet/book_search.html', lambda books: {
+        'books': books,
+        'genres': list(GENRES),
+        'search_query': 'book',
+        'current_filters': {'genre': '', 'min_price': '', 'max_price': '', 'min_rating': '',
+                            'sort_by': 'relevance', 'fuzzy': False},
+    }),
+    'home': ('book_outlet/home.html', lambda books: {
+        'recent_books': books,
+        'personalized': False,
+        'stats': {'total_books': len(books), 'total_reviews': 0, 'total_users': 0, 'cart_items_count': 0},
+    }),
+}
+
+
+def synthetic_books(count):
+    """Unsaved books with primary keys, so rendering never touches the database"""
+    return [
+        Book(
+            pk=book_id,
+            title=f"Synthetic Book {book_id}",
+            author="Bench Author",
+            genre=GENRES[book_id % len(GENRES)],
+            price=Decimal('299.00'),
+            rating=(book_id % 5) + 1,
+            copies_available=book_id % 7,
+            isbn=f"978{book_id:010d}",
+        )
+        for book_id in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure render time of book_list.html, book_search.html and home.html "
+        "with synthetic books (does not touch the database). 'cold' renders "
+        "every book card, 'warm' serves the cards from the cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, action='append',
+                            help='Books per page (repeatable; default: 1000 and 10000)')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--template', choices=sorted(TEMPLATES), action='append',
+                            help='Template to render (repeatable; default: all)')
+        parser.add_argument('--max-us-per-book', type=float, default=None,
+                            help='Fail when a warm render costs more than this per book')
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/book-outlet/')
+        request.user = AnonymousUser()
+
+        failures = []
+        self.stdout.write(f"{'template':<12} {'books':>6} {'cold ms':>10} {'warm ms':>10} {'warm µs/book':>13}")
+        for count in options['items'] or [1000, 10000]:
+            books = synthetic_books(count)
+            for name in options['template'] or list(TEMPLATES):
+                template_name, make_context = TEMPLATES[name]
+                timings = {'cold': [], 'warm': []}
+                for _ in range(options['runs']):
+                    for mode in ('cold', 'warm'):
+                        if mode == 'cold':
+                            cache.clear()
+                        started = time.perf_counter()
+                        render_to_string(template_name, make_context(books), request)
+                        timings[mode].append(time.perf_counter() - started)
+
+                cold, warm = (statistics.median(timings[mode]) * 1000 for mode in ('cold', 'warm'))
+                per_book = warm * 1000 / count
+                self.stdout.write(f"{name:<12} {count:>6} {cold:>10.1f} {warm:>10.1f} {per_book:>13.1f}")
+                if options['max_us_per_book'] is not None and per_book > options['max_us_per_book']:
+                    failures.append(f"{name} at {count} books: {per_book:.1f} µs/book")
+
+        if failures:
+            raise CommandError('Render time regression: ' + '; '.join(failures))
@@ -0,0 +1,46 @@
+from BookOutlet.covers import build_cover_variants
+from BookOutlet.management.base import MaintenanceCommand
+from BookOutlet.models import Book
+
+
+class Command(MaintenanceCommand):
+    help = "Generate thumbnail/WebP/AVIF cover variants for every book"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Size of the process pool (defaults to the number of CPUs)',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Rebuild variants even for books that already have them',
+        )
+
+    def handle(self, *args, **options):
+        books = Book.objects.exclude(cover_image__isnull=True).exclude(cover_image='')
+        if not options['force']:
+            books = [b for b in books if b.cover_variants.get('source') != b.cover_image]
+        else:
+            books = list(books)
+
+        if not books:
+            self.stdout.write("All cover variants are up to date.")
+            return
+
+        variants = build_cover_variants(
+            [book.cover_image for book in books],
+            workers=options['workers'],
+        )
+        for book in books:
+            book.cover_variants = variants[book.cover_image]
+            book.stock_version += 1
+
+        # bulk_update skips Book.save(), which would regenerate the variants again
+        Book.objects.bulk_update(books, ['cover_variants', 'stock_version'], batch_size=500)
+
+        missing = [book.cover_image for book in books if not book.cover_variants]
+        for source in missing:
+            self.stderr.write(f"Cover file not found: {source}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Built cover variants for {len(books) - len(missing)} book(s)."
+        ))
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from BookOutlet.feeds import refresh_home_feeds
+from BookOutlet.management.base import MaintenanceCommand
+
+
+class Command(MaintenanceCommand):
+    help = "Precompute and cache personalised home page feeds in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--active-days', type=int, default=30,
+            help='Only users who logged in within this many days (0 for everyone)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True).order_by('id')
+        if options['active_days']:
+            since = timezone.now() - timedelta(days=options['active_days'])
+            users = users.filter(last_login__gte=since)
+
+        user_ids = list(users.values_list('id', flat=True))
+        batch_size = options['batch_size']
+        built = 0
+        for start in range(0, len(user_ids), batch_size):
+            built += refresh_home_feeds(user_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f"Built {built} home feed(s)."))
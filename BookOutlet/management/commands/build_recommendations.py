@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+
+from BookOutlet.management.base import MaintenanceCommand
+from BookOutlet.recommendations import ORDER_ITEMS_CHECKPOINT, REVIEWS_CHECKPOINT, build_recommendations
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Fold new order lines and reviews into the co-occurrence counts and "
+        "refresh the 'customers also bought' lists. Safe to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild everything from scratch')
+        parser.add_argument('--top-k', type=int, default=settings.RECOMMENDATIONS_TOP_K)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = build_recommendations(full=options['full'], top_k=options['top_k'])
+        elapsed = time.perf_counter() - started
+
+        kind = 'Full rebuild' if stats['full'] else 'Incremental update'
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind}: processed {stats[ORDER_ITEMS_CHECKPOINT]} order line(s) and "
+            f"{stats[REVIEWS_CHECKPOINT]} review(s); refreshed {stats['books']} book(s) "
+            f"in {elapsed:.1f}s."
+        ))
@@ -0,0 +1,10 @@
+from BookOutlet.management.base import MaintenanceCommand
+from BookOutlet.throttling import purge_idle_buckets
+
+
+class Command(MaintenanceCommand):
+    help = "Delete rate-limit buckets that have been idle long enough to be full again"
+
+    def handle(self, *args, **options):
+        count = purge_idle_buckets()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} idle bucket(s)."))
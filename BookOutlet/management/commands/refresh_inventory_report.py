@@ -0,0 +1,25 @@
+import time
+
+from BookOutlet.inventory_report import refresh_inventory_report, report_summary
+from BookOutlet.management.base import MaintenanceCommand
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Recompute sell-through, days of stock and low-stock alerts for books "
+        "whose stock or sales changed since the last run. Safe to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every book')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = refresh_inventory_report(full=options['full'])
+        elapsed = time.perf_counter() - started
+
+        summary = report_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {rows} book(s) in {elapsed:.2f}s; "
+            f"{summary['low_stock']} low on stock, {summary['out_of_stock']} out of stock."
+        ))
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.db import connections
+
+from BookOutlet.management.base import MaintenanceCommand
+from BookOutlet.tasks import run_pending
+
+
+class Command(MaintenanceCommand):
+    help = "Run background task workers (see BookOutlet.tasks)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Number of worker processes to fork (POSIX only when > 1)',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run every due task once and exit instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending(self.worker_id())
+            self.stdout.write(f"Ran {count} task(s).")
+            return
+
+        if options['processes'] == 1:
+            self.work(options['poll_interval'])
+            return
+
+        # Children must not inherit the parent's open database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=self.work, args=(options['poll_interval'],))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop_workers(signum, frame):
+            # terminate() sends SIGTERM, so each worker finishes its current task
+            for worker in workers:
+                worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop_workers)
+        self.stdout.write(f"Started {len(workers)} worker processes.")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop_workers(signal.SIGINT, None)
+            for worker in workers:
+                worker.join()
+
+    def worker_id(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def work(self, poll_interval):
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        worker_id = self.worker_id()
+        self.stdout.write(f"Worker {worker_id} waiting for tasks.")
+        try:
+            while not stopping:
+                # Finish the current task before honouring SIGTERM
+                if not run_pending(worker_id, limit=100):
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connections.close_all()
@@ -0,0 +1,95 @@
+import threading
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from BookOutlet.models import Order, OrderEvent, User
+from BookOutlet.order_states import InvalidTransition, TRANSITIONS, confirm_payment, transition
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent payment retries and cancellations at the same orders "
+        "and check that every order ends in one consistent state with a valid "
+        "event history. Writes test orders to the configured database and "
+        "deletes them afterwards, so point BOOKVERSE_DB_PATH at a scratch copy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(f'stress-{uuid.uuid4().hex[:8]}')
+        orders = [
+            Order.objects.create(
+                user=user,
+                order_number=f'STRESS{uuid.uuid4().hex[:14]}',
+                total_amount=100,
+                shipping_address='Stress test',
+            )
+            for _ in range(options['orders'])
+        ]
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def record(key):
+            with lock:
+                outcomes[key] += 1
+
+        def worker(index, barrier):
+            try:
+                for order in orders:
+                    barrier.wait()
+                    # Each thread works on its own stale copy, like separate requests would
+                    mine = Order.objects.get(pk=order.pk)
+                    try:
+                        if index % 4 == 3:
+                            changed = transition(mine, 'cancelled')
+                        else:
+                            # Half the payers replay the same key, half send their own
+                            key = f'{order.pk}-shared' if index % 2 else f'{order.pk}-{index}'
+                            changed = confirm_payment(mine, idempotency_key=key)
+                        record('applied' if changed else 'duplicate')
+                    except InvalidTransition:
+                        record('rejected')
+                    except OperationalError:
+                        record('locked')
+            finally:
+                connection.close()
+
+        barrier = threading.Barrier(options['threads'])
+        threads = [threading.Thread(target=worker, args=(i, barrier)) for i in range(options['threads'])]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            errors = self.check_orders(orders)
+        finally:
+            user.delete()
+
+        for key in ('applied', 'duplicate', 'rejected', 'locked'):
+            self.stdout.write(f"{key + ':':11}{outcomes[key]}")
+        if errors:
+            for error in errors[:20]:
+                self.stderr.write(error)
+            raise CommandError(f"{len(errors)} inconsistent orders")
+        self.stdout.write(self.style.SUCCESS(f"All {len(orders)} orders consistent"))
+
+    def check_orders(self, orders):
+        errors = []
+        for order in Order.objects.filter(pk__in=[o.pk for o in orders]):
+            status = 'pending'
+            for event in OrderEvent.objects.filter(order=order).order_by('id'):
+                if event.from_status != status or event.to_status not in TRANSITIONS[status]:
+                    errors.append(f"{order.order_number}: bad event {event.from_status} -> {event.to_status}")
+                status = event.to_status
+            if status != order.status:
+                errors.append(f"{order.order_number}: status {order.status} but events end at {status}")
+            paid = OrderEvent.objects.filter(order=order, to_status='confirmed').exists()
+            if paid != order.payment_status:
+                errors.append(f"{order.order_number}: payment_status {order.payment_status} but paid={paid}")
+        return errors
@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+
+from BookOutlet.management.base import MaintenanceCommand
+
+
+class Command(MaintenanceCommand):
+    help = (
+        "Copy the primary SQLite database into every replica file listed in "
+        "BOOKVERSE_DB_REPLICAS. PostgreSQL replicas use streaming replication instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep running and re-sync every INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured (set BOOKVERSE_DB_REPLICAS).")
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("sync_replicas only handles SQLite databases.")
+
+        while True:
+            started = time.perf_counter()
+            self.sync()
+            self.stdout.write(
+                f"Synced {len(settings.DATABASE_REPLICAS)} replica(s) "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self):
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                # Drop Django's handle so the file isn't held open during the copy
+                connections[alias].close()
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    # The backup API copies a consistent snapshot page by page
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
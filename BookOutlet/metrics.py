@@ -0,0 +1,402 @@
+"""
+Prometheus metrics.
+
+MetricsMiddleware (added to MIDDLEWARE when ``settings.METRICS_ENABLED`` is
+on) counts requests and observes their latency by route name (the
+``book_outlet:...`` URL names, "unresolved" for 404s), counts DB queries per
+route and cache hits and misses. The storefront views count cart additions
+and checkouts by outcome. ``/book-outlet/metrics/`` serves everything in the
+Prometheus text format.
+
+Counters and histograms are lock-free on the hot path: every thread updates
+its own shard (a plain dict only that thread writes to) and shards are only
+summed when the metrics are read.
+
+Gunicorn-style deployments run several worker processes, and a scrape only
+reaches one of them. With ``METRICS_DIR`` set, each process writes its
+totals to ``<METRICS_DIR>/<pid>.json`` at most every
+``METRICS_FLUSH_INTERVAL`` seconds (after a request) and on exit; the scrape
+endpoint adds up the files of every process. A scrape folds the totals of
+processes that have exited into ``exited.json`` and deletes their files, so
+counters don't go backwards and the directory doesn't grow with restarts;
+gauges only come from live processes. Without ``METRICS_DIR`` the endpoint
+reports its own process.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from .profiling import add_cache_listener, install_hooks, skip_call_sites_in
+
+skip_call_sites_in(__file__)
+
+# Seconds; the upper bounds of the latency histogram's buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            # Once per thread; shards of finished threads keep their counts
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _shard_items(self):
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # list() copies the dict in one step, so its thread can keep writing
+            yield from list(shard.items())
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def samples(self):
+        totals = {}
+        for key, value in self._shard_items():
+            totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        # Per-bucket counts (not cumulative), then the sum and the count
+        state = shard.get(key)
+        if state is None:
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self):
+        totals = {}
+        for key, state in self._shard_items():
+            totals[key] = _add(totals.get(key), list(state))
+        return totals
+
+
+class Gauge(Metric):
+    """A per-process value; set by collectors when the metrics are read"""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def samples(self):
+        return dict(self._values)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector):
+        """``collector()`` runs before every snapshot, e.g. to set gauges"""
+        self._collectors.append(collector)
+
+    def snapshot(self):
+        """This process's metrics as a JSON-serialisable dict"""
+        for collector in self._collectors:
+            collector()
+        return {
+            name: {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labels': list(metric.labelnames),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'samples': [[list(key), value] for key, value in metric.samples().items()],
+            }
+            for name, metric in self._metrics.items()
+        }
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    'bookverse_http_requests_total', 'HTTP requests by route, method and status.',
+    ('route', 'method', 'status'),
+))
+REQUEST_LATENCY = registry.register(Histogram(
+    'bookverse_http_request_duration_seconds', 'Time spent handling requests by route.',
+    ('route',),
+))
+DB_QUERIES = registry.register(Counter(
+    'bookverse_db_queries_total', 'SQL statements run by route.', ('route',),
+))
+DB_QUERY_SECONDS = registry.register(Counter(
+    'bookverse_db_query_seconds_total', 'Time spent in SQL statements by route.', ('route',),
+))
+CACHE_LOOKUPS = registry.register(Counter(
+    'bookverse_cache_lookups_total', 'Cache lookups by result (hit or miss).', ('result',),
+))
+CART_ADDITIONS = registry.register(Counter(
+    'bookverse_cart_additions_total', 'Books added to carts.',
+))
+CHECKOUTS = registry.register(Counter(
+    'bookverse_checkouts_total', 'Checkout attempts by outcome.', ('outcome',),
+))
+THROTTLED = registry.register(Counter(
+    'bookverse_throttled_requests_total', 'Requests refused by the rate limits, by scope.', ('scope',),
+))
+DB_POOL = registry.register(Gauge(
+    'bookverse_db_pool_connections', 'Connection pool state by database alias.', ('alias', 'state'),
+))
+
+
+def _collect_db_pools():
+    # Only PostgreSQL with OPTIONS["pool"] has a pool (psycopg_pool)
+    for connection in connections.all(initialized_only=True):
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        for state in ('pool_size', 'pool_available', 'requests_waiting'):
+            DB_POOL.set(stats.get(state, 0), alias=connection.alias, state=state)
+
+
+registry.add_collector(_collect_db_pools)
+
+
+def _count_cache_lookup(hits, misses):
+    if hits:
+        CACHE_LOOKUPS.inc(hits, result='hit')
+    if misses:
+        CACHE_LOOKUPS.inc(misses, result='miss')
+
+
+def _add(total, value):
+    if total is None:
+        return value
+    if isinstance(value, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+# ----- Multi-process store -----
+
+_next_flush = 0.0
+
+
+# Totals of exited processes, folded together by the scrapes
+EXITED_FILE = 'exited.json'
+
+
+def _snapshot_path(pid):
+    return Path(settings.METRICS_DIR) / f'{pid}.json'
+
+
+def flush():
+    """Write this process's totals for the other processes' scrapes"""
+    global _next_flush
+    _next_flush = time.monotonic() + settings.METRICS_FLUSH_INTERVAL
+    directory = Path(settings.METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    temporary = path.with_suffix(f'.tmp{threading.get_ident()}')
+    temporary.write_text(json.dumps(registry.snapshot()))
+    os.replace(temporary, path)
+
+
+def maybe_flush():
+    if settings.METRICS_DIR and time.monotonic() >= _next_flush:
+        flush()
+
+
+@atexit.register
+def _flush_at_exit():
+    if settings.configured and settings.METRICS_DIR:
+        flush()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(merged, snapshot, gauges=True):
+    for name, metric in snapshot.items():
+        if metric['type'] == 'gauge' and not gauges:
+            continue
+        target = merged.setdefault(name, dict(metric, samples={}))
+        for labels, value in metric['samples']:
+            key = tuple(labels)
+            target['samples'][key] = _add(target['samples'].get(key), value)
+
+
+def _as_snapshot(merged):
+    for metric in merged.values():
+        metric['samples'] = [[list(key), value] for key, value in metric['samples'].items()]
+    return merged
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def collect():
+    """Metrics of every process sharing ``METRICS_DIR`` (or just this one)"""
+    if not settings.METRICS_DIR:
+        return registry.snapshot()
+    # Unix only, like the multi-worker servers METRICS_DIR is for
+    import fcntl
+    
+    flush()
+    directory = Path(settings.METRICS_DIR)
+    merged = {}
+    exited = {}
+    dead = []
+    # One scrape at a time, so two don't fold the same exited process twice
+    with open(directory / '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _merge(exited, _read(directory / EXITED_FILE) or {})
+        for path in directory.glob('*.json'):
+            # Only <pid>.json files; ignore anything else left in the directory
+            if not path.stem.isdigit():
+                continue
+            snapshot = _read(path)
+            if snapshot is None:
+                continue
+            if _alive(int(path.stem)):
+                _merge(merged, snapshot)
+            else:
+                _merge(exited, snapshot, gauges=False)
+                dead.append(path)
+        exited = _as_snapshot(exited)
+        if dead:
+            # Fold exited processes into one file so the directory doesn't
+            # grow with every worker restart
+            temporary = directory / f'{EXITED_FILE}.tmp{os.getpid()}'
+            temporary.write_text(json.dumps(exited))
+            os.replace(temporary, directory / EXITED_FILE)
+            for path in dead:
+                path.unlink(missing_ok=True)
+    _merge(merged, exited)
+    return _as_snapshot(merged)
+
+
+# ----- Text exposition -----
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(metrics):
+    """Prometheus text format (version 0.0.4) for a ``collect()`` result"""
+    lines = []
+    for name in sorted(metrics):
+        metric = metrics[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric['labels']
+        for values, value in sorted(metric['samples']):
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_labels(names, values)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'] + ['+Inf'], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, values, [('le', bound)])} {cumulative}")
+            lines.append(f'{name}_sum{_labels(names, values)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(names, values)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_hooks()
+        add_cache_listener(_count_cache_lookup)
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unresolved'
+        REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        REQUEST_LATENCY.observe(elapsed, route=route)
+        if queries[0]:
+            DB_QUERIES.inc(queries[0], route=route)
+            DB_QUERY_SECONDS.inc(queries[1], route=route)
+        maybe_flush()
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BookOutlet', '0009_book_cover_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized cover variants generated from cover_image'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:18
+
+import logging
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+logger = logging.getLogger(__name__)
+
+# A frozen copy of BookOutlet.isbn.normalize_isbn as it was for this migration
+_SEPARATORS = re.compile(r'[\s-]')
+_ISBN10 = re.compile(r'^\d{9}[\dX]$')
+_ISBN13 = re.compile(r'^97[89]\d{10}$')
+
+
+def _isbn13_check_digit(first12):
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(first12))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn(value):
+    isbn = _SEPARATORS.sub('', value or '').upper()
+    if _ISBN10.match(isbn):
+        total = sum((10 - i) * int(digit) for i, digit in enumerate(isbn[:9]))
+        check = (11 - total % 11) % 11
+        if isbn[-1] != ('X' if check == 10 else str(check)):
+            raise ValueError('ISBN-10 check digit is incorrect.')
+        first12 = '978' + isbn[:9]
+        return first12 + _isbn13_check_digit(first12)
+    if _ISBN13.match(isbn):
+        if isbn[-1] != _isbn13_check_digit(isbn[:12]):
+            raise ValueError('ISBN-13 check digit is incorrect.')
+        return isbn
+    raise ValueError('Enter a 10 or 13 digit ISBN.')
+
+
+def normalize_isbns(apps, schema_editor):
+    """
+    Normalise stored ISBNs; invalid ones and later duplicates are cleared.
+    Clearing can't be undone, so every cleared value is logged first.
+    """
+    Book = apps.get_model('BookOutlet', 'Book')
+    seen = {}
+    for book in Book.objects.exclude(isbn__isnull=True).order_by('id').only('id', 'isbn').iterator():
+        try:
+            isbn = normalize_isbn(book.isbn)
+        except ValueError as e:
+            isbn = None
+            logger.warning("Book %s: cleared invalid ISBN %r (%s)", book.pk, book.isbn, e)
+        if isbn in seen:
+            logger.warning("Book %s: cleared ISBN %r, a duplicate of book %s", book.pk, book.isbn, seen[isbn])
+            isbn = None
+        if isbn:
+            seen[isbn] = book.pk
+        if isbn != book.isbn:
+            Book.objects.filter(pk=book.pk).update(isbn=isbn)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BookOutlet', '0014_recommendations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_isbns, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(condition=models.Q(('isbn__isnull', False)), fields=('isbn',), name='book_isbn_unique', violation_error_message='A book with this ISBN already exists.'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BookOutlet', '0016_admin_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='stock_version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Bumped on every change, for optimistic checks by stock syncs'),
+        ),
+        migrations.CreateModel(
+            name='StockAdjustment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('previous_count', models.PositiveIntegerField()),
+                ('new_count', models.PositiveIntegerField()),
+                ('source', models.CharField(choices=[('api', 'API'), ('admin', 'Admin'), ('sync', 'Warehouse sync')], max_length=10)),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('batch', models.UUIDField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_adjustments', to='BookOutlet.book')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book', '-created_at'], name='stock_adjustment_book_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BookOutlet', '0017_stock_adjustments'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryReport',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inventory_report', serialize=False, to='BookOutlet.book')),
+                ('copies_available', models.PositiveIntegerField()),
+                ('stock_version', models.PositiveIntegerField()),
+                ('units_sold', models.PositiveIntegerField(default=0)),
+                ('daily_sales', models.FloatField(default=0)),
+                ('sell_through_rate', models.FloatField(default=0)),
+                ('days_of_stock', models.FloatField(blank=True, null=True)),
+                ('is_low_stock', models.BooleanField(default=False)),
+                ('sales_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['is_low_stock', 'days_of_stock'], name='inventory_low_stock_idx'), models.Index(fields=['sales_rank'], name='inventory_sales_rank_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BookOutlet', '0018_inventory_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sales_rolled_up',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('genre', 'Genre'), ('author', 'Author'), ('book', 'Book')], max_length=6)),
+                ('key', models.CharField(blank=True, max_length=100)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.IntegerField(default=0)),
+                ('orders', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'dimension', 'bucket'], name='sales_rollup_range_idx')],
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'dimension', 'key', 'bucket'), name='sales_rollup_unique')],
+            },
+        ),
+    ]
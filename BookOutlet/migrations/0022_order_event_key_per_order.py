@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BookOutlet', '0021_review_pages'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='orderevent',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='orderevent',
+            constraint=models.UniqueConstraint(fields=('order', 'idempotency_key'), name='order_event_idempotency_key_unique'),
+        ),
+    ]
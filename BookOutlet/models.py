@@ -1,6 +1,7 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
+from django.utils import timezone
 import re
 import time
 
@@ -20,6 +21,11 @@ class Book(models.Model):
         default=1,
         help_text="Number of copies in inventory"
     )
+    stock_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bumped on every change, for optimistic checks by stock syncs"
+    )
     isbn = models.CharField(
         max_length=13, 
         blank=True, 
@@ -33,8 +39,50 @@ class Book(models.Model):
         null=True,
         help_text="Book cover image filename"
     )
+    cover_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Resized cover variants generated from cover_image"
+    )
 
+    class Meta:
+        constraints = [
+            # ISBNs are stored normalised (see isbn.py); books without one are not constrained
+            models.UniqueConstraint(
+                fields=['isbn'],
+                condition=models.Q(isbn__isnull=False),
+                name='book_isbn_unique',
+                violation_error_message='A book with this ISBN already exists.',
+            ),
+        ]
+        indexes = [
+            # Prefix searches in the admin's performance mode (admin_performance.py)
+            models.Index(fields=['title'], name='book_title_idx'),
+            models.Index(fields=['author'], name='book_author_idx'),
+        ]
 
+    def clean_fields(self, exclude=None):
+        # Normalise the ISBN first, so hyphenated and ISBN-10 input passes max_length
+        errors = {}
+        if not self.isbn:
+            self.isbn = None
+        else:
+            from .isbn import normalize_isbn
+            try:
+                self.isbn = normalize_isbn(self.isbn)
+            except ValueError as e:
+                errors['isbn'] = [str(e)]
+                exclude = {*(exclude or ()), 'isbn'}
+        
+        try:
+            super().clean_fields(exclude=exclude)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+        
+        if errors:
+            raise ValidationError(errors)
+    
     def clean(self):
         errors = {}
         
@@ -67,7 +115,19 @@ class Book(models.Model):
     
     def save(self, *args, **kwargs):
         self.full_clean()
+        # Generate thumbnails on ingest, or when the cover file changes
+        if self.cover_image and self.cover_variants.get('source') != self.cover_image:
+            from .covers import generate_cover_variants
+            self.cover_variants = generate_cover_variants(self.cover_image)
+        bumped = not self._state.adding
+        if bumped:
+            # In SQL, so a concurrent stock sync's bump isn't overwritten
+            self.stock_version = models.F('stock_version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'stock_version'}
         super().save(*args, **kwargs)
+        if bumped:
+            self.refresh_from_db(fields=['stock_version'])
     
     def __str__(self):
         return self.title
@@ -77,6 +137,33 @@ class Book(models.Model):
             return f'/static/book_outlet/images/book_covers/{self.cover_image}'
         return '/static/book_outlet/images/book_covers/default_cover.jpg'
     
+    def get_cover_thumbnail_url(self):
+        """Medium-sized JPEG variant, falling back to the original cover"""
+        if not self.cover_variants:
+            return self.get_cover_url()
+        from .covers import variant_url
+        widths = self.cover_variants['widths']
+        width = 320 if 320 in widths else widths[-1]
+        return variant_url(self.cover_variants, width, 'jpg')
+    
+    def get_cover_srcset(self):
+        """JPEG srcset for the <img> fallback"""
+        if not self.cover_variants:
+            return ''
+        from .covers import srcset
+        return srcset(self.cover_variants, 'jpg')
+    
+    def get_cover_sources(self):
+        """Modern-format <source> entries (AVIF/WebP) for a <picture> element"""
+        if not self.cover_variants:
+            return []
+        from .covers import COVER_FORMATS, srcset
+        return [
+            {'type': COVER_FORMATS[ext]['mime'], 'srcset': srcset(self.cover_variants, ext)}
+            for ext in self.cover_variants['formats']
+            if ext != 'jpg'
+        ]
+    
     def get_average_rating(self):
         """Calculate average rating from reviews"""
         reviews = self.reviews.all()
@@ -131,12 +218,20 @@ class Review(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.IntegerField(choices=RATING_CHOICES)
     comment = models.TextField(max_length=1000)
+    # Number of ReviewVotes, kept in step by reviews.mark_helpful
+    helpful_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['book', 'user']  # One review per user per book
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='review_created_idx'),
+            # A book's reviews, newest or most helpful first (reviews.py)
+            models.Index(fields=['book', '-created_at', '-id'], name='review_book_recent_idx'),
+            models.Index(fields=['book', '-helpful_count', '-created_at', '-id'], name='review_book_helpful_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.book.title} - {self.rating} stars"
@@ -161,8 +256,9 @@ class Review(models.Model):
         self.full_clean()
         super().save(*args, **kwargs)
         
-        # Update book's average rating when review is saved
-        self.update_book_rating()
+        # Update book's average rating in the background when review is saved
+        from .tasks import enqueue
+        enqueue('update_book_rating', book_id=self.book_id)
     
     def update_book_rating(self):
         """Update the book's average rating"""
@@ -175,6 +271,21 @@ class Review(models.Model):
             book.rating = None
         book.save()
 
+
+class ReviewVote(models.Model):
+    """A user marking a review as helpful; each user counts once per review"""
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['review', 'user'], name='review_vote_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} found review {self.review_id} helpful"
+
 class Cart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -184,7 +295,7 @@ class Cart(models.Model):
         return f"Cart ({self.user.username})"
     
     def get_total_price(self):
-        return sum(item.get_total_price() for item in self.items.all())
+        return sum(item.get_total_price() for item in self.items.select_related('book'))
     
     def get_total_quantity(self):
         return sum(item.quantity for item in self.items.all())
@@ -217,6 +328,21 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     shipping_address = models.TextField(blank=True)
     payment_status = models.BooleanField(default=False)
+    # Whether the order's sales are counted in SalesRollup (see sales_rollups.py)
+    sales_rolled_up = models.BooleanField(default=False, editable=False)
+    # The inventory report run that claimed the order's latest change; NULL
+    # until a run has seen it (see inventory_report.py)
+    inventory_run = models.BigIntegerField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        indexes = [
+            # Per-user order history, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Archival scan for old delivered orders
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Orders the inventory report hasn't seen yet, and those a run claimed
+            models.Index(fields=['inventory_run'], name='order_inventory_run_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.order_number} - {self.user.username}"
@@ -224,6 +350,10 @@ class Order(models.Model):
     def save(self, *args, **kwargs):
         if not self.order_number:
             self.order_number = f"ORD{self.user.id}{int(time.time())}"
+        # Any edit may change what the order sold; the next report run recounts it
+        self.inventory_run = None
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'inventory_run'}
         super().save(*args, **kwargs)
 
 class OrderItem(models.Model):
@@ -237,7 +367,246 @@ class OrderItem(models.Model):
     
     def get_total_price(self):
         return self.price * self.quantity
+
+
+class OrderEvent(models.Model):
+    """Audit log of Order status transitions (see order_states.py)"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    # Set for client-initiated transitions so retries are recognised; keys are
+    # chosen by clients, so they only have to be unique per order
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'idempotency_key'], name='order_event_idempotency_key_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.order.order_number}: {self.from_status} -> {self.to_status}"
+
+
+class ArchivedOrder(models.Model):
+    """Delivered orders moved out of Order by the archive_orders command"""
+    original_id = models.BigIntegerField(unique=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    order_number = models.CharField(max_length=20, unique=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    shipping_address = models.TextField(blank=True)
+    payment_status = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Archived order #{self.order_number} - {self.user.username}"
+
+
+class ArchivedOrderItem(models.Model):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    # Archived history outlives the catalog, so keep the title even if the book goes
+    book = models.ForeignKey('Book', on_delete=models.SET_NULL, null=True)
+    book_title = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    
+    def __str__(self):
+        return f"{self.quantity} x {self.book_title}"
+    
+    def get_total_price(self):
+        return self.price * self.quantity
+
+
+class ArchivedOrderEvent(models.Model):
+    """OrderEvent audit log of an archived order, kept when the Order row goes"""
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.order.order_number}: {self.from_status} -> {self.to_status}"
     
+class Task(models.Model):
+    """A unit of background work, run by the run_task_worker command"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class JobCheckpoint(models.Model):
+    """How far an incremental batch job has got, e.g. the last processed row id"""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class StockAdjustment(models.Model):
+    """Audit trail of bulk stock changes (see inventory.py)"""
+    SOURCE_CHOICES = [
+        ('api', 'API'),
+        ('admin', 'Admin'),
+        ('sync', 'Warehouse sync'),
+    ]
+    
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='stock_adjustments')
+    previous_count = models.PositiveIntegerField()
+    new_count = models.PositiveIntegerField()
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    reason = models.CharField(max_length=200, blank=True)
+    batch = models.UUIDField(db_index=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['book', '-created_at'], name='stock_adjustment_book_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id}: {self.previous_count} -> {self.new_count} ({self.source})"
+
+
+class InventoryReport(models.Model):
+    """Per-book stock and sales figures, refreshed by inventory_report.refresh_inventory_report"""
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='inventory_report')
+    copies_available = models.PositiveIntegerField()
+    # The Book.stock_version these figures were computed from
+    stock_version = models.PositiveIntegerField()
+    units_sold = models.PositiveIntegerField(default=0)
+    daily_sales = models.FloatField(default=0)
+    sell_through_rate = models.FloatField(default=0)
+    days_of_stock = models.FloatField(null=True, blank=True)
+    is_low_stock = models.BooleanField(default=False)
+    sales_rank = models.PositiveIntegerField(null=True, blank=True)
+    refreshed_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_low_stock', 'days_of_stock'], name='inventory_low_stock_idx'),
+            models.Index(fields=['sales_rank'], name='inventory_sales_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id}: {self.copies_available} left, {self.units_sold} sold"
+
+
+class SalesRollup(models.Model):
+    """Revenue, units and order counts per hour/day bucket for one genre, author, book or the whole store"""
+    GRANULARITY_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    DIMENSION_CHOICES = [
+        ('total', 'Total'),
+        ('genre', 'Genre'),
+        ('author', 'Author'),
+        ('book', 'Book'),
+    ]
+    
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    dimension = models.CharField(max_length=6, choices=DIMENSION_CHOICES)
+    # Genre or author name, book id, or '' for the total
+    key = models.CharField(max_length=100, blank=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    orders = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'dimension', 'key', 'bucket'], name='sales_rollup_unique'),
+        ]
+        indexes = [
+            # Top keys over a range
+            models.Index(fields=['granularity', 'dimension', 'bucket'], name='sales_rollup_range_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:00} {self.dimension}={self.key}: {self.revenue}"
+
+
+class BookPairCount(models.Model):
+    """
+    Co-occurrence counts for recommendations, stored once per pair with
+    book_a <= book_b. The diagonal (book_a == book_b) holds how many baskets
+    contain the book at all.
+    """
+    book_a = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    book_b = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book_a', 'book_b'], name='book_pair_count_unique'),
+        ]
+
+
+class BookRecommendation(models.Model):
+    """Top-K most similar books per book, built by build_recommendations"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+    
+    class Meta:
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='book_recommendation_rank_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.book.title} -> {self.recommended.title} ({self.score:.2f})"
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of one route and client for the rate limits (see throttling.py)"""
+    key = models.CharField(max_length=200, primary_key=True)
+    tokens = models.FloatField()
+    # Unix time the tokens were last refilled
+    updated_at = models.FloatField()
+    # Whether the last request got a token
+    granted = models.BooleanField(default=True)
+    
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f} tokens"
+
 class UserInfo(models.Model):
     name = models.CharField(max_length=200)
     email = models.EmailField()
@@ -268,17 +637,3 @@ class UserInfo(models.Model):
     
     def __str__(self):
         return self.name
-
-
-# Signal to create UserProfile when User is created
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
-
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
\ No newline at end of file
@@ -0,0 +1,96 @@
+"""
+Order state machine.
+
+Status changes go through ``transition()``, which only allows the moves in
+TRANSITIONS and applies them with a conditional UPDATE (``WHERE status =
+<expected>``) instead of read-modify-write. When two requests race, exactly
+one UPDATE matches; the loser sees that the order has already moved. Every
+change is recorded as an OrderEvent, and an optional idempotency key makes
+client retries return the original outcome instead of failing.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import Order, OrderEvent
+from .sales_rollups import SOLD_STATUSES
+
+TRANSITIONS = {
+    'pending': {'confirmed', 'cancelled'},
+    'confirmed': {'shipped', 'cancelled'},
+    'shipped': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+
+
+class InvalidTransition(Exception):
+    def __init__(self, order, to_status):
+        self.order = order
+        self.to_status = to_status
+        super().__init__(f"Order #{order.order_number} cannot go from {order.status} to {to_status}")
+
+
+class _DuplicateKey(Exception):
+    pass
+
+
+def transition(order, to_status, idempotency_key=None, **updates):
+    """
+    Move ``order`` to ``to_status``, setting any extra ``updates`` fields.
+
+    Returns True if this call made the change and False if it had already
+    happened (a replayed idempotency key, or a concurrent request that made
+    the same change first). Raises InvalidTransition when the move is not
+    allowed from the order's current status.
+    """
+    if idempotency_key and OrderEvent.objects.filter(order=order, idempotency_key=idempotency_key).exists():
+        return False
+
+    from_status = order.status
+    if to_status not in TRANSITIONS[from_status]:
+        raise InvalidTransition(order, to_status)
+
+    try:
+        with transaction.atomic():
+            changed = Order.objects.filter(pk=order.pk, status=from_status).update(
+                status=to_status, inventory_run=None, **updates
+            )
+            if changed:
+                try:
+                    OrderEvent.objects.create(
+                        order=order,
+                        from_status=from_status,
+                        to_status=to_status,
+                        idempotency_key=idempotency_key,
+                    )
+                except IntegrityError:
+                    # The same key won a race with us; undo our UPDATE
+                    raise _DuplicateKey
+                if (from_status in SOLD_STATUSES) != (to_status in SOLD_STATUSES):
+                    from .tasks import enqueue
+                    enqueue('roll_up_order', order_id=order.pk)
+    except _DuplicateKey:
+        changed = 0
+
+    if not changed:
+        order.refresh_from_db(fields=['status', *updates])
+        if order.status == to_status:
+            return False
+        # Someone moved the order somewhere else in the meantime
+        raise InvalidTransition(order, to_status)
+
+    order.status = to_status
+    for field, value in updates.items():
+        setattr(order, field, value)
+    return True
+
+
+def confirm_payment(order, idempotency_key=None):
+    """Mark a pending order as paid and confirmed; see transition() for the return value"""
+    from .tasks import enqueue
+
+    with transaction.atomic():
+        confirmed = transition(order, 'confirmed', idempotency_key=idempotency_key, payment_status=True)
+        if confirmed:
+            enqueue('send_order_confirmation', order_id=order.id)
+            enqueue('build_home_feed', user_id=order.user_id)
+    return confirmed
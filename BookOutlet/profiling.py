@@ -0,0 +1,280 @@
+"""
+Request profiling.
+
+ProfilingMiddleware (added to MIDDLEWARE when ``settings.PROFILING_ENABLED``
+is on) profiles a random ``PROFILING_SAMPLE_RATE`` share of requests and
+records:
+
+- the view name and total time;
+- the number of DB queries and their time;
+- template render time;
+- cache hits and misses;
+- the ``PROFILING_TOP_QUERIES`` slowest SQL statements, each with the
+  project code line that ran it.
+
+Unsampled requests only pay for one ``random()`` call.
+
+Each profile is logged as one JSON line on the ``BookOutlet.profiling``
+logger. Profiles are also aggregated per route in memory: the last
+``PROFILING_WINDOW`` samples give p50/p95/p99. ``profiling_snapshot()``
+returns them for the staff endpoint.
+
+Queries are timed with ``connection.execute_wrapper``. Template rendering and
+cache lookups are timed by wrapping the Django template backend and the
+configured cache classes once, when the middleware is created; the wrappers
+check a context variable and do nothing outside a sampled request. Other
+modules can also see every cache lookup through ``add_cache_listener``
+(BookOutlet.metrics counts hits and misses this way).
+"""
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_profile', default=None)
+
+_lock = threading.Lock()
+_routes = defaultdict(lambda: {
+    'count': 0,
+    'total_ms': deque(maxlen=settings.PROFILING_WINDOW),
+    'queries': 0,
+    'db_ms': 0.0,
+    'template_ms': 0.0,
+    'cache_hits': 0,
+    'cache_misses': 0,
+})
+_recent = deque(maxlen=50)
+
+_PROJECT_DIR = str(Path(settings.BASE_DIR).resolve())
+# Instrumentation modules whose frames are never reported as call sites
+_SKIPPED_FILES = {__file__}
+
+
+def skip_call_sites_in(filename):
+    _SKIPPED_FILES.add(filename)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.slow_queries = []
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        top = settings.PROFILING_TOP_QUERIES
+        if len(self.slow_queries) < top or seconds > self.slow_queries[-1][0]:
+            self.slow_queries.append((seconds, sql, call_site()))
+            self.slow_queries.sort(key=lambda query: -query[0])
+            del self.slow_queries[top:]
+
+
+def call_site():
+    """``path:line in function`` of the innermost project frame outside the instrumentation"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_DIR) and filename not in _SKIPPED_FILES and 'site-packages' not in filename:
+            relative = filename[len(_PROJECT_DIR) + 1:]
+            return f"{relative}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _time_queries(execute, sql, params, many, context):
+    profile = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if profile is not None:
+            profile.record_query(sql, time.perf_counter() - started)
+
+
+def _wrap_template_render(render):
+    @wraps(render)
+    def timed_render(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_seconds += time.perf_counter() - started
+    timed_render._profiled = True
+    return timed_render
+
+
+_MISS = object()
+
+# Called with (hits, misses) after every cache lookup
+_cache_listeners = []
+
+
+def add_cache_listener(listener):
+    if listener not in _cache_listeners:
+        _cache_listeners.append(listener)
+
+
+def _count_cache(profile, hits, misses):
+    if profile is not None:
+        profile.cache_hits += hits
+        profile.cache_misses += misses
+    for listener in _cache_listeners:
+        listener(hits, misses)
+
+
+def _wrap_cache_get(get):
+    @wraps(get)
+    def counted_get(self, key, default=None, version=None):
+        profile = _current.get()
+        if profile is None and not _cache_listeners:
+            return get(self, key, default, version)
+        value = get(self, key, _MISS, version)
+        if value is _MISS:
+            _count_cache(profile, 0, 1)
+            return default
+        _count_cache(profile, 1, 0)
+        return value
+    counted_get._profiled = True
+    return counted_get
+
+
+def _wrap_cache_get_many(get_many):
+    @wraps(get_many)
+    def counted_get_many(self, keys, version=None):
+        profile = _current.get()
+        if profile is None and not _cache_listeners:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        found = get_many(self, keys, version)
+        _count_cache(profile, len(found), len(keys) - len(found))
+        return found
+    counted_get_many._profiled = True
+    return counted_get_many
+
+
+def install_hooks():
+    """Wrap template rendering and the configured caches' lookups (once)"""
+    from django.template.backends.django import Template
+
+    if not getattr(Template.render, '_profiled', False):
+        Template.render = _wrap_template_render(Template.render)
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, '_profiled', False):
+            backend.get = _wrap_cache_get(backend.get)
+        if not getattr(backend.get_many, '_profiled', False):
+            backend.get_many = _wrap_cache_get_many(backend.get_many)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _record(route, method, status, total_seconds, profile):
+    entry = {
+        'route': route,
+        'method': method,
+        'status': status,
+        'total_ms': round(total_seconds * 1000, 2),
+        'queries': profile.queries,
+        'db_ms': round(profile.db_seconds * 1000, 2),
+        'template_ms': round(profile.template_seconds * 1000, 2),
+        'cache_hits': profile.cache_hits,
+        'cache_misses': profile.cache_misses,
+        'slow_queries': [
+            {'ms': round(seconds * 1000, 2), 'sql': sql[:500], 'call_site': site}
+            for seconds, sql, site in profile.slow_queries
+        ],
+    }
+    with _lock:
+        stats = _routes[route]
+        stats['count'] += 1
+        stats['total_ms'].append(entry['total_ms'])
+        stats['queries'] += profile.queries
+        stats['db_ms'] += entry['db_ms']
+        stats['template_ms'] += entry['template_ms']
+        stats['cache_hits'] += profile.cache_hits
+        stats['cache_misses'] += profile.cache_misses
+        _recent.append(entry)
+    logger.info(json.dumps(entry))
+
+
+def profiling_snapshot():
+    """Per-route percentiles and averages plus the most recent profiles"""
+    with _lock:
+        routes = {}
+        for route, stats in _routes.items():
+            ordered = sorted(stats['total_ms'])
+            count = stats['count']
+            lookups = stats['cache_hits'] + stats['cache_misses']
+            routes[route] = {
+                'samples': count,
+                'p50_ms': _percentile(ordered, 0.50),
+                'p95_ms': _percentile(ordered, 0.95),
+                'p99_ms': _percentile(ordered, 0.99),
+                'avg_queries': round(stats['queries'] / count, 1),
+                'avg_db_ms': round(stats['db_ms'] / count, 2),
+                'avg_template_ms': round(stats['template_ms'] / count, 2),
+                'cache_hit_ratio': round(stats['cache_hits'] / lookups, 3) if lookups else None,
+            }
+        return {
+            'enabled': settings.PROFILING_ENABLED,
+            'sample_rate': settings.PROFILING_SAMPLE_RATE,
+            'routes': routes,
+            'recent': list(_recent),
+        }
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+        _recent.clear()
+
+
+class ProfilingMiddleware:
+    """Put first in MIDDLEWARE so the total time covers the other middleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_hooks()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_time_queries))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unresolved'
+        _record(route, request.method, response.status_code, total, profile)
+        return response
@@ -0,0 +1,136 @@
+"""
+Slow query log and N+1 detector for development and staging.
+
+QueryWatchMiddleware (added to MIDDLEWARE when ``settings.QUERY_WATCH_ENABLED``
+is on, by default with DEBUG) watches every SQL statement of a request:
+
+- statements slower than ``SLOW_QUERY_MS`` are logged with the code that ran
+  them;
+- statements are fingerprinted (literals and ``IN`` lists collapsed, so
+  ``WHERE id = 3`` and ``WHERE id = 4`` share a shape) and when one shape
+  runs ``N_PLUS_ONE_THRESHOLD`` times or more from the same place, the
+  request is reported as an N+1.
+
+"The same place" is the template and line being rendered when the query ran
+(``book_outlet/cart.html:26``), or else the innermost project Python frame.
+Reports go to the ``BookOutlet.query_watch`` logger. With
+``N_PLUS_ONE_RAISE`` (``BOOKVERSE_N_PLUS_ONE_RAISE=1`` in CI) the request
+raises NPlusOneError instead, so a regression fails the tests that hit it.
+
+``QueryWatch`` is also a context manager for tests::
+
+    with QueryWatch(raise_errors=True):
+        self.client.get(url)
+"""
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Node
+
+from .profiling import call_site, skip_call_sites_in
+
+logger = logging.getLogger(__name__)
+
+skip_call_sites_in(__file__)
+
+_RENDER_ANNOTATED = Node.render_annotated.__code__
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)")
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """The shape of a statement: literals become ``?`` and ``IN`` lists ``(...)``"""
+    shape = _IN_LISTS.sub('(...)', _LITERALS.sub('?', sql))
+    return ' '.join(shape.split())
+
+
+def template_site():
+    """``template:line`` of the innermost template node being rendered, if any"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code is _RENDER_ANNOTATED:
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f"{origin.template_name}:{token.lineno}"
+        frame = frame.f_back
+    return None
+
+
+class QueryWatch:
+    def __init__(self, threshold=None, slow_ms=None, raise_errors=None):
+        self.threshold = threshold or settings.N_PLUS_ONE_THRESHOLD
+        self.slow_ms = settings.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        self.raise_errors = settings.N_PLUS_ONE_RAISE if raise_errors is None else raise_errors
+        self.label = 'block'
+        self.shapes = Counter()
+        self.examples = {}
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._stack.close()
+        if exc_type is None:
+            self.check()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            site = template_site() or call_site() or 'unknown'
+            key = (fingerprint(sql), site)
+            self.shapes[key] += 1
+            self.examples.setdefault(key, sql)
+            if elapsed_ms >= self.slow_ms:
+                logger.warning('Slow query (%.1f ms) at %s in %s: %s', elapsed_ms, site, self.label, sql[:500])
+
+    def repeated(self):
+        """(count, site, sql) for every shape run ``threshold`` times or more from one place"""
+        return [
+            (count, site, self.examples[shape, site])
+            for (shape, site), count in self.shapes.most_common()
+            if count >= self.threshold
+        ]
+
+    def check(self):
+        repeated = self.repeated()
+        if not repeated:
+            return
+        report = '; '.join(f'{count} queries at {site}: {sql[:200]}' for count, site, sql in repeated)
+        if self.raise_errors:
+            raise NPlusOneError(f'N+1 queries in {self.label}: {report}')
+        logger.warning('N+1 queries in %s: %s', self.label, report)
+
+
+class QueryWatchMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        watch = QueryWatch()
+        watch.label = request.path
+        with watch:
+            response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            if match is not None:
+                watch.label = match.view_name
+        return response
@@ -0,0 +1,180 @@
+"""
+"Customers also bought" recommendations.
+
+An offline job keeps a sparse item-item co-occurrence matrix in BookPairCount:
+two books co-occur when they are in the same order, or when the same reader
+rated both at least ``RECOMMENDATION_MIN_RATING``. Each run only folds in
+order lines and reviews added since the last JobCheckpoint, using set-based
+INSERT ... SELECT ... ON CONFLICT statements so the database does the
+counting. Similarity is cosine (co-count / sqrt(count_a * count_b)) and the
+top ``RECOMMENDATIONS_TOP_K`` neighbours of every book whose row or column
+changed are rewritten into BookRecommendation, where book_detail reads them
+with one indexed lookup.
+
+Incremental runs only ever add: order lines and reviews that are edited or
+deleted, and orders that are cancelled, stay in the counts, and a row whose
+transaction commits after a run with a higher id already folded in is past
+the checkpoint and never counted. So a run rebuilds everything from scratch
+instead once the last full rebuild is ``RECOMMENDATIONS_FULL_REBUILD_DAYS``
+old, which bounds how long such drift lasts.
+
+The SQL uses upserts and window functions (SQLite >= 3.25 or PostgreSQL).
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+
+from .models import BookPairCount, BookRecommendation, JobCheckpoint, OrderItem, Review
+
+ORDER_ITEMS_CHECKPOINT = 'recommendations:order_items'
+REVIEWS_CHECKPOINT = 'recommendations:reviews'
+# Position is the Unix time of the last full rebuild
+FULL_REBUILD_CHECKPOINT = 'recommendations:full'
+
+# Each chunk's ids appear twice in the ranking query; stay under SQLite's variable limit
+CHUNK_SIZE = 250
+
+PAIRS = BookPairCount._meta.db_table
+RECOMMENDATIONS = BookRecommendation._meta.db_table
+ORDER_ITEMS = OrderItem._meta.db_table
+REVIEWS = Review._meta.db_table
+
+UPSERT_PAIRS = f'''
+    INSERT INTO {PAIRS} (book_a_id, book_b_id, "count")
+    {{select}}
+    ON CONFLICT (book_a_id, book_b_id) DO UPDATE SET "count" = {PAIRS}."count" + excluded."count"
+'''
+
+# Every pair is counted once: a new row is paired with the earlier rows of its basket
+PAIRS_SELECT = f'''
+    SELECT CASE WHEN n.book_id < o.book_id THEN n.book_id ELSE o.book_id END,
+           CASE WHEN n.book_id < o.book_id THEN o.book_id ELSE n.book_id END,
+           COUNT(*)
+    FROM {{table}} n
+    JOIN {{table}} o ON o.{{basket}} = n.{{basket}} AND o.id < n.id AND o.book_id <> n.book_id {{extra_o}}
+    WHERE n.id > %s AND n.id <= %s {{extra_n}}
+    GROUP BY 1, 2
+'''
+
+DIAGONAL_SELECT = '''
+    SELECT book_id, book_id, COUNT(*)
+    FROM {table} n
+    WHERE n.id > %s AND n.id <= %s {extra_n}
+    GROUP BY book_id
+'''
+
+RANK_NEIGHBOURS = f'''
+    INSERT INTO {RECOMMENDATIONS} (book_id, recommended_id, score, "rank")
+    SELECT book_id, other_id, score, rn FROM (
+        SELECT p.book_id, p.other_id, p.score,
+               ROW_NUMBER() OVER (PARTITION BY p.book_id ORDER BY p.score DESC, p.other_id) AS rn
+        FROM (
+            SELECT pair.book_id, pair.other_id,
+                   pair.cnt / SQRT(1.0 * da."count" * db."count") AS score
+            FROM (
+                SELECT book_a_id AS book_id, book_b_id AS other_id, "count" AS cnt
+                FROM {PAIRS} WHERE book_a_id <> book_b_id AND book_a_id IN ({{ids}})
+                UNION ALL
+                SELECT book_b_id, book_a_id, "count"
+                FROM {PAIRS} WHERE book_a_id <> book_b_id AND book_b_id IN ({{ids}})
+            ) pair
+            JOIN {PAIRS} da ON da.book_a_id = pair.book_id AND da.book_b_id = pair.book_id
+            JOIN {PAIRS} db ON db.book_a_id = pair.other_id AND db.book_b_id = pair.other_id
+        ) p
+    ) ranked
+    WHERE rn <= %s
+'''
+
+
+def _sources():
+    """(checkpoint name, model, basket column, extra filter on n, extra filter on o, params)"""
+    min_rating = settings.RECOMMENDATION_MIN_RATING
+    return [
+        (ORDER_ITEMS_CHECKPOINT, OrderItem, 'order_id', '', '', []),
+        (REVIEWS_CHECKPOINT, Review, 'user_id', 'AND n.rating >= %s', 'AND o.rating >= %s', [min_rating]),
+    ]
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _fold_in(cursor, checkpoint, model, basket, extra_n, extra_o, extra_params):
+    """Add rows past the checkpoint to the pair counts; returns (rows, touched book ids)"""
+    start = checkpoint.position
+    end = model.objects.aggregate(Max('id'))['id__max'] or 0
+    if end <= start:
+        return 0, set()
+
+    table = model._meta.db_table
+    pairs_select = PAIRS_SELECT.format(table=table, basket=basket, extra_n=extra_n, extra_o=extra_o)
+    cursor.execute(UPSERT_PAIRS.format(select=pairs_select), [*extra_params, start, end, *extra_params])
+    diagonal_select = DIAGONAL_SELECT.format(table=table, extra_n=extra_n)
+    cursor.execute(UPSERT_PAIRS.format(select=diagonal_select), [start, end, *extra_params])
+
+    rows = model.objects.filter(id__gt=start, id__lte=end)
+    if model is Review:
+        rows = rows.filter(rating__gte=extra_params[0])
+    touched = set(rows.values_list('book_id', flat=True).distinct())
+
+    checkpoint.position = end
+    checkpoint.save(update_fields=['position', 'updated_at'])
+    return rows.count(), touched
+
+
+def _with_neighbours(book_ids):
+    """A book's count changes every score in its row and column"""
+    affected = set(book_ids)
+    for chunk in _chunks(book_ids):
+        pairs = BookPairCount.objects.filter(Q(book_a__in=chunk) | Q(book_b__in=chunk))
+        for book_a, book_b in pairs.values_list('book_a', 'book_b'):
+            affected.update((book_a, book_b))
+    return affected
+
+
+def _rank(cursor, book_ids, top_k):
+    for chunk in _chunks(book_ids):
+        BookRecommendation.objects.filter(book__in=chunk).delete()
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(RANK_NEIGHBOURS.format(ids=placeholders), [*chunk, *chunk, top_k])
+
+
+def build_recommendations(full=False, top_k=None):
+    """
+    Update co-occurrence counts and neighbour lists.
+
+    With ``full``, or when the last full rebuild is older than
+    ``RECOMMENDATIONS_FULL_REBUILD_DAYS``, everything is rebuilt from
+    scratch; otherwise only rows added since the previous run are processed.
+    """
+    top_k = top_k or settings.RECOMMENDATIONS_TOP_K
+    stats = {}
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        last_full, _ = JobCheckpoint.objects.select_for_update().get_or_create(name=FULL_REBUILD_CHECKPOINT)
+        now = int(time.time())
+        full = full or now - last_full.position >= settings.RECOMMENDATIONS_FULL_REBUILD_DAYS * 24 * 60 * 60
+        if full:
+            BookPairCount.objects.all().delete()
+            BookRecommendation.objects.all().delete()
+            last_full.position = now
+            last_full.save(update_fields=['position', 'updated_at'])
+
+        touched = set()
+        for name, model, basket, extra_n, extra_o, extra_params in _sources():
+            checkpoint, _ = JobCheckpoint.objects.select_for_update().get_or_create(name=name)
+            if full:
+                checkpoint.position = 0
+            stats[name], books = _fold_in(cursor, checkpoint, model, basket, extra_n, extra_o, extra_params)
+            touched |= books
+
+        affected = touched if full else _with_neighbours(touched)
+        _rank(cursor, affected, top_k)
+        stats['books'] = len(affected)
+        stats['full'] = full
+
+    return stats
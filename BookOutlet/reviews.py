@@ -0,0 +1,77 @@
+"""
+Review listing for the book detail pages.
+
+A book's reviews are shown ``REVIEWS_PAGE_SIZE`` at a time, newest or most
+helpful first. Each page is one range scan of the ``(book, created_at, id)`` or
+``(book, helpful_count, created_at, id)`` index, with the reviewers joined in
+and only the columns the page shows.
+
+Nearly every visitor only sees the first page, so the first page of each
+order is cached per book, together with the review count, and dropped after
+any review of the book is saved, deleted or voted helpful.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+from django.db.models import F
+
+from .models import Review, ReviewVote
+
+REVIEW_SORTS = {
+    'recent': ('-created_at', '-id'),
+    'helpful': ('-helpful_count', '-created_at', '-id'),
+}
+
+# What the review list shows; cached pages stay small and hold no user details
+REVIEW_FIELDS = ('book_id', 'rating', 'comment', 'helpful_count', 'created_at', 'user__username')
+
+
+def review_cache_key(book_id, sort):
+    return f'book_reviews:{book_id}:{sort}'
+
+
+def review_queryset(book_id, sort):
+    return (
+        Review.objects.filter(book_id=book_id)
+        .select_related('user')
+        .only(*REVIEW_FIELDS)
+        .order_by(*REVIEW_SORTS[sort])
+    )
+
+
+def parse_review_sort(value):
+    """A ``reviews_sort`` query parameter as a REVIEW_SORTS key"""
+    return value if value in REVIEW_SORTS else 'recent'
+
+
+def review_page(book_id, sort='recent', number=1):
+    """Page ``number`` of a book's reviews in ``sort`` order (bad numbers give the nearest page)"""
+    paginator = Paginator(review_queryset(book_id, sort), settings.REVIEWS_PAGE_SIZE)
+    if str(number or 1) != '1':
+        return paginator.get_page(number)
+
+    key = review_cache_key(book_id, sort)
+    cached = cache.get(key)
+    if cached is None:
+        page = paginator.page(1)
+        cached = (list(page.object_list), paginator.count)
+        cache.set(key, cached, settings.REVIEW_PAGE_CACHE_TTL)
+    reviews, paginator.count = cached
+    return Page(reviews, 1, paginator)
+
+
+def forget_review_pages(book_id):
+    cache.delete_many([review_cache_key(book_id, sort) for sort in REVIEW_SORTS])
+
+
+def mark_helpful(review, user):
+    """Count ``user``'s vote for ``review`` once; True if it was new"""
+    with transaction.atomic():
+        _, created = ReviewVote.objects.get_or_create(review=review, user=user)
+        if created:
+            Review.objects.filter(pk=review.pk).update(helpful_count=F('helpful_count') + 1)
+            # update() sends no signals
+            book_id = review.book_id
+            transaction.on_commit(lambda: forget_review_pages(book_id))
+    return created
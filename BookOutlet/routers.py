@@ -0,0 +1,80 @@
+"""
+Read-replica routing.
+
+Catalog reads (books, reviews and recommendations) are spread over the aliases listed in
+``settings.DATABASE_REPLICAS``; everything else, and every write, uses the
+primary (``default``). After a request writes, PrimaryPinningMiddleware keeps
+that session on the primary for ``REPLICA_PIN_SECONDS`` so users always see
+their own changes even if the replicas lag behind.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Models whose reads may be served by a replica
+REPLICA_MODELS = {'BookOutlet.book', 'BookOutlet.review', 'BookOutlet.bookrecommendation'}
+
+# Writes to these don't pin the session: the session itself is saved on every
+# request, and queued tasks, job checkpoints and rate-limit buckets are
+# bookkeeping a page view can write without changing anything the user reads
+UNPINNED_WRITE_MODELS = {
+    'sessions.session', 'BookOutlet.task', 'BookOutlet.jobcheckpoint', 'BookOutlet.throttlebucket',
+}
+
+SESSION_KEY = '_db_primary_until'
+
+_pinned = ContextVar('db_pinned_to_primary', default=False)
+_wrote = ContextVar('db_wrote_in_request', default=False)
+
+
+def pin_to_primary():
+    """Send the rest of this request's reads to the primary"""
+    _pinned.set(True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and not _pinned.get() and model._meta.label_lower in REPLICA_MODELS:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.label_lower not in UNPINNED_WRITE_MODELS:
+            _pinned.set(True)
+            _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the primary, so objects can be related freely
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary (see sync_replicas)
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """Must come after SessionMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        pinned_until = request.session.get(SESSION_KEY, 0)
+        pinned_token = _pinned.set(pinned_until > time.time())
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                request.session[SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+            return response
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
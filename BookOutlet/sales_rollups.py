@@ -0,0 +1,196 @@
+"""
+Sales rollups.
+
+SalesRollup keeps revenue, units and order counts per hour and per day for
+every genre, author and book, plus store totals, so range questions such as
+"revenue per genre per day last month" read a few hundred rollup rows
+instead of joining every OrderItem to Order and Book.
+
+Rollups are additive. When an order becomes sold (confirmed, shipped or
+delivered) its lines are added once; if it is cancelled afterwards they are
+subtracted again. ``Order.sales_rolled_up`` records whether an order is
+currently counted and is flipped with a conditional UPDATE in the same
+transaction as the rollup change, so retried tasks and concurrent rebuilds
+never count an order twice. transition() queues ``roll_up_order`` whenever
+an order moves in or out of the sold statuses.
+
+``rebuild_sales_rollups`` recomputes everything from a given day in batches
+of orders, including archived orders.
+"""
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, SalesRollup
+
+SOLD_STATUSES = ('confirmed', 'shipped', 'delivered')
+GRANULARITIES = ('hour', 'day')
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+ROLLUPS = SalesRollup._meta.db_table
+ORDERS = Order._meta.db_table
+
+# Rows per INSERT; 7 parameters each
+UPSERT_CHUNK = 500
+
+UPSERT = f'''
+    INSERT INTO {ROLLUPS} (granularity, bucket, dimension, "key", revenue, units, orders)
+    VALUES {{values}}
+    ON CONFLICT (granularity, dimension, "key", bucket) DO UPDATE SET
+        revenue = {ROLLUPS}.revenue + excluded.revenue,
+        units = {ROLLUPS}.units + excluded.units,
+        orders = {ROLLUPS}.orders + excluded.orders
+'''
+
+# Marks a batch of sold orders as counted and says which ones this call claimed
+# (RETURNING needs SQLite >= 3.35 or PostgreSQL)
+CLAIM_ORDERS = f'''
+    UPDATE {ORDERS} SET sales_rolled_up = TRUE
+    WHERE id >= %s AND id < %s AND created_at >= %s AND NOT sales_rolled_up
+      AND status IN ({", ".join(f"'{status}'" for status in SOLD_STATUSES)})
+    RETURNING id
+'''
+
+
+def bucket_start(moment, granularity):
+    moment = timezone.localtime(moment)
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _aggregate(lines, sign):
+    """``lines`` are (order id, created_at, book id, genre, author, quantity, price) tuples"""
+    totals = defaultdict(lambda: [Decimal(0), 0, set()])
+    for order_id, created_at, book_id, genre, author, quantity, price in lines:
+        revenue = price * quantity
+        keys = (
+            ('total', ''),
+            ('genre', genre or ''),
+            ('author', author or ''),
+            ('book', str(book_id) if book_id else ''),
+        )
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(created_at, granularity)
+            for dimension, key in keys:
+                total = totals[granularity, bucket, dimension, key]
+                total[0] += revenue
+                total[1] += quantity
+                total[2].add(order_id)
+    return [
+        (granularity, bucket, dimension, key, sign * revenue, sign * units, sign * len(orders))
+        for (granularity, bucket, dimension, key), (revenue, units, orders) in totals.items()
+    ]
+
+
+def _upsert(cursor, rows):
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        chunk = rows[start:start + UPSERT_CHUNK]
+        params = []
+        for granularity, bucket, dimension, key, revenue, units, orders in chunk:
+            params += [granularity, connection.ops.adapt_datetimefield_value(bucket), dimension, key, revenue, units, orders]
+        values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(chunk))
+        cursor.execute(UPSERT.format(values=values), params)
+
+
+def _order_lines(order_ids):
+    return (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list('order_id', 'order__created_at', 'book_id', 'book__genre', 'book__author', 'quantity', 'price')
+    )
+
+
+def _archived_lines(order_ids):
+    return (
+        ArchivedOrderItem.objects.filter(order_id__in=order_ids)
+        .values_list('order_id', 'order__created_at', 'book_id', 'book__genre', 'book__author', 'quantity', 'price')
+    )
+
+
+@transaction.atomic
+def roll_up_order(order_id):
+    """Add or remove one order's sales so the rollups match its current status"""
+    sold = Order.objects.filter(pk=order_id, status__in=SOLD_STATUSES)
+    if sold.filter(sales_rolled_up=False).update(sales_rolled_up=True):
+        sign = 1
+    elif Order.objects.filter(pk=order_id, sales_rolled_up=True).exclude(status__in=SOLD_STATUSES).update(sales_rolled_up=False):
+        sign = -1
+    else:
+        return False
+    with connection.cursor() as cursor:
+        _upsert(cursor, _aggregate(_order_lines([order_id]), sign))
+    return True
+
+
+def rebuild_sales_rollups(since=None, batch_size=1000):
+    """
+    Recompute rollups from orders placed on or after the day ``since`` (a
+    date; everything if None). Each batch of orders commits on its own;
+    orders confirmed meanwhile are counted by their own task instead.
+    Returns the number of orders counted.
+    """
+    start = timezone.make_aware(datetime.combine(since, dt_time.min)) if since else None
+    claim_from = connection.ops.adapt_datetimefield_value(start or EPOCH)
+    orders = Order.objects.all()
+    archived = ArchivedOrder.objects.all()
+    rollups = SalesRollup.objects.all()
+    if start is not None:
+        orders = orders.filter(created_at__gte=start)
+        archived = archived.filter(created_at__gte=start)
+        rollups = rollups.filter(bucket__gte=start)
+
+    with transaction.atomic():
+        rollups.delete()
+        orders.filter(sales_rolled_up=True).update(sales_rolled_up=False)
+
+    counted = 0
+    archived_ids = list(archived.values_list('id', flat=True).order_by('id'))
+    for offset in range(0, len(archived_ids), batch_size):
+        batch = archived_ids[offset:offset + batch_size]
+        with transaction.atomic(), connection.cursor() as cursor:
+            _upsert(cursor, _aggregate(_archived_lines(batch), 1))
+        counted += len(batch)
+
+    # Walk id ranges; claiming by range keeps the statement size fixed
+    bounds = orders.order_by('id').values_list('id', flat=True)
+    first, last = bounds.first(), bounds.last()
+    if first is None:
+        return counted
+    for low in range(first, last + 1, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(CLAIM_ORDERS, [low, low + batch_size, claim_from])
+            claimed = [row[0] for row in cursor.fetchall()]
+            if claimed:
+                _upsert(cursor, _aggregate(_order_lines(claimed), 1))
+        counted += len(claimed)
+    return counted
+
+
+def _range(granularity, dimension, start, end):
+    return SalesRollup.objects.filter(
+        granularity=granularity, dimension=dimension, bucket__gte=start, bucket__lt=end
+    )
+
+
+def rollup_series(granularity, dimension, start, end, key=''):
+    """Per-bucket figures for one key (the store total for dimension 'total')"""
+    return list(
+        _range(granularity, dimension, start, end)
+        .filter(key=key)
+        .order_by('bucket')
+        .values('bucket', 'revenue', 'units', 'orders')
+    )
+
+
+def top_keys(granularity, dimension, start, end, limit=20):
+    """The best-selling keys of a dimension over the range"""
+    return list(
+        _range(granularity, dimension, start, end)
+        .values('key')
+        .annotate(total_revenue=Sum('revenue'), total_units=Sum('units'), total_orders=Sum('orders'))
+        .order_by('-total_revenue')[:limit]
+    )
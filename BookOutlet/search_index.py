@@ -0,0 +1,454 @@
+"""
+In-memory catalog indexes for search-as-you-type suggestions and
+typo-tolerant search.
+
+PrefixIndex: every book contributes a handful of keys, namely each word-start
+suffix of its title and author ("great gatsby" and "gatsby" for "The Great
+Gatsby") plus its ISBN digits. Keys are kept in one sorted list, so a prefix
+lookup is a ``bisect`` followed by a short scan and never touches the
+database.
+
+FuzzyIndex: a trigram index over the distinct words of all titles and
+authors. A misspelt query word is matched against the vocabulary by counting
+shared trigrams over the posting lists (Dice coefficient), and the matching
+words lead to books through a word -> books map. Because the vocabulary is
+far smaller than the catalog, this stays fast on very large catalogs.
+
+The index is built on first use (the WSGI/ASGI entry points warm it in the
+background once a worker process starts serving) and kept current by the
+Book signals in signals.py. Each change also bumps a version counter in the
+cache and logs the changed book id under the new version. Every
+``SEARCH_INDEX_CHECK_INTERVAL`` seconds a process reads the counter and
+reloads just the logged books with one primary-key query; only when it has
+fallen too far behind, or log entries were evicted, does it rebuild the
+whole index in the background (serving the old one meanwhile).
+
+Other processes only see the counter and log through a shared cache: with
+the default per-process LocMemCache, run a single web process or set
+``BOOKVERSE_REDIS_URL``, or each worker keeps its own view of the catalog
+until it restarts.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connection
+
+VERSION_CACHE_KEY = 'search_index:version'
+CHANGE_CACHE_KEY = 'search_index:change:{}'
+
+# How long a change stays in the log, and how many a process catches up on
+# before it rebuilds instead
+CHANGE_LOG_TTL = 60 * 60
+MAX_CATCH_UP = 500
+
+# Only the first few words of a long title/author get their own key
+MAX_WORDS = 8
+
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = text or ''
+    if not text.isascii():
+        text = ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(' ', text.lower()).strip()
+
+
+def book_keys(title, author, isbn):
+    keys = set()
+    for text in (title, author):
+        words = normalize(text).split()
+        for start in range(min(len(words), MAX_WORDS)):
+            keys.add(' '.join(words[start:]))
+    isbn_digits = ''.join(ch for ch in (isbn or '') if ch.isalnum()).lower()
+    if isbn_digits:
+        keys.add(isbn_digits)
+    return keys
+
+
+class PrefixIndex:
+    def __init__(self, rows=()):
+        """``rows`` are ``(id, title, author, isbn)`` tuples"""
+        self._lock = threading.RLock()
+        self._books = {}
+        self._keys = {}
+        entries = []
+        for book_id, title, author, isbn in rows:
+            keys = book_keys(title, author, isbn)
+            self._books[book_id] = (title, author)
+            self._keys[book_id] = keys
+            entries.extend((key, book_id) for key in keys)
+        entries.sort()
+        self._entries = entries
+
+    def __len__(self):
+        return len(self._books)
+
+    def add(self, book_id, title, author, isbn):
+        """Insert or replace a book"""
+        with self._lock:
+            self.remove(book_id)
+            keys = book_keys(title, author, isbn)
+            self._books[book_id] = (title, author)
+            self._keys[book_id] = keys
+            for key in keys:
+                insort(self._entries, (key, book_id))
+
+    def remove(self, book_id):
+        with self._lock:
+            self._books.pop(book_id, None)
+            for key in self._keys.pop(book_id, ()):
+                position = bisect_left(self._entries, (key, book_id))
+                if position < len(self._entries) and self._entries[position] == (key, book_id):
+                    del self._entries[position]
+
+    def suggest(self, query, limit=8):
+        """Up to ``limit`` ``(id, title, author)`` tuples whose title, author or ISBN starts with ``query``"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            entries = self._entries
+            position = bisect_left(entries, (prefix,))
+            while position < len(entries) and len(results) < limit:
+                key, book_id = entries[position]
+                if not key.startswith(prefix):
+                    break
+                if book_id not in seen:
+                    seen.add(book_id)
+                    results.append((book_id, *self._books[book_id]))
+                position += 1
+        return results
+
+
+def trigrams(word):
+    # Padded by one space: a leading "  x" gram would match every word starting with x
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    # Words less similar than this are ignored
+    MIN_WORD_SIMILARITY = 0.45
+    # Upper bound on books scored per query
+    MAX_CANDIDATES = 5000
+    # Query words whose matches are remembered (cleared when the vocabulary grows)
+    WORD_CACHE_SIZE = 10000
+
+    def __init__(self, rows=()):
+        """``rows`` are ``(id, title, author, isbn)`` tuples"""
+        self._lock = threading.RLock()
+        self._word_ids = {}
+        self._words = []
+        self._word_sizes = []
+        self._word_books = []
+        self._postings = defaultdict(list)
+        self._book_words = {}
+        self._similar_cache = {}
+        for book_id, title, author, _ in rows:
+            self._add(book_id, title, author)
+
+    def _word_id(self, word):
+        word_id = self._word_ids.get(word)
+        if word_id is None:
+            self._similar_cache.clear()
+            word_id = self._word_ids[word] = len(self._words)
+            self._words.append(word)
+            grams = trigrams(word)
+            self._word_sizes.append(len(grams))
+            self._word_books.append(set())
+            for gram in grams:
+                self._postings[gram].append(word_id)
+        return word_id
+
+    def _add(self, book_id, title, author):
+        word_ids = {self._word_id(word) for word in f"{normalize(title)} {normalize(author)}".split()}
+        for word_id in word_ids:
+            self._word_books[word_id].add(book_id)
+        self._book_words[book_id] = word_ids
+
+    def add(self, book_id, title, author, isbn):
+        with self._lock:
+            self.remove(book_id)
+            self._add(book_id, title, author)
+
+    def remove(self, book_id):
+        # Words stay in the vocabulary; they just stop pointing at the book
+        with self._lock:
+            for word_id in self._book_words.pop(book_id, ()):
+                self._word_books[word_id].discard(book_id)
+
+    def similar_words(self, word):
+        """``{word id: similarity}`` for vocabulary words sharing enough trigrams with ``word``"""
+        matches = self._similar_cache.get(word)
+        if matches is not None:
+            return matches
+
+        threshold = self.MIN_WORD_SIMILARITY
+        grams = sorted(trigrams(word), key=lambda gram: len(self._postings.get(gram, ())))
+        size = len(grams)
+        # 2c / (n + m) >= t with m >= c means a match shares at least t * n / (2 - t)
+        # trigrams, so it must contain one of the n - that + 1 rarest ones
+        min_shared = math.ceil(threshold * size / (2 - threshold))
+        rare, common = grams[:size - min_shared + 1], grams[size - min_shared + 1:]
+
+        shared = Counter()
+        for gram in rare:
+            # Counter.update over a list counts in C, for the whole posting list at once
+            shared.update(self._postings.get(gram, ()))
+        words = self._words
+        sizes = self._word_sizes
+        matches = {}
+        for word_id, count in shared.items():
+            if common:
+                # Cheaper than walking the long posting lists of the common trigrams
+                padded = f" {words[word_id]} "
+                count += sum(gram in padded for gram in common)
+            if count >= min_shared:
+                score = 2 * count / (size + sizes[word_id])
+                if score >= threshold:
+                    matches[word_id] = score
+
+        if len(self._similar_cache) >= self.WORD_CACHE_SIZE:
+            self._similar_cache.clear()
+        self._similar_cache[word] = matches
+        return matches
+
+    def search(self, query, limit=20, min_score=0.4):
+        """``[(book id, score), ...]``, best first; score is the mean best word similarity per query word"""
+        words = normalize(query).split()
+        if not words:
+            return []
+
+        with self._lock:
+            matches = [self.similar_words(word) for word in words]
+            sizes = [sum(len(self._word_books[w]) for w in match) for match in matches]
+            # Candidates come from the rarer query words; much more common ones only rank them
+            limit_size = min(max(min(sizes) * 4, 1000), self.MAX_CANDIDATES)
+            selective = [i for i, size in enumerate(sizes) if size <= limit_size]
+            if not selective:
+                selective = [min(range(len(words)), key=sizes.__getitem__)]
+
+            best = {}
+            for i in selective:
+                # Strongest word matches first, so a capped candidate set keeps the best books
+                for word_id, score in sorted(matches[i].items(), key=lambda item: -item[1]):
+                    for book_id in self._word_books[word_id]:
+                        scores = best.get(book_id)
+                        if scores is None:
+                            if len(best) >= self.MAX_CANDIDATES:
+                                continue
+                            scores = best[book_id] = [0.0] * len(words)
+                        if score > scores[i]:
+                            scores[i] = score
+
+            # Common query words (like "the") only contribute to candidates found above
+            for i in set(range(len(words))) - set(selective):
+                match = matches[i]
+                for book_id, scores in best.items():
+                    scores[i] = max((match.get(w, 0.0) for w in self._book_words.get(book_id, ())), default=0.0)
+
+        ranked = ((sum(scores) / len(words), book_id) for book_id, scores in best.items())
+        return [(book_id, score) for score, book_id in heapq.nlargest(limit, ranked) if score >= min_score]
+
+
+class CatalogIndex:
+    """The suggestion and fuzzy indexes for one process, built from the same rows"""
+
+    def __init__(self, rows=()):
+        rows = list(rows)
+        self.prefix = PrefixIndex(rows)
+        self.fuzzy = FuzzyIndex(rows)
+
+    def __len__(self):
+        return len(self.prefix)
+
+    def add(self, book_id, title, author, isbn):
+        self.prefix.add(book_id, title, author, isbn)
+        self.fuzzy.add(book_id, title, author, isbn)
+
+    def remove(self, book_id):
+        self.prefix.remove(book_id)
+        self.fuzzy.remove(book_id)
+
+    def suggest(self, query, limit=8):
+        return self.prefix.suggest(query, limit)
+
+    def search(self, query, limit=20, min_score=0.4):
+        return self.fuzzy.search(query, limit, min_score)
+
+
+_index = None
+_index_version = None
+_checked_at = 0.0
+_build_lock = threading.Lock()
+_rebuilding = False
+
+
+def _current_version():
+    return cache.get_or_set(VERSION_CACHE_KEY, 0, None)
+
+
+def build_index():
+    from .models import Book
+
+    rows = Book.objects.values_list('id', 'title', 'author', 'isbn').iterator(chunk_size=5000)
+    return CatalogIndex(rows)
+
+
+def _rebuild(version):
+    global _index, _index_version, _rebuilding
+    try:
+        index = build_index()
+        with _build_lock:
+            _index, _index_version = index, version
+    finally:
+        _rebuilding = False
+        connection.close()
+
+
+def _logged_changes(start, version):
+    """
+    ``(book ids, version reached)`` for the logged changes after ``start``,
+    or None if some are gone for good and only a rebuild can catch up
+    """
+    versions = range(start + 1, version + 1)
+    changes = cache.get_many([CHANGE_CACHE_KEY.format(v) for v in versions])
+    book_ids = []
+    for v in versions:
+        key = CHANGE_CACHE_KEY.format(v)
+        if key not in changes:
+            # The newest entries may still be on their way; a hole below
+            # later entries was evicted
+            if any(CHANGE_CACHE_KEY.format(later) in changes for later in range(v + 1, version + 1)):
+                return None
+            return book_ids, v - 1
+        book_ids.append(changes[key])
+    return book_ids, version
+
+
+def _catch_up(version):
+    """Apply other processes' changes since ``_index_version``; False if a rebuild is needed"""
+    global _index_version
+    if not _index_version <= version <= _index_version + MAX_CATCH_UP:
+        return False
+    logged = _logged_changes(_index_version, version)
+    if logged is None:
+        return False
+    from .models import Book
+
+    book_ids, reached = logged
+    rows = Book.objects.filter(pk__in=set(book_ids)).values_list('id', 'title', 'author', 'isbn')
+    found = set()
+    for book_id, title, author, isbn in rows:
+        _index.add(book_id, title, author, isbn)
+        found.add(book_id)
+    for book_id in set(book_ids) - found:
+        _index.remove(book_id)
+    _index_version = reached
+    return True
+
+
+def get_index():
+    """The process-wide index, built on first use and kept up with other processes' changes"""
+    global _index, _index_version, _checked_at, _rebuilding
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _index_version = _current_version()
+                _index = build_index()
+        return _index
+
+    now = time.monotonic()
+    if now - _checked_at > settings.SEARCH_INDEX_CHECK_INTERVAL:
+        _checked_at = now
+        version = _current_version()
+        # One thread catches up; the others keep serving the index as it is
+        if version != _index_version and not _rebuilding and _build_lock.acquire(blocking=False):
+            try:
+                if not _catch_up(version):
+                    _rebuilding = True
+                    threading.Thread(target=_rebuild, args=(version,), daemon=True).start()
+            finally:
+                _build_lock.release()
+    return _index
+
+
+def _preload():
+    try:
+        get_index()
+    finally:
+        connection.close()
+
+
+def _start_preload(**kwargs):
+    request_started.disconnect(_start_preload)
+    threading.Thread(target=_preload, daemon=True).start()
+
+
+def preload():
+    """
+    Build the index in a background thread when the process serves its first
+    request, so the first keystrokes don't wait. Not at import: a
+    pre-forking server would copy a half-built index and a held lock into
+    every worker.
+    """
+    request_started.connect(_start_preload)
+
+
+def _reset_after_fork():
+    global _build_lock, _rebuilding
+    # A thread of the parent may have held the lock; it doesn't exist in the child
+    _build_lock = threading.Lock()
+    _rebuilding = False
+
+
+if hasattr(os, 'register_at_fork'):  # POSIX only
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _bump_version(book_id):
+    global _index_version
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+        version = 1
+    cache.set(CHANGE_CACHE_KEY.format(version), book_id, CHANGE_LOG_TTL)
+    # Our own change is already applied; only skip the rebuild if nobody else changed anything
+    if _index_version is not None and version == _index_version + 1:
+        _index_version = version
+
+
+def book_changed(book):
+    if _index is not None:
+        _index.add(book.pk, book.title, book.author, book.isbn)
+    _bump_version(book.pk)
+
+
+def book_removed(book_id):
+    if _index is not None:
+        _index.remove(book_id)
+    _bump_version(book_id)
+
+
+def suggest(query, limit=8):
+    return get_index().suggest(query, limit)
+
+
+def fuzzy_search(query, limit=20, min_score=0.4):
+    return get_index().search(query, limit, min_score)
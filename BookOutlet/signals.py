@@ -0,0 +1,62 @@
+"""
+Model signal handlers, connected by BookOutletConfig.ready() so importing
+the models stays free of side effects.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Book, Review, UserProfile
+
+
+# Create a UserProfile when a User is created
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, **kwargs):
+    if created:
+        UserProfile.objects.create(user=instance)
+        from .tasks import enqueue
+        enqueue('refresh_store_stats')
+
+# Store statistics and ratings are recomputed by the task worker
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    from . import search_index
+    transaction.on_commit(lambda: search_index.book_changed(instance))
+    if created:
+        from .tasks import enqueue
+        enqueue('refresh_store_stats')
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    from . import search_index
+    from .tasks import enqueue
+    book_id = instance.pk
+    transaction.on_commit(lambda: search_index.book_removed(book_id))
+    enqueue('refresh_store_stats')
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    from .reviews import forget_review_pages
+    book_id = instance.book_id
+    transaction.on_commit(lambda: forget_review_pages(book_id))
+    if created:
+        from .tasks import enqueue
+        enqueue('refresh_store_stats')
+        enqueue('build_home_feed', user_id=instance.user_id)
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, created, **kwargs):
+    # Favourite genres may have changed
+    if not created:
+        from .tasks import enqueue
+        enqueue('build_home_feed', user_id=instance.user_id)
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    from .reviews import forget_review_pages
+    from .tasks import enqueue
+    book_id = instance.book_id
+    transaction.on_commit(lambda: forget_review_pages(book_id))
+    enqueue('update_book_rating', book_id=instance.book_id)
+    enqueue('refresh_store_stats')
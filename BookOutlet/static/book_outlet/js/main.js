@@ -8,38 +8,28 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize all functionality
     initializeBookInteractions();
     initializeSearchFunctionality();
+    initializeSearchSuggestions();
     initializeFormHandling();
     initializeMessageHandling();
     initializeBookCounter();
+    initializeLazyImages(document);
+    initializeInfiniteScroll();
 });
 
-// Book item click interactions
+// Book item click interactions: one listener on the document covers every
+// .book-item, including those rendered later (React, infinite scroll).
+// The hover effect is plain CSS (.book-item:hover in styles.css).
 function initializeBookInteractions() {
-    const bookItems = document.querySelectorAll('.book-item');
-    
-    bookItems.forEach(function(item) {
-        // Add click event to navigate to book details
-        item.addEventListener('click', function() {
-            const bookId = this.getAttribute('data-book-id');
-            if (bookId) {
-                console.log('Navigating to book ID:', bookId);
-                window.location.href = '/book-outlet/books/' + bookId + '/';
-            }
-        });
-        
-        // Add hover effects
-        item.addEventListener('mouseenter', function() {
-            this.style.transform = 'translateX(8px)';
-            this.style.boxShadow = '0 4px 12px rgba(0,0,0,0.15)';
-        });
-        
-        item.addEventListener('mouseleave', function() {
-            this.style.transform = 'translateX(0)';
-            this.style.boxShadow = 'none';
-        });
+    document.addEventListener('click', function(e) {
+        const item = e.target.closest('.book-item');
+        const bookId = item ? item.getAttribute('data-book-id') : null;
+        if (bookId) {
+            console.log('Navigating to book ID:', bookId);
+            window.location.href = '/book-outlet/books/' + bookId + '/';
+        }
     });
     
-    console.log('Initialized book interactions for ' + bookItems.length + ' books');
+    console.log('Initialized book interactions');
 }
 
 // Search functionality for books
@@ -91,6 +81,199 @@ function initializeSearchFunctionality() {
     }
 }
 
+// Typeahead suggestions for search boxes with a data-suggest-url
+function initializeSearchSuggestions() {
+    const inputs = document.querySelectorAll('input[data-suggest-url]');
+    
+    inputs.forEach(function(input) {
+        const list = document.createElement('div');
+        list.className = 'list-group search-suggestions';
+        list.style.position = 'absolute';
+        list.style.top = '100%';
+        list.style.left = '0';
+        list.style.right = '0';
+        list.style.zIndex = '1000';
+        input.parentNode.style.position = 'relative';
+        input.parentNode.appendChild(list);
+        
+        let timer = null;
+        let controller = null;
+        
+        function clearSuggestions() {
+            list.innerHTML = '';
+        }
+        
+        function showSuggestions(results) {
+            clearSuggestions();
+            results.forEach(function(book) {
+                const link = document.createElement('a');
+                link.href = book.url;
+                link.className = 'list-group-item list-group-item-action';
+                const title = document.createElement('strong');
+                title.textContent = book.title;
+                const author = document.createElement('small');
+                author.className = 'text-muted ms-2';
+                author.textContent = book.author;
+                link.appendChild(title);
+                link.appendChild(author);
+                list.appendChild(link);
+            });
+        }
+        
+        input.addEventListener('input', function() {
+            const query = this.value.trim();
+            clearTimeout(timer);
+            if (!query) {
+                clearSuggestions();
+                return;
+            }
+            // Wait for a pause in typing, and drop answers to older keystrokes
+            timer = setTimeout(function() {
+                if (controller) {
+                    controller.abort();
+                }
+                controller = new AbortController();
+                const url = input.dataset.suggestUrl + '?q=' + encodeURIComponent(query);
+                fetch(url, { signal: controller.signal })
+                    .then(function(response) { return response.json(); })
+                    .then(function(data) { showSuggestions(data.results); })
+                    .catch(function(error) {
+                        if (error.name !== 'AbortError') {
+                            console.error('Suggestion request failed:', error);
+                        }
+                    });
+            }, 150);
+        });
+        
+        input.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') {
+                clearSuggestions();
+            }
+        });
+        
+        // Delay so clicks on a suggestion land before the list disappears
+        input.addEventListener('blur', function() {
+            setTimeout(clearSuggestions, 200);
+        });
+    });
+    
+    if (inputs.length) {
+        console.log('Search suggestions initialized for ' + inputs.length + ' inputs');
+    }
+}
+
+// Lazy cover images: covers carry their real URLs in data-src/data-srcset
+// and only get them when they come near the viewport
+let lazyImageObserver = null;
+
+function loadLazyImage(img) {
+    const picture = img.parentNode;
+    if (picture && picture.tagName === 'PICTURE') {
+        picture.querySelectorAll('source[data-srcset]').forEach(function(source) {
+            source.srcset = source.dataset.srcset;
+            source.removeAttribute('data-srcset');
+        });
+    }
+    if (img.dataset.srcset) {
+        img.srcset = img.dataset.srcset;
+        img.removeAttribute('data-srcset');
+    }
+    img.src = img.dataset.src;
+    img.removeAttribute('data-src');
+}
+
+function initializeLazyImages(root) {
+    const images = root.querySelectorAll('img[data-src]');
+    
+    if (!('IntersectionObserver' in window)) {
+        images.forEach(loadLazyImage);
+        return;
+    }
+    if (!lazyImageObserver) {
+        lazyImageObserver = new IntersectionObserver(function(entries, observer) {
+            entries.forEach(function(entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    loadLazyImage(entry.target);
+                }
+            });
+        }, { rootMargin: '200px 0px' });
+    }
+    // Observing an image twice is a no-op, so a root may be scanned again
+    images.forEach(function(img) {
+        lazyImageObserver.observe(img);
+    });
+}
+
+// Infinite scroll: the next page of book cards comes from the fragment URL
+// on the [data-next-url] sentinel, fetched before the reader reaches it
+function initializeInfiniteScroll() {
+    const list = document.querySelector('[data-infinite-list]');
+    
+    if (!list) {
+        return;
+    }
+    
+    let loading = false;
+    const observer = 'IntersectionObserver' in window ? new IntersectionObserver(function(entries) {
+        entries.forEach(function(entry) {
+            if (entry.isIntersecting) {
+                loadNextPage(entry.target);
+            }
+        });
+    }, { rootMargin: '800px 0px' }) : null;
+    
+    function watchSentinel() {
+        const sentinel = list.querySelector('[data-next-url]');
+        if (sentinel && observer) {
+            observer.observe(sentinel);
+        }
+    }
+    
+    function loadNextPage(sentinel) {
+        if (loading) {
+            return;
+        }
+        loading = true;
+        if (observer) {
+            observer.unobserve(sentinel);
+        }
+        fetch(sentinel.dataset.nextUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.text();
+            })
+            .then(function(html) {
+                // The fragment brings its own sentinel unless it is the last page
+                sentinel.insertAdjacentHTML('beforebegin', html);
+                sentinel.remove();
+                initializeLazyImages(list);
+                watchSentinel();
+            })
+            .catch(function(error) {
+                // The "Load more" link still works as a plain link
+                console.error('Loading more books failed:', error);
+            })
+            .finally(function() {
+                loading = false;
+            });
+    }
+    
+    // One listener for the "Load more" links of every page
+    list.addEventListener('click', function(e) {
+        const link = e.target.closest('[data-load-more]');
+        if (link) {
+            e.preventDefault();
+            loadNextPage(link.closest('[data-next-url]'));
+        }
+    });
+    
+    watchSentinel();
+    console.log('Infinite scroll initialized');
+}
+
 // Update search results counter
 function updateSearchResultsCounter(visible, total) {
     let counterElement = document.getElementById('search-results-counter');
@@ -118,43 +301,39 @@ function updateSearchResultsCounter(visible, total) {
 
 // Form handling and validation
 function initializeFormHandling() {
-    const forms = document.querySelectorAll('form');
-    
-    forms.forEach(function(form) {
-        form.addEventListener('submit', function(e) {
-            const submitBtn = this.querySelector('input[type="submit"], button[type="submit"]');
+    // Delegated, so forms added after page load (infinite scroll) are covered too
+    document.addEventListener('submit', function(e) {
+        const submitBtn = e.target.querySelector('input[type="submit"], button[type="submit"]');
+        
+        if (submitBtn) {
+            // Disable button and show loading state
+            submitBtn.disabled = true;
+            submitBtn.style.opacity = '0.7';
+            submitBtn.style.cursor = 'not-allowed';
             
-            if (submitBtn) {
-                // Disable button and show loading state
-                submitBtn.disabled = true;
-                submitBtn.style.opacity = '0.7';
-                submitBtn.style.cursor = 'not-allowed';
-                
-                const originalText = submitBtn.value || submitBtn.textContent;
-                submitBtn.value = 'Processing...';
-                submitBtn.textContent = 'Processing...';
-                
-                // Re-enable button after 5 seconds (in case of error)
-                setTimeout(function() {
-                    submitBtn.disabled = false;
-                    submitBtn.style.opacity = '1';
-                    submitBtn.style.cursor = 'pointer';
-                    submitBtn.value = originalText;
-                    submitBtn.textContent = originalText;
-                }, 5000);
-            }
-        });
+            const originalText = submitBtn.value || submitBtn.textContent;
+            submitBtn.value = 'Processing...';
+            submitBtn.textContent = 'Processing...';
+            
+            // Re-enable button after 5 seconds (in case of error)
+            setTimeout(function() {
+                submitBtn.disabled = false;
+                submitBtn.style.opacity = '1';
+                submitBtn.style.cursor = 'pointer';
+                submitBtn.value = originalText;
+                submitBtn.textContent = originalText;
+            }, 5000);
+        }
     });
     
-    // Real-time form validation
-    const emailFields = document.querySelectorAll('input[type="email"]');
-    emailFields.forEach(function(field) {
-        field.addEventListener('blur', function() {
-            validateEmailField(this);
-        });
+    // Real-time form validation (focusout bubbles, blur does not)
+    document.addEventListener('focusout', function(e) {
+        if (e.target.matches('input[type="email"]')) {
+            validateEmailField(e.target);
+        }
     });
     
-    console.log('Form handling initialized for ' + forms.length + ' forms');
+    console.log('Form handling initialized');
 }
 
 // Email validation helper
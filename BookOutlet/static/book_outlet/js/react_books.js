@@ -0,0 +1,57 @@
+// BookOutlet - React book search (react_books.html)
+// Plain React.createElement, so the browser runs it as-is: no Babel, no build.
+// The book list comes embedded in the page (json_script), not from an API call.
+(function() {
+    const { useState } = React;
+    const h = React.createElement;
+
+    const container = document.getElementById('react-book-search');
+    const initialBooks = JSON.parse(document.getElementById('react-books-data').textContent);
+
+    function BookCard({ book }) {
+        return h('div', { className: 'col-md-6 mb-3' },
+            h('div', { className: 'card react-book-card h-100' },
+                h('div', { className: 'card-body' },
+                    h('h5', { className: 'card-title' }, book.title),
+                    h('p', { className: 'card-text text-muted' }, `by ${book.author}`),
+                    h('div', { className: 'mt-2' },
+                        h('span', { className: 'badge bg-primary' }, `ID: ${book.id}`)
+                    )
+                )
+            )
+        );
+    }
+
+    function BookSearch() {
+        const [searchTerm, setSearchTerm] = useState('');
+
+        const term = searchTerm.toLowerCase();
+        const filteredBooks = initialBooks.filter(book =>
+            book.title.toLowerCase().includes(term) ||
+            book.author.toLowerCase().includes(term)
+        );
+
+        return h('div', { className: 'react-book-section' },
+            h('h3', { className: 'mb-4' }, '🔍 React-Powered Book Search'),
+            h('div', { className: 'row mb-4' },
+                h('div', { className: 'col-md-6' },
+                    h('input', {
+                        type: 'text',
+                        className: 'form-control',
+                        placeholder: 'Search books using React...',
+                        value: searchTerm,
+                        onChange: (e) => setSearchTerm(e.target.value)
+                    })
+                )
+            ),
+            h('div', { className: 'search-stats mb-3' },
+                h('small', { className: 'text-muted' }, `Found ${filteredBooks.length} books matching your search`)
+            ),
+            h('div', { className: 'row' },
+                filteredBooks.map(book => h(BookCard, { key: book.id, book: book }))
+            )
+        );
+    }
+
+    ReactDOM.createRoot(container).render(h(BookSearch));
+})();
@@ -0,0 +1,73 @@
+// BookOutlet - React "add book" form (react_forms.html)
+// Posts to the URL in the container's data-api-url with the page's CSRF token.
+(function() {
+    const { useState } = React;
+    const h = React.createElement;
+
+    const container = document.getElementById('react-form-container');
+
+    function BookForm() {
+        const [formData, setFormData] = useState({ title: '', author: '' });
+        const [message, setMessage] = useState('');
+
+        const handleSubmit = async (e) => {
+            e.preventDefault();
+            try {
+                const response = await fetch(container.dataset.apiUrl, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-CSRFToken': container.dataset.csrfToken
+                    },
+                    body: JSON.stringify(formData)
+                });
+                if (!response.ok) {
+                    throw new Error(JSON.stringify(await response.json()));
+                }
+                setMessage('✅ Book added successfully via React!');
+                setFormData({ title: '', author: '' });
+
+                // Clear message after 3 seconds
+                setTimeout(() => setMessage(''), 3000);
+            } catch (error) {
+                setMessage('❌ Error adding book. Check console for details.');
+                console.error('Error:', error.message);
+            }
+        };
+
+        const handleChange = (e) => {
+            setFormData({ ...formData, [e.target.name]: e.target.value });
+        };
+
+        const field = (name, label, placeholder) => h('div', { className: 'mb-3' },
+            h('label', { className: 'form-label' }, label),
+            h('input', {
+                type: 'text',
+                name: name,
+                className: 'form-control',
+                value: formData[name],
+                onChange: handleChange,
+                placeholder: placeholder,
+                required: true
+            })
+        );
+
+        return h('div', { className: 'card mt-4' },
+            h('div', { className: 'card-header' },
+                h('h5', null, '📝 Add Book (React Component)')
+            ),
+            h('div', { className: 'card-body' },
+                message && h('div', {
+                    className: `alert ${message.includes('✅') ? 'alert-success' : 'alert-danger'}`
+                }, message),
+                h('form', { onSubmit: handleSubmit },
+                    field('title', 'Book Title', 'Enter book title'),
+                    field('author', 'Author', 'Enter author name'),
+                    h('button', { type: 'submit', className: 'btn btn-primary' }, 'Add Book via React')
+                )
+            )
+        );
+    }
+
+    ReactDOM.createRoot(container).render(h(BookForm));
+})();
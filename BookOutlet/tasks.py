@@ -0,0 +1,179 @@
+"""
+Background tasks.
+
+A small database-backed job queue: ``enqueue()`` stores a Task row in the
+caller's transaction and ``python manage.py run_task_worker`` picks it up.
+Workers claim tasks with a conditional UPDATE, so several worker processes
+can share the table. Failed tasks are retried with exponential backoff.
+
+With ``settings.TASKS_RUN_EAGERLY`` tasks run inline instead, which is handy
+in tests and single-process development.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(func):
+    """Register a function so it can be enqueued by name"""
+    _registry[func.__name__] = func
+    return func
+
+
+def enqueue(name, max_attempts=3, **payload):
+    """
+    Queue ``name(**payload)`` for the worker.
+
+    An identical task that is still waiting in the queue is not added twice.
+    """
+    if name not in _registry:
+        raise ValueError(f"Unknown task: {name}")
+
+    if settings.TASKS_RUN_EAGERLY:
+        _registry[name](**payload)
+        return None
+
+    if Task.objects.filter(name=name, payload=payload, status='queued').exists():
+        return None
+    return Task.objects.create(name=name, payload=payload, max_attempts=max_attempts)
+
+
+def claim_task(worker_id):
+    """Atomically take the next due task, or return None"""
+    now = timezone.now()
+
+    # Give tasks from crashed workers back to the queue
+    Task.objects.filter(
+        status='running',
+        locked_at__lt=now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT),
+    ).update(status='queued', locked_by='')
+
+    candidates = (
+        Task.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:10]
+    )
+    for task_id in candidates:
+        # Only one worker's UPDATE can match while the row is still queued
+        claimed = Task.objects.filter(id=task_id, status='queued').update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Task.objects.get(id=task_id)
+    return None
+
+
+def run_task(task_obj):
+    """Run a claimed task and record the outcome"""
+    func = _registry.get(task_obj.name)
+    try:
+        if func is None:
+            raise ValueError(f"Unknown task: {task_obj.name}")
+        with transaction.atomic():
+            func(**task_obj.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Task %s #%s failed (attempt %s)", task_obj.name, task_obj.id, task_obj.attempts)
+        if task_obj.attempts >= task_obj.max_attempts:
+            task_obj.status = 'failed'
+        else:
+            task_obj.status = 'queued'
+            delay = settings.TASK_RETRY_DELAY * 2 ** (task_obj.attempts - 1)
+            task_obj.run_after = timezone.now() + timedelta(seconds=delay)
+        task_obj.last_error = error
+        task_obj.locked_by = ''
+        task_obj.save(update_fields=['status', 'run_after', 'last_error', 'locked_by'])
+        return False
+
+    # Finished tasks are dropped to keep the queue table small
+    task_obj.delete()
+    return True
+
+
+def run_pending(worker_id, limit=None):
+    """Run due tasks until the queue is empty; returns how many ran"""
+    count = 0
+    while limit is None or count < limit:
+        task_obj = claim_task(worker_id)
+        if task_obj is None:
+            break
+        run_task(task_obj)
+        count += 1
+    return count
+
+
+# ===== TASKS =====
+@task
+def update_book_rating(book_id):
+    """Recompute a book's average rating from its reviews"""
+    from .models import Book, Review
+
+    avg_rating = Review.objects.filter(book_id=book_id).aggregate(Avg('rating'))['rating__avg']
+    Book.objects.filter(pk=book_id).update(
+        rating=round(avg_rating, 1) if avg_rating is not None else None,
+        stock_version=F('stock_version') + 1,
+    )
+
+
+@task
+def refresh_store_stats():
+    """Recompute the cached statistics shown on the home page and stats API"""
+    from .catalog import STORE_STATS_CACHE_KEY, compute_store_stats
+
+    cache.set(STORE_STATS_CACHE_KEY, compute_store_stats(), settings.STORE_STATS_CACHE_TTL)
+
+
+@task
+def send_order_confirmation(order_id):
+    from django.core.mail import send_mail
+    from .models import Order
+
+    order = Order.objects.select_related('user').get(pk=order_id)
+    if not order.user.email:
+        return
+    send_mail(
+        f"Your BookVerse order #{order.order_number}",
+        f"Thanks for your order! We received your payment of ₹{order.total_amount} "
+        f"and will let you know when it ships.",
+        settings.DEFAULT_FROM_EMAIL,
+        [order.user.email],
+    )
+
+
+@task
+def build_home_feed(user_id):
+    """Re-rank one user's personalised home feed"""
+    from .feeds import refresh_home_feeds
+
+    refresh_home_feeds([user_id])
+
+
+@task
+def refresh_inventory_report():
+    """Bring the inventory report up to date"""
+    from .inventory_report import refresh_inventory_report as refresh
+
+    refresh()
+
+
+@task
+def roll_up_order(order_id):
+    """Add a newly sold order to the sales rollups, or take a cancelled one out"""
+    from .sales_rollups import roll_up_order as roll_up
+
+    roll_up(order_id)
@@ -0,0 +1,47 @@
+"""
+``{% book_cards books "template" as cards %}`` renders one card per book and
+gives ``(book, card_html)`` pairs to loop over.
+
+Cards are cached for ``BOOK_CARD_CACHE_TTL`` seconds under the book's
+``stock_version``, which every change to a book bumps, so a stale card is
+never served. All the cards of a page are fetched with one ``get_many`` and
+the missing ones stored with one ``set_many``; rendering a cached page is a
+single cache round trip instead of a template render per book. The card
+templates must not depend on the user or request: per-user parts such as
+the add-to-cart form stay in the page's own loop.
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def card_key(template_name, book):
+    # created_at tells apart books that reuse an id (after a flush or restore)
+    created = book.created_at.timestamp() if book.created_at else ''
+    return f'book_card:{template_name}:{book.pk}:{created}:{book.stock_version}'
+
+
+@register.simple_tag
+def book_cards(books, template_name):
+    books = list(books)
+    card_template = get_template(template_name)
+    keys = [card_key(template_name, book) for book in books]
+    cached = cache.get_many(keys) if books else {}
+
+    rendered = {}
+    cards = []
+    for book, key in zip(books, keys):
+        html = cached.get(key)
+        if html is None:
+            # The engine-level template: the backend wrapper's render is timed
+            # by profiling, which already counts the page this tag runs in
+            html = rendered[key] = card_template.template.render(Context({'book': book}))
+        cards.append((book, mark_safe(html)))
+    if rendered:
+        cache.set_many(rendered, settings.BOOK_CARD_CACHE_TTL)
+    return cards
@@ -1,4 +1,6 @@
-from django.test import TestCase
+import os
+import tempfile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from .models import Book, UserInfo
@@ -307,4 +309,1365 @@ class SuccessPageViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'book_outlet/success.html')
         self.assertContains(response, 'Success!')
-        self.assertContains(response, 'Thank you for your submission.')
\ No newline at end of file
+        self.assertContains(response, 'Thank you for your submission.')
+
+# Cover Variant Tests
+class CoverVariantsTest(TestCase):
+    def setUp(self):
+        from PIL import Image
+        self.source_dir = tempfile.mkdtemp()
+        self.variants_dir = tempfile.mkdtemp()
+        Image.new('RGB', (600, 900), 'navy').save(os.path.join(self.source_dir, 'navy.jpg'))
+    
+    def test_variants_generated_on_save(self):
+        """Test saving a book with a cover builds hashed thumbnails"""
+        with override_settings(COVER_SOURCE_DIR=self.source_dir, COVER_VARIANTS_DIR=self.variants_dir):
+            book = Book.objects.create(title="Navy Cover", author="Test Author", cover_image="navy.jpg")
+        
+        self.assertEqual(book.cover_variants['widths'], [160, 320, 480])
+        self.assertIn('jpg', book.cover_variants['formats'])
+        digest = book.cover_variants['hash']
+        self.assertTrue(os.path.exists(os.path.join(self.variants_dir, f'navy.{digest}.320.jpg')))
+        self.assertIn(f'navy.{digest}.160.jpg 160w', book.get_cover_srcset())
+        self.assertTrue(book.get_cover_thumbnail_url().endswith(f'navy.{digest}.320.jpg'))
+    
+    def test_missing_cover_falls_back_to_original(self):
+        """Test books without variants keep using the original cover"""
+        with override_settings(COVER_SOURCE_DIR=self.source_dir, COVER_VARIANTS_DIR=self.variants_dir):
+            book = Book.objects.create(title="Lost Cover", author="Test Author", cover_image="missing.jpg")
+        
+        self.assertEqual(book.cover_variants, {})
+        self.assertEqual(book.get_cover_thumbnail_url(), book.get_cover_url())
+        self.assertEqual(book.get_cover_sources(), [])
+
+# Async View Tests
+class AsyncCatalogViewTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import AsyncRequestFactory
+        from django.core.cache import cache
+        cache.clear()
+        self.book = Book.objects.create(title="Async Book", author="Test Author", is_featured=True)
+        self.factory = AsyncRequestFactory()
+        self.anonymous = AnonymousUser()
+    
+    def make_request(self, path):
+        request = self.factory.get(path)
+        request.user = self.anonymous
+        
+        async def auser():
+            return self.anonymous
+        request.auser = auser
+        return request
+    
+    async def test_book_detail(self):
+        """Test async book detail renders the book and 404s for missing ones"""
+        from django.http import Http404
+        from . import async_views
+        response = await async_views.book_detail(self.make_request('/'), pk=self.book.pk)
+        self.assertContains(response, "Async Book")
+        with self.assertRaises(Http404):
+            await async_views.book_detail(self.make_request('/'), pk=999)
+    
+    async def test_book_stats_api(self):
+        """Test async stats endpoint gathers all counts and caches them for the other pages"""
+        import json
+        from asgiref.sync import sync_to_async
+        from django.core.cache import cache
+        from . import async_views
+        from .catalog import STORE_STATS_CACHE_KEY, compute_store_stats
+        response = await async_views.book_stats_api(self.make_request('/'))
+        stats = json.loads(response.content)
+        self.assertEqual(stats['total_books'], 1)
+        self.assertEqual(stats['featured_books'], 1)
+        self.assertEqual(stats['total_reviews'], 0)
+        
+        cached = await cache.aget(STORE_STATS_CACHE_KEY)
+        self.assertEqual(cached, await sync_to_async(compute_store_stats)())
+    
+    async def test_book_list_page(self):
+        """Test the async fragment endpoint follows the cursor"""
+        from django.test import override_settings
+        from . import async_views
+        newer = await Book.objects.acreate(title="Newer Async Book", author="Test Author")
+        with override_settings(BOOK_LIST_PAGE_SIZE=1):
+            first = await async_views.book_list_page(self.make_request('/'))
+            rest = await async_views.book_list_page(self.make_request(f'/?after={newer.id}'))
+        self.assertContains(first, "Newer Async Book")
+        self.assertContains(first, f'?after={newer.id}')
+        self.assertContains(rest, "Async Book")
+        self.assertNotContains(rest, 'data-next-url')
+
+# Replica Routing Tests
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        from . import routers
+        self.router = routers.ReplicaRouter()
+        # Earlier saves in this thread pin reads to the primary; start unpinned
+        token = routers._pinned.set(False)
+        self.addCleanup(routers._pinned.reset, token)
+    
+    def test_catalog_reads_use_replica(self):
+        """Test book/review reads go to a replica and other models to the primary"""
+        from .models import Review, Cart
+        self.assertEqual(self.router.db_for_read(Book), 'replica1')
+        self.assertEqual(self.router.db_for_read(Review), 'replica1')
+        self.assertEqual(self.router.db_for_read(Cart), 'default')
+    
+    def test_write_pins_reads_to_primary(self):
+        """Test a write sends later reads in the same request to the primary"""
+        from .models import Cart
+        self.assertEqual(self.router.db_for_write(Cart), 'default')
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+    
+    def test_bookkeeping_writes_do_not_pin(self):
+        """Test queueing a task from a page view leaves catalog reads on the replica"""
+        from .models import Task
+        self.assertEqual(self.router.db_for_write(Task), 'default')
+        self.assertEqual(self.router.db_for_read(Book), 'replica1')
+
+# Order Archive Tests
+class OrderArchiveTest(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from .models import Order, OrderItem
+        self.user = User.objects.create_user(username='archiver', password='testpass123')
+        self.book = Book.objects.create(title="Archived Book", author="Test Author", price=250)
+        old_date = timezone.now() - timedelta(days=400)
+        
+        self.old_delivered = Order.objects.create(user=self.user, order_number='ORDOLD1', status='delivered', total_amount=250)
+        self.old_pending = Order.objects.create(user=self.user, order_number='ORDOLD2', status='pending')
+        self.recent_delivered = Order.objects.create(user=self.user, order_number='ORDNEW1', status='delivered')
+        Order.objects.filter(pk__in=[self.old_delivered.pk, self.old_pending.pk]).update(created_at=old_date)
+        OrderItem.objects.create(order=self.old_delivered, book=self.book, quantity=1, price=250)
+    
+    def test_archive_moves_old_delivered_orders(self):
+        """Test only old delivered orders are moved, with their items"""
+        from .archive import archive_cutoff, archive_orders
+        from .models import ArchivedOrder, Order
+        moved = archive_orders(archive_cutoff(12), batch_size=1)
+        
+        self.assertEqual(moved, 1)
+        self.assertEqual(set(Order.objects.values_list('order_number', flat=True)), {'ORDOLD2', 'ORDNEW1'})
+        archived = ArchivedOrder.objects.get(order_number='ORDOLD1')
+        self.assertEqual(archived.original_id, self.old_delivered.pk)
+        self.assertEqual(archived.items.get().book_title, "Archived Book")
+    
+    def test_archive_keeps_order_events(self):
+        """Test an archived order's status history survives the Order delete"""
+        from .archive import archive_cutoff, archive_orders
+        from .models import ArchivedOrder, OrderEvent
+        OrderEvent.objects.create(order=self.old_delivered, from_status='pending', to_status='shipped')
+        OrderEvent.objects.create(order=self.old_delivered, from_status='shipped', to_status='delivered', idempotency_key='deliver-1')
+        archive_orders(archive_cutoff(12))
+        
+        self.assertFalse(OrderEvent.objects.filter(order_id=self.old_delivered.pk).exists())
+        archived = ArchivedOrder.objects.get(order_number='ORDOLD1')
+        self.assertEqual(
+            list(archived.events.values_list('to_status', 'idempotency_key')),
+            [('shipped', None), ('delivered', 'deliver-1')],
+        )
+    
+    def test_order_archive_view(self):
+        """Test archived orders appear on the history page, not the order list"""
+        from .archive import archive_cutoff, archive_orders
+        archive_orders(archive_cutoff(12))
+        self.client.login(username='archiver', password='testpass123')
+        
+        response = self.client.get(reverse('book_outlet:order_list'))
+        self.assertNotContains(response, 'ORDOLD1')
+        self.assertContains(response, 'View older orders')
+        response = self.client.get(reverse('book_outlet:order_archive'))
+        self.assertContains(response, 'ORDOLD1')
+
+# Task Queue Tests
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user(username='reviewer', password='testpass123')
+        self.book = Book.objects.create(title="Queued Book", author="Test Author")
+    
+    def test_review_rating_updated_by_worker(self):
+        """Test saving a review queues the rating update instead of running it"""
+        from .models import Review, Task
+        from .tasks import run_pending
+        Review.objects.create(book=self.book, user=self.user, rating=4, comment="Good read")
+        
+        self.book.refresh_from_db()
+        self.assertIsNone(self.book.rating)
+        self.assertTrue(Task.objects.filter(name='update_book_rating').exists())
+        
+        run_pending('test-worker')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.rating, 4.0)
+        self.assertFalse(Task.objects.exists())
+    
+    def test_duplicate_tasks_not_queued(self):
+        """Test an identical queued task is only stored once"""
+        from .models import Task
+        from .tasks import enqueue
+        Task.objects.all().delete()
+        enqueue('refresh_store_stats')
+        enqueue('refresh_store_stats')
+        self.assertEqual(Task.objects.filter(name='refresh_store_stats').count(), 1)
+    
+    def test_failed_task_is_retried_then_marked_failed(self):
+        """Test failing tasks back off and stop after max_attempts"""
+        from .models import Task
+        from .tasks import enqueue, claim_task, run_task
+        Task.objects.all().delete()
+        task = enqueue('send_order_confirmation', max_attempts=2, order_id=999)
+        
+        self.assertFalse(run_task(claim_task('test-worker')))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'queued')
+        self.assertGreater(task.run_after, task.created_at)
+        
+        Task.objects.filter(pk=task.pk).update(run_after=task.created_at)
+        self.assertFalse(run_task(claim_task('test-worker')))
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'failed')
+        self.assertIn('DoesNotExist', task.last_error)
+
+
+# Order State Machine Tests
+class OrderStateMachineTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .models import Order
+        self.user = User.objects.create_user(username='buyer', password='testpass123')
+        self.order = Order.objects.create(
+            user=self.user, order_number='ORD-STATE-1', total_amount=100, shipping_address='Somewhere'
+        )
+    
+    def test_payment_is_idempotent(self):
+        """Test replaying a payment key records one event and does not fail"""
+        from .models import Order, OrderEvent
+        from .order_states import confirm_payment
+        self.assertTrue(confirm_payment(self.order, idempotency_key='pay-1'))
+        
+        stale = Order.objects.get(pk=self.order.pk)
+        stale.status, stale.payment_status = 'pending', False
+        self.assertFalse(confirm_payment(stale, idempotency_key='pay-1'))
+        self.assertFalse(confirm_payment(stale, idempotency_key='pay-2'))
+        
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertTrue(self.order.payment_status)
+        self.assertEqual(OrderEvent.objects.filter(order=self.order).count(), 1)
+    
+    def test_idempotency_keys_are_per_order(self):
+        """Test a key used on one order does not block paying another order"""
+        from django.contrib.auth.models import User
+        from .models import Order
+        from .order_states import confirm_payment
+        other_user = User.objects.create_user(username='other-buyer', password='testpass123')
+        other = Order.objects.create(user=other_user, order_number='ORD-STATE-2', total_amount=50, shipping_address='Elsewhere')
+        self.assertTrue(confirm_payment(self.order, idempotency_key=f'payment:{other.id}'))
+        self.assertTrue(confirm_payment(other, idempotency_key=f'payment:{other.id}'))
+        other.refresh_from_db()
+        self.assertEqual(other.status, 'confirmed')
+    
+    def test_invalid_and_stale_transitions_rejected(self):
+        """Test disallowed moves and moves from an outdated status raise"""
+        from .models import Order
+        from .order_states import InvalidTransition, transition
+        with self.assertRaises(InvalidTransition):
+            transition(self.order, 'delivered')
+        
+        stale = Order.objects.get(pk=self.order.pk)
+        self.assertTrue(transition(self.order, 'cancelled'))
+        with self.assertRaises(InvalidTransition):
+            transition(stale, 'confirmed')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'cancelled')
+        self.assertFalse(self.order.payment_status)
+    
+    def test_process_payment_view(self):
+        """Test paying twice through the view confirms once"""
+        from .models import OrderEvent
+        self.client.login(username='buyer', password='testpass123')
+        url = reverse('book_outlet:process_payment', args=[self.order.id])
+        self.client.post(url, HTTP_IDEMPOTENCY_KEY='abc')
+        response = self.client.post(url, HTTP_IDEMPOTENCY_KEY='abc', follow=True)
+        
+        self.assertContains(response, 'Payment already processed!')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'confirmed')
+        self.assertEqual(OrderEvent.objects.filter(order=self.order).count(), 1)
+
+
+# Recommendation Tests
+class RecommendationTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user(username='shopper', password='testpass123')
+        self.books = [Book.objects.create(title=f"Book {i}", author="Test Author") for i in range(4)]
+    
+    def place_order(self, *books):
+        from .models import Order, OrderItem
+        order = Order.objects.create(
+            user=self.user, order_number=f'ORD-REC-{Order.objects.count()}', total_amount=10, shipping_address='Here'
+        )
+        for book in books:
+            OrderItem.objects.create(order=order, book=book, quantity=1, price=10)
+    
+    def test_incremental_build_matches_full_rebuild(self):
+        """Test folding in new orders gives the same lists as a full rebuild"""
+        from .models import BookRecommendation
+        from .recommendations import build_recommendations
+        a, b, c, d = self.books
+        self.place_order(a, b)
+        self.place_order(a, b, c)
+        build_recommendations()
+        self.place_order(a, d)
+        self.place_order(c, d)
+        stats = build_recommendations()
+        self.assertEqual(stats['recommendations:order_items'], 4)
+        
+        incremental = list(BookRecommendation.objects.values_list('book', 'recommended', 'rank', 'score'))
+        build_recommendations(full=True)
+        full = list(BookRecommendation.objects.values_list('book', 'recommended', 'rank', 'score'))
+        self.assertEqual(len(incremental), len(full))
+        for row, expected in zip(incremental, full):
+            self.assertEqual(row[:3], expected[:3])
+            self.assertAlmostEqual(row[3], expected[3])
+        
+        ranked = list(BookRecommendation.objects.filter(book=a).values_list('recommended', flat=True))
+        self.assertEqual(ranked[0], b.pk)
+    
+    def test_periodic_full_rebuild_drops_deleted_orders(self):
+        """Test incremental runs keep deleted orders until the scheduled full rebuild"""
+        from .models import BookRecommendation, JobCheckpoint, Order
+        from .recommendations import FULL_REBUILD_CHECKPOINT, build_recommendations
+        a, b, _, _ = self.books
+        self.place_order(a, b)
+        self.assertTrue(build_recommendations()['full'])
+        
+        Order.objects.all().delete()
+        self.assertFalse(build_recommendations()['full'])
+        self.assertTrue(BookRecommendation.objects.exists())
+        
+        JobCheckpoint.objects.filter(name=FULL_REBUILD_CHECKPOINT).update(position=0)
+        self.assertTrue(build_recommendations()['full'])
+        self.assertFalse(BookRecommendation.objects.exists())
+    
+    def test_positive_reviews_count_as_cooccurrence(self):
+        """Test books the same reader rated highly are recommended together"""
+        from .models import Review, BookRecommendation
+        from .recommendations import build_recommendations
+        a, b, c, _ = self.books
+        Review.objects.create(book=a, user=self.user, rating=5, comment="Great")
+        Review.objects.create(book=b, user=self.user, rating=4, comment="Good")
+        Review.objects.create(book=c, user=self.user, rating=1, comment="Bad")
+        build_recommendations()
+        
+        self.assertEqual(
+            list(BookRecommendation.objects.filter(book=a).values_list('recommended', flat=True)), [b.pk]
+        )
+    
+    def test_book_detail_shows_recommendations(self):
+        """Test the detail page lists customers-also-bought books"""
+        from .recommendations import build_recommendations
+        a, b, _, _ = self.books
+        self.place_order(a, b)
+        build_recommendations()
+        
+        response = self.client.get(reverse('book_outlet:book_details', args=[a.pk]))
+        self.assertContains(response, 'Customers also bought')
+        self.assertContains(response, b.title)
+
+
+# Home Feed Tests
+class HomeFeedTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.user.userprofile.favorite_genres = 'Fantasy, Poetry'
+        self.user.userprofile.save()
+        self.fantasy = [Book.objects.create(title=f"Fantasy {i}", author="Test Author", genre="fantasy") for i in range(3)]
+        self.other = [Book.objects.create(title=f"Thriller {i}", author="Test Author", genre="Thriller") for i in range(3)]
+    
+    def test_feed_ranks_favorite_genres_and_skips_read_books(self):
+        """Test favourite genres come first and reviewed books are left out"""
+        from .models import Review
+        from .feeds import rank_feeds
+        Review.objects.create(book=self.fantasy[0], user=self.user, rating=5, comment="Loved it")
+        
+        feed = rank_feeds([self.user.id])[self.user.id]
+        self.assertEqual(len(feed), 4)
+        self.assertEqual({book.pk for book in feed[:2]}, {self.fantasy[1].pk, self.fantasy[2].pk})
+        self.assertNotIn(self.fantasy[0].pk, [book.pk for book in feed])
+    
+    def test_home_view_serves_cached_feed(self):
+        """Test the home page uses the precomputed feed once it exists"""
+        from django.core.cache import cache
+        from .models import Task
+        from .feeds import feed_cache_key, get_home_feed, request_home_feed
+        from .tasks import run_pending
+        self.client.login(username='reader', password='testpass123')
+        
+        response = self.client.get(reverse('book_outlet:home'))
+        self.assertFalse(response.context['personalized'])
+        self.assertTrue(Task.objects.filter(name='build_home_feed', payload={'user_id': self.user.id}).exists())
+        # A second miss while the build is pending doesn't touch the task table
+        with self.assertNumQueries(0):
+            request_home_feed(self.user.id)
+        
+        run_pending('test-worker')
+        self.assertIsNotNone(get_home_feed(self.user.id))
+        # Only ids are cached; the books are loaded fresh
+        self.assertTrue(all(isinstance(book_id, int) for book_id in cache.get(feed_cache_key(self.user.id))))
+        response = self.client.get(reverse('book_outlet:home'))
+        self.assertTrue(response.context['personalized'])
+        self.assertContains(response, 'Picked for You')
+        self.assertEqual(response.context['recent_books'][0].genre, 'fantasy')
+
+
+# Search Suggestion Tests
+class SearchSuggestTest(TestCase):
+    def setUp(self):
+        from . import search_index
+        search_index._index = None
+        self.book = Book.objects.create(title="The Great Gatsby", author="Scott Fitzgerald", isbn="9780743273565")
+    
+    def tearDown(self):
+        from . import search_index
+        search_index._index = None
+    
+    def test_prefix_index_matches_words_authors_and_isbn(self):
+        """Test suggestions match any word start of titles and authors, and ISBN prefixes"""
+        from .search_index import PrefixIndex
+        index = PrefixIndex([
+            (1, "The Great Gatsby", "Scott Fitzgerald", "9780743273565"),
+            (2, "Great Expectations", "Charles Dickens", None),
+            (3, "Cien Años de Soledad", "Gabriel García Márquez", None),
+        ])
+        self.assertEqual([r[0] for r in index.suggest("great")], [2, 1])
+        self.assertEqual([r[0] for r in index.suggest("gats")], [1])
+        self.assertEqual([r[0] for r in index.suggest("fitz")], [1])
+        self.assertEqual([r[0] for r in index.suggest("978074")], [1])
+        self.assertEqual([r[0] for r in index.suggest("marq")], [3])
+        self.assertEqual(index.suggest("   "), [])
+        
+        index.remove(2)
+        index.add(1, "Gatsby Returns", "Scott Fitzgerald", None)
+        self.assertEqual(index.suggest("great"), [])
+        self.assertEqual([r[0] for r in index.suggest("gatsby ret")], [1])
+    
+    def test_suggest_endpoint_does_not_query_database(self):
+        """Test the endpoint answers from memory once the index is loaded"""
+        from . import search_index
+        search_index.get_index()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('book_outlet:book_suggest'), {'q': 'gat'})
+        self.assertEqual(response.json()['results'][0]['title'], "The Great Gatsby")
+    
+    def test_index_follows_book_changes(self):
+        """Test saving and deleting books updates a loaded index"""
+        from . import search_index
+        search_index.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title="Gathering Storm", author="Winston Churchill")
+        self.assertEqual(len(search_index.suggest("gat")), 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        self.assertEqual([r[1] for r in search_index.suggest("gat")], ["Gathering Storm"])
+
+    
+    def test_other_processes_changes_are_applied_without_rebuild(self):
+        """Test a process reloads just the books another process logged as changed"""
+        from django.core.cache import cache
+        from . import search_index
+        search_index.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            gone = Book.objects.create(title="Gathering Storm", author="Winston Churchill")
+        self.assertEqual(len(search_index.suggest("gat")), 2)
+        
+        # Another process renames one book and deletes another
+        Book.objects.filter(pk=self.book.pk).update(title="Gatsby Returns")
+        Book.objects.filter(pk=gone.pk).delete()
+        for book_id in (self.book.pk, gone.pk):
+            version = cache.incr(search_index.VERSION_CACHE_KEY)
+            cache.set(search_index.CHANGE_CACHE_KEY.format(version), book_id)
+        
+        search_index._checked_at = 0.0
+        with self.assertNumQueries(1):
+            search_index.get_index()
+        self.assertEqual([r[1] for r in search_index.suggest("gat")], ["Gatsby Returns"])
+        self.assertEqual(search_index._index_version, version)
+    
+    def test_preload_waits_for_first_request(self):
+        """Test the entry points' preload starts building only once the process serves a request"""
+        import threading
+        from unittest import mock
+        from . import search_index
+        started = threading.Event()
+        with mock.patch.object(search_index, '_preload', side_effect=started.set):
+            search_index.preload()
+            self.assertFalse(started.wait(0.1))
+            self.client.get(reverse('book_outlet:book_suggest'), {'q': 'gat'})
+            self.assertTrue(started.wait(5))
+
+# Fuzzy Search Tests
+class FuzzySearchTest(TestCase):
+    def setUp(self):
+        from . import search_index
+        search_index._index = None
+        self.gatsby = Book.objects.create(title="The Great Gatsby", author="Scott Fitzgerald", genre="Classic")
+        self.alchemist = Book.objects.create(title="The Alchemist", author="Paulo Coelho", genre="Fiction")
+    
+    def tearDown(self):
+        from . import search_index
+        search_index._index = None
+    
+    def test_fuzzy_index_tolerates_typos(self):
+        """Test misspelt titles and authors still find the right book first"""
+        from .search_index import FuzzyIndex
+        index = FuzzyIndex([
+            (1, "The Great Gatsby", "Scott Fitzgerald", None),
+            (2, "The Alchemist", "Paulo Coelho", None),
+            (3, "Great Expectations", "Charles Dickens", None),
+        ])
+        self.assertEqual(index.search("fitzgerlad")[0][0], 1)
+        self.assertEqual(index.search("the alchemsit")[0][0], 2)
+        self.assertEqual(index.search("grate expectation")[0][0], 3)
+        self.assertEqual(index.search("zzzz qqqq"), [])
+        
+        index.remove(2)
+        self.assertEqual(index.search("alchemist"), [])
+    
+    def test_search_view_falls_back_to_close_matches(self):
+        """Test the search page shows near matches when nothing matches exactly"""
+        response = self.client.get(reverse('book_outlet:book_search'), {'q': 'Fitzgerlad'})
+        self.assertEqual(list(response.context['books']), [self.gatsby])
+        self.assertTrue(response.context['current_filters']['fuzzy'])
+        self.assertContains(response, 'showing close matches')
+        
+        response = self.client.get(reverse('book_outlet:book_search'), {'q': 'Alchemist'})
+        self.assertFalse(response.context['current_filters']['fuzzy'])
+        
+        response = self.client.get(reverse('book_outlet:book_search'), {'q': 'alchemsit', 'fuzzy': '1', 'genre': 'Classic'})
+        self.assertEqual(list(response.context['books']), [])
+    
+    def test_close_matches_ranked_by_relevance_from_the_form(self):
+        """Test the form's default sort keeps close matches in similarity order, and an explicit sort wins"""
+        basics = Book.objects.create(title="Alchemy Basics", author="Test Author", genre="Science")
+        response = self.client.get(reverse('book_outlet:book_search'))
+        self.assertContains(response, '<option value="relevance" selected>')
+        
+        response = self.client.get(reverse('book_outlet:book_search'), {'q': 'Alchemst', 'sort_by': 'relevance'})
+        self.assertEqual(list(response.context['books']), [self.alchemist, basics])
+        response = self.client.get(reverse('book_outlet:book_search'), {'q': 'Alchemst', 'sort_by': 'newest'})
+        self.assertEqual(list(response.context['books']), [basics, self.alchemist])
+
+
+# ISBN Tests
+class ISBNTest(TestCase):
+    def test_normalize_isbn(self):
+        """Test ISBN-10s are converted, separators stripped and checksums verified"""
+        from .isbn import normalize_isbn, looks_like_isbn
+        self.assertEqual(normalize_isbn('0-7432-7356-7'), '9780743273565')
+        self.assertEqual(normalize_isbn('978-0-7432-7356-5'), '9780743273565')
+        self.assertEqual(normalize_isbn('080442957x'), '9780804429573')
+        for bad in ('0-7432-7356-8', '9780743273566', '12345', 'not an isbn'):
+            with self.assertRaises(ValueError):
+                normalize_isbn(bad)
+        self.assertIsNone(looks_like_isbn('Great Gatsby'))
+    
+    def test_isbn_migration_logs_cleared_values(self):
+        """Test the ISBN migration normalises with its own copy and logs every ISBN it clears"""
+        import importlib
+        from django.apps import apps
+        migration = importlib.import_module('BookOutlet.migrations.0015_book_isbn_unique')
+        book = Book.objects.create(title="Old Import", author="Test Author")
+        spelt = Book.objects.create(title="Hyphenated", author="Test Author")
+        Book.objects.filter(pk=book.pk).update(isbn='12345')
+        Book.objects.filter(pk=spelt.pk).update(isbn='0-7432-7356-7')
+        
+        with self.assertLogs(migration.logger, 'WARNING') as logs:
+            migration.normalize_isbns(apps, None)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("'12345'", logs.output[0])
+        self.assertEqual(dict(Book.objects.values_list('pk', 'isbn')), {book.pk: None, spelt.pk: '9780743273565'})
+    
+    def test_book_isbn_normalized_and_unique(self):
+        """Test books store the normalised ISBN and reject duplicates in any spelling"""
+        from django.core.exceptions import ValidationError
+        book = Book.objects.create(title="The Great Gatsby", author="Scott Fitzgerald", isbn="0-7432-7356-7")
+        self.assertEqual(book.isbn, '9780743273565')
+        Book.objects.create(title="No Isbn", author="Test Author", isbn="")
+        Book.objects.create(title="No Isbn Either", author="Test Author")
+        
+        with self.assertRaises(ValidationError):
+            Book.objects.create(title="Gatsby Again", author="Scott Fitzgerald", isbn="978-0743273565")
+        with self.assertRaises(ValidationError) as cm:
+            Book.objects.create(title="Bad Isbn", author="Test Author", isbn="0-7432-7356-8")
+        self.assertIn('isbn', cm.exception.message_dict)
+    
+    def test_isbn_queries_use_exact_lookup(self):
+        """Test the search page and API find a book by ISBN in any spelling"""
+        book = Book.objects.create(title="The Great Gatsby", author="Scott Fitzgerald", isbn="9780743273565")
+        Book.objects.create(title="Other Book", author="Test Author")
+        
+        response = self.client.get(reverse('book_outlet:book_search'), {'q': '0-7432-7356-7'})
+        self.assertEqual(list(response.context['books']), [book])
+        
+        response = self.client.get('/api/books/', {'isbn': '0743273567'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([b['id'] for b in response.json()], [book.id])
+        response = self.client.get('/api/books/', {'q': '978-0-7432-7356-5'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([b['id'] for b in response.json()], [book.id])
+        response = self.client.get('/api/books/', {'isbn': '12345'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+# Admin Performance Tests
+class AdminPerformanceTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.admin_user = User.objects.create_superuser(username='staff', email='staff@example.com', password='pass12345')
+        self.client.force_login(self.admin_user)
+        for i in range(30):
+            Book.objects.create(title=f"Book {i:02d}", author="Test Author", copies_available=i)
+        Book.objects.create(title="The Great Gatsby", author="Scott Fitzgerald", copies_available=3)
+    
+    def test_paginator_estimates_and_caps_counts(self):
+        """Test unfiltered counts come from table statistics and filtered pages load only their rows"""
+        from .admin_performance import LargeTablePaginator
+        paginator = LargeTablePaginator(Book.objects.order_by('title'), 10)
+        self.assertGreaterEqual(paginator.count, 31)
+        page = paginator.page(2)
+        self.assertEqual([b.title for b in page], [f"Book {i:02d}" for i in range(10, 20)])
+        
+        filtered = LargeTablePaginator(Book.objects.filter(copies_available__lte=5).order_by('pk'), 10)
+        self.assertEqual(filtered.count, 7)
+    
+    @override_settings(ADMIN_PERFORMANCE_MODE=True)
+    def test_changelists_in_performance_mode(self):
+        """Test the Book and Review changelists render with prefix search, stock buckets and no date drill-down"""
+        url = reverse('admin:BookOutlet_book_changelist')
+        for term in ('the great', 'scott'):
+            response = self.client.get(url, {'q': term})
+            self.assertEqual([b.title for b in response.context['cl'].result_list], ["The Great Gatsby"])
+        response = self.client.get(url, {'stock': 'low'})
+        self.assertEqual(response.context['cl'].result_count, 6)
+        
+        from .models import Review
+        gatsby = Book.objects.get(title="The Great Gatsby")
+        Review.objects.create(book=gatsby, user=self.admin_user, rating=5, comment="A classic.")
+        response = self.client.get(reverse('admin:BookOutlet_review_changelist'), {'q': 'staff'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['cl'].date_hierarchy)
+        self.assertEqual(len(response.context['cl'].result_list), 1)
+
+
+# Inventory Tests
+class InventoryTest(TestCase):
+    def setUp(self):
+        self.first = Book.objects.create(title="First Book", author="Test Author", copies_available=10)
+        self.second = Book.objects.create(title="Second Book", author="Test Author", copies_available=2)
+    
+    def test_apply_stock_changes(self):
+        """Test absolute and relative changes, version conflicts and the audit trail"""
+        from .inventory import apply_stock_changes
+        from .models import StockAdjustment
+        stale_version = self.first.stock_version
+        result = apply_stock_changes([
+            {'book': self.first.pk, 'set': 25, 'version': stale_version},
+            {'book': self.second.pk, 'delta': -5},
+            {'book': 999999, 'delta': 1},
+        ], source='sync', reason='nightly')
+        self.assertEqual((result['updated'], result['missing']), (2, [999999]))
+        
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.copies_available, self.second.copies_available), (25, 0))
+        self.assertEqual(self.first.stock_version, stale_version + 1)
+        adjustment = StockAdjustment.objects.get(book=self.second)
+        self.assertEqual((adjustment.previous_count, adjustment.new_count), (2, 0))
+        self.assertEqual(adjustment.batch, result['batch'])
+        
+        result = apply_stock_changes([{'book': self.first.pk, 'set': 1, 'version': stale_version}], source='sync')
+        self.assertEqual(result['conflicts'], [{'book': self.first.pk, 'version': stale_version + 1}])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.copies_available, 25)
+    
+    def test_repeated_book_needs_the_version_of_the_earlier_change(self):
+        """Test a second change to a book in one request can't reuse the version from before the first"""
+        from .inventory import apply_stock_changes
+        version = self.first.stock_version
+        result = apply_stock_changes([
+            {'book': self.first.pk, 'delta': -4, 'version': version},
+            {'book': self.first.pk, 'set': 50, 'version': version},
+            {'book': self.first.pk, 'delta': 1, 'version': version + 1},
+        ], source='sync')
+        self.assertEqual(result['conflicts'], [{'book': self.first.pk, 'version': version + 1}])
+        
+        self.first.refresh_from_db()
+        self.assertEqual((self.first.copies_available, self.first.stock_version), (7, version + 2))
+    
+    def test_bulk_endpoint_and_admin_action(self):
+        """Test the inventory API is staff-only and validates input, and the admin action adjusts stock"""
+        import json
+        from django.contrib.auth.models import User
+        url = reverse('inventory_bulk')
+        payload = {'changes': [{'book': self.first.pk, 'delta': 3}]}
+        response = self.client.post(url, json.dumps(payload), content_type='application/json')
+        self.assertIn(response.status_code, (401, 403))
+        
+        staff = User.objects.create_superuser(username='staff', email='staff@example.com', password='pass12345')
+        self.client.force_login(staff)
+        response = self.client.post(url, json.dumps({'changes': [{'book': self.first.pk, 'set': 1, 'delta': 1}]}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, json.dumps(payload), content_type='application/json')
+        self.assertEqual(response.json()['updated'], 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.copies_available, 13)
+        
+        self.client.post(reverse('admin:BookOutlet_book_changelist'), {
+            'action': 'adjust_stock',
+            '_selected_action': [self.first.pk, self.second.pk],
+            'stock_operation': 'set',
+            'stock_amount': '7',
+        })
+        self.assertEqual(sorted(Book.objects.values_list('copies_available', flat=True)), [7, 7])
+
+
+# Inventory Report Tests
+class InventoryReportTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user(username='buyer', password='pass12345')
+        self.fast = Book.objects.create(title="Fast Seller", author="Test Author", copies_available=6)
+        self.slow = Book.objects.create(title="Slow Seller", author="Test Author", copies_available=40)
+        self.idle = Book.objects.create(title="Idle Book", author="Test Author", copies_available=2)
+    
+    def place_order(self, book, quantity, status='confirmed'):
+        import uuid
+        from .models import Order, OrderItem
+        order = Order.objects.create(user=self.user, order_number=uuid.uuid4().hex[:20], total_amount=0, status=status)
+        OrderItem.objects.create(order=order, book=book, quantity=quantity, price=book.price)
+        return order
+    
+    def test_refresh_computes_sell_through_and_alerts(self):
+        """Test sales figures, days of stock, low-stock flags and ranks"""
+        from .inventory_report import refresh_inventory_report
+        from .models import InventoryReport
+        self.place_order(self.fast, 30)
+        self.place_order(self.slow, 3)
+        self.place_order(self.slow, 50, status='pending')
+        refresh_inventory_report()
+        
+        fast = InventoryReport.objects.get(book=self.fast)
+        self.assertEqual(fast.units_sold, 30)
+        self.assertAlmostEqual(fast.days_of_stock, 6.0)
+        self.assertAlmostEqual(fast.sell_through_rate, 30 / 36)
+        self.assertTrue(fast.is_low_stock)
+        self.assertEqual(fast.sales_rank, 1)
+        
+        slow = InventoryReport.objects.get(book=self.slow)
+        self.assertEqual((slow.units_sold, slow.sales_rank, slow.is_low_stock), (3, 2, False))
+        idle = InventoryReport.objects.get(book=self.idle)
+        self.assertIsNone(idle.days_of_stock)
+        self.assertTrue(idle.is_low_stock)
+    
+    def test_incremental_refresh_picks_up_changes(self):
+        """Test a second refresh only recomputes books whose stock or orders changed"""
+        from .inventory_report import refresh_inventory_report
+        from .models import InventoryReport
+        from .order_states import transition
+        refresh_inventory_report()
+        self.assertEqual(refresh_inventory_report(), 0)
+        
+        order = self.place_order(self.slow, 10, status='pending')
+        self.fast.copies_available = 100
+        self.fast.save()
+        transition(order, 'confirmed')
+        refresh_inventory_report()
+        self.assertEqual(InventoryReport.objects.get(book=self.slow).units_sold, 10)
+        self.assertFalse(InventoryReport.objects.get(book=self.fast).is_low_stock)
+    
+    def test_refresh_counts_orders_committed_late(self):
+        """Test an order stamped before the last run but committed after it is still counted"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .inventory_report import refresh_inventory_report
+        from .models import InventoryReport, Order
+        refresh_inventory_report()
+        order = self.place_order(self.slow, 5)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        
+        self.assertEqual(refresh_inventory_report(), 1)
+        self.assertEqual(InventoryReport.objects.get(book=self.slow).units_sold, 5)
+        self.assertEqual(refresh_inventory_report(), 0)
+    
+    def test_dashboard_is_staff_only(self):
+        """Test the inventory dashboard renders for staff and redirects others"""
+        from django.contrib.auth.models import User
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('book_outlet:inventory_report'))
+        self.assertEqual(response.status_code, 302)
+        
+        staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.client.force_login(staff)
+        self.place_order(self.fast, 30)
+        with self.settings(TASKS_RUN_EAGERLY=True):
+            self.client.get(reverse('book_outlet:inventory_report'))
+            response = self.client.get(reverse('book_outlet:inventory_report'))
+        self.assertContains(response, 'Fast Seller')
+        self.assertEqual(response.context['summary']['low_stock'], 2)
+
+
+# Sales Rollup Tests
+class SalesRollupTest(TestCase):
+    def setUp(self):
+        import uuid
+        from django.contrib.auth.models import User
+        from .models import Order, OrderItem
+        self.user = User.objects.create_user(username='buyer', password='pass12345')
+        self.novel = Book.objects.create(title="A Novel", author="Test Author", genre="Fiction", price=100)
+        self.guide = Book.objects.create(title="A Guide", author="Other Author", genre="Travel", price=50)
+        self.order = Order.objects.create(user=self.user, order_number=uuid.uuid4().hex[:20], total_amount=250)
+        OrderItem.objects.create(order=self.order, book=self.novel, quantity=2, price=100)
+        OrderItem.objects.create(order=self.order, book=self.guide, quantity=1, price=50)
+    
+    def figures(self, dimension, key, granularity='day'):
+        from .models import SalesRollup
+        rollup = SalesRollup.objects.filter(granularity=granularity, dimension=dimension, key=key).first()
+        return rollup and (rollup.revenue, rollup.units, rollup.orders)
+    
+    def test_confirm_and_cancel_update_rollups_once(self):
+        """Test confirmation adds an order once, retries are ignored and cancellation takes it out"""
+        from decimal import Decimal
+        from .order_states import confirm_payment, transition
+        from .sales_rollups import roll_up_order
+        from .tasks import run_pending
+        confirm_payment(self.order, idempotency_key='pay-1')
+        run_pending('test-worker')
+        self.assertEqual(self.figures('total', ''), (Decimal('250'), 3, 1))
+        self.assertEqual(self.figures('genre', 'Fiction', 'hour'), (Decimal('200'), 2, 1))
+        self.assertEqual(self.figures('book', str(self.guide.pk)), (Decimal('50'), 1, 1))
+        self.assertFalse(roll_up_order(self.order.pk))
+        
+        transition(self.order, 'cancelled')
+        run_pending('test-worker')
+        self.assertEqual(self.figures('author', 'Test Author'), (Decimal('0'), 0, 0))
+    
+    def test_rebuild_and_api(self):
+        """Test a rebuild reproduces the rollups and the staff endpoint answers from them"""
+        from decimal import Decimal
+        from django.contrib.auth.models import User
+        from .models import SalesRollup
+        from .sales_rollups import rebuild_sales_rollups
+        self.order.status = 'delivered'
+        self.order.save()
+        self.assertEqual(rebuild_sales_rollups(), 1)
+        self.assertEqual(rebuild_sales_rollups(), 1)
+        self.assertEqual(self.figures('genre', 'Travel'), (Decimal('50'), 1, 1))
+        self.assertEqual(SalesRollup.objects.filter(dimension='total').count(), 2)
+        
+        url = reverse('sales_rollups')
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.client.force_login(staff)
+        
+        data = self.client.get(url, {'dimension': 'genre'}).json()
+        self.assertEqual([row['key'] for row in data['top']], ['Fiction', 'Travel'])
+        data = self.client.get(url).json()
+        self.assertEqual(Decimal(str(data['series'][0]['revenue'])), Decimal('250'))
+        self.assertEqual(self.client.get(url, {'granularity': 'hour', 'start': '2020-01-01T00:00:00Z'}).status_code, 400)
+
+
+# Profiling Tests
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+class ProfilingTest(TestCase):
+    def setUp(self):
+        from . import profiling
+        profiling.reset()
+        Book.objects.create(title="Profiled Book", author="Test Author")
+    
+    def test_middleware_records_request_breakdown(self):
+        """Test a sampled request records queries, templates, cache lookups and slow SQL call sites"""
+        from django.test import modify_settings
+        from .profiling import profiling_snapshot
+        import json
+        with modify_settings(MIDDLEWARE={'prepend': 'BookOutlet.profiling.ProfilingMiddleware'}), \
+                self.assertLogs('BookOutlet.profiling', 'INFO') as logs:
+            self.client.get(reverse('book_outlet:book_list'))
+            self.client.get(reverse('book_outlet:book_list'))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['route'], 'book_outlet:book_list')
+        
+        snapshot = profiling_snapshot()
+        route = snapshot['routes']['book_outlet:book_list']
+        self.assertEqual(route['samples'], 2)
+        self.assertGreater(route['avg_queries'], 0)
+        self.assertGreater(route['avg_template_ms'], 0)
+        self.assertLessEqual(route['p50_ms'], route['p99_ms'])
+        recent = snapshot['recent'][-1]
+        self.assertTrue(recent['slow_queries'])
+        self.assertTrue(any(q['call_site'] and q['call_site'].startswith('BookOutlet/') for q in recent['slow_queries']))
+    
+    def test_endpoint_is_staff_only(self):
+        """Test the profiling endpoint refuses non-staff users"""
+        from django.contrib.auth.models import User
+        self.assertEqual(self.client.get(reverse('book_outlet:profiling_report')).status_code, 403)
+        staff = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('book_outlet:profiling_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['enabled'])
+
+
+# Metrics Tests
+class MetricsTest(TestCase):
+    def _sample(self, text, line_start):
+        for line in text.splitlines():
+            if line.startswith(line_start + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+    
+    def _scrape(self):
+        with self.settings(METRICS_TOKEN='scrape-token'):
+            response = self.client.get(reverse('book_outlet:metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+    
+    def test_requests_are_counted_by_route(self):
+        """Test requests, latency buckets and queries are reported per URL name"""
+        Book.objects.create(title="Metered Book", author="Test Author")
+        route = 'route="book_outlet:book_list"'
+        before = self._scrape()
+        self.client.get(reverse('book_outlet:book_list'))
+        self.client.get(reverse('book_outlet:book_list'))
+        after = self._scrape()
+        
+        requests = f'bookverse_http_requests_total{{{route},method="GET",status="200"}}'
+        self.assertEqual(self._sample(after, requests) - self._sample(before, requests), 2)
+        count = f'bookverse_http_request_duration_seconds_count{{{route}}}'
+        self.assertEqual(self._sample(after, count) - self._sample(before, count), 2)
+        self.assertIn(f'bookverse_http_request_duration_seconds_bucket{{{route},le="+Inf"}}', after)
+        queries = f'bookverse_db_queries_total{{{route}}}'
+        self.assertGreater(self._sample(after, queries), self._sample(before, queries))
+        self.assertIn('# TYPE bookverse_http_request_duration_seconds histogram', after)
+    
+    def test_checkout_outcomes_and_cache_lookups(self):
+        """Test checkouts are counted by outcome and cache lookups by result"""
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        user = User.objects.create_user(username='buyer', password='pass12345')
+        book = Book.objects.create(title="Checkout Book", author="Test Author", price=10)
+        self.client.force_login(user)
+        success = 'bookverse_checkouts_total{outcome="success"}'
+        missing = 'bookverse_checkouts_total{outcome="missing_address"}'
+        hits = 'bookverse_cache_lookups_total{result="hit"}'
+        before = self._scrape()
+        
+        self.client.post(reverse('book_outlet:add_to_cart', args=[book.id]), {'quantity': 2})
+        self.client.post(reverse('book_outlet:place_order'), {'shipping_address': ''})
+        self.client.post(reverse('book_outlet:place_order'), {'shipping_address': '1 Main St'})
+        cache.set('metrics-test', 1)
+        cache.get('metrics-test')
+        after = self._scrape()
+        
+        self.assertEqual(self._sample(after, success) - self._sample(before, success), 1)
+        self.assertEqual(self._sample(after, missing) - self._sample(before, missing), 1)
+        self.assertGreaterEqual(self._sample(after, hits) - self._sample(before, hits), 1)
+        additions = 'bookverse_cart_additions_total'
+        self.assertEqual(self._sample(after, additions) - self._sample(before, additions), 2)
+    
+    def test_scrape_adds_up_worker_processes(self):
+        """Test a shared METRICS_DIR sums other processes' counters and folds dead processes' files"""
+        import json
+        import os
+        import tempfile
+        from pathlib import Path
+        from . import metrics
+        
+        def snapshot(kind, value):
+            return {
+                'type': kind, 'help': 'Test.', 'labels': ['alias', 'state'] if kind == 'gauge' else ['outcome'],
+                'buckets': [], 'samples': [[['default', 'pool_size'] if kind == 'gauge' else ['success'], value]],
+            }
+        
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            before = self._sample(metrics.render(metrics.collect()), 'bookverse_checkouts_total{outcome="success"}')
+            live_worker, dead_worker = os.getppid(), 2 ** 22 + 1
+            for pid in (live_worker, dead_worker):
+                Path(directory, f'{pid}.json').write_text(json.dumps({
+                    'bookverse_checkouts_total': snapshot('counter', 3),
+                    'bookverse_db_pool_connections': snapshot('gauge', 4),
+                }))
+            Path(directory, 'notes.json').write_text('{}')
+            text = self._scrape()
+            self.assertTrue(Path(directory, f'{os.getpid()}.json').exists())
+            self.assertFalse(Path(directory, f'{dead_worker}.json').exists())
+            again = self._scrape()
+        
+        success = 'bookverse_checkouts_total{outcome="success"}'
+        self.assertEqual(self._sample(text, success) - before, 6)
+        self.assertEqual(self._sample(again, success) - before, 6)
+        self.assertEqual(self._sample(text, 'bookverse_db_pool_connections{alias="default",state="pool_size"}'), 4)
+    
+    def test_token_is_required_when_configured(self):
+        """Test METRICS_TOKEN protects the scrape endpoint"""
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('book_outlet:metrics')).status_code, 401)
+            response = self.client.get(reverse('book_outlet:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+    
+    def test_staff_only_without_token(self):
+        """Test the endpoint is not public when no METRICS_TOKEN is set outside DEBUG"""
+        from django.contrib.auth.models import User
+        self.assertEqual(self.client.get(reverse('book_outlet:metrics')).status_code, 403)
+        self.client.force_login(User.objects.create_user(username='ops', password='pass12345', is_staff=True))
+        self.assertEqual(self.client.get(reverse('book_outlet:metrics')).status_code, 200)
+
+
+# Query Watch Tests
+class QueryWatchTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user(username='watcher', password='pass12345')
+        self.client.force_login(self.user)
+        self.books = [
+            Book.objects.create(title=f"Watched Book {i}", author="Test Author", price=10)
+            for i in range(6)
+        ]
+    
+    def test_fingerprint_ignores_literals_and_in_lists(self):
+        """Test statements differing only in values share a fingerprint"""
+        from .query_watch import fingerprint
+        self.assertEqual(
+            fingerprint("SELECT * FROM book WHERE id = 3 AND title = 'A'"),
+            fingerprint("SELECT *  FROM book WHERE id = 41 AND title = 'B''s'"),
+        )
+        self.assertEqual(fingerprint('WHERE id IN (%s, %s, %s)'), fingerprint('WHERE id IN (%s)'))
+    
+    def test_repeated_queries_are_reported_with_template_line(self):
+        """Test a per-row query in a template is reported with the template and line"""
+        from django.template import Context, Template
+        from .query_watch import NPlusOneError, QueryWatch
+        from .models import CartItem, Cart
+        cart = Cart.objects.create(user=self.user)
+        for book in self.books:
+            CartItem.objects.create(cart=cart, book=book)
+        template = Template("{% for item in items %}\n{{ item.book.title }}{% endfor %}")
+        with self.assertRaises(NPlusOneError) as raised:
+            with QueryWatch(raise_errors=True):
+                template.render(Context({'items': CartItem.objects.filter(cart=cart)}))
+        self.assertIn('6 queries at', str(raised.exception))
+        self.assertIn(':2', str(raised.exception))
+    
+    def test_slow_queries_are_logged(self):
+        """Test statements over the slow threshold are logged with their call site"""
+        from .query_watch import QueryWatch
+        with self.assertLogs('BookOutlet.query_watch', 'WARNING') as logs:
+            with QueryWatch(slow_ms=0):
+                list(Book.objects.all())
+        self.assertIn('BookOutlet/tests.py', logs.output[0])
+    
+    def test_cart_and_order_pages_have_no_n_plus_one(self):
+        """Test the cart, checkout and order list pages query a constant number of times"""
+        from .models import Cart, CartItem
+        from .query_watch import QueryWatch
+        cart = Cart.objects.create(user=self.user)
+        for book in self.books:
+            CartItem.objects.create(cart=cart, book=book)
+        with QueryWatch(raise_errors=True):
+            self.client.get(reverse('book_outlet:cart'))
+            self.client.get(reverse('book_outlet:place_order'))
+        import uuid
+        from .models import Order, OrderItem
+        for book in self.books:
+            order = Order.objects.create(
+                user=self.user, total_amount=10, shipping_address='1 Main St', order_number=uuid.uuid4().hex[:20]
+            )
+            OrderItem.objects.create(order=order, book=book, quantity=1, price=10)
+        with QueryWatch(raise_errors=True):
+            self.client.get(reverse('book_outlet:order_list'))
+
+
+# Startup Tests
+class StartupTest(TestCase):
+    def test_worker_startup_skips_web_modules(self):
+        """Test a task worker boots without importing views, DRF or the search index"""
+        import os
+        import subprocess
+        import sys
+        from django.conf import settings
+        from .management.commands.bench_startup import SCENARIOS, WEB_ONLY_MODULES
+        script = SCENARIOS['worker'] + "; import sys; print(','.join(sorted(sys.modules)))"
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='BookStore.settings')
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        loaded = set(result.stdout.strip().split(','))
+        self.assertIn('BookOutlet.signals', loaded)
+        self.assertFalse(loaded & set(WEB_ONLY_MODULES))
+    
+    def test_signals_are_connected_by_app_config(self):
+        """Test model signals still fire now that they live in BookOutlet.signals"""
+        from django.contrib.auth.models import User
+        from .models import UserProfile
+        user = User.objects.create_user(username='signalled', password='pass12345')
+        self.assertTrue(UserProfile.objects.filter(user=user).exists())
+
+
+# Book Card Cache Tests
+class BookCardCacheTest(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.book = Book.objects.create(title="Cached Card", author="Test Author", price=10, copies_available=3)
+    
+    def test_cards_are_cached_and_follow_book_version(self):
+        """Test a card is rendered once, reused, and re-rendered after the book changes"""
+        from django.core.cache import cache
+        from .templatetags.book_cards import book_cards, card_key
+        template_name = 'book_outlet/includes/book_card.html'
+        [(book, card)] = book_cards([self.book], template_name)
+        self.assertIn('3 in stock', card)
+        self.assertEqual(cache.get(card_key(template_name, self.book)), card)
+        
+        self.book.copies_available = 0
+        self.book.save()
+        [(book, card)] = book_cards([self.book], template_name)
+        self.assertIn('Out of stock', card)
+    
+    def test_save_does_not_lose_concurrent_version_bumps(self):
+        """Test saving a stale instance still moves stock_version past a concurrent sync's bump"""
+        from django.db.models import F
+        stale = Book.objects.get(pk=self.book.pk)
+        Book.objects.filter(pk=self.book.pk).update(stock_version=F('stock_version') + 1)
+        stale.price = 12
+        stale.save()
+        self.assertEqual(stale.stock_version, 2)
+        stale.save(update_fields=['price'])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).stock_version, 3)
+    
+    def test_book_list_keeps_user_specific_parts_uncached(self):
+        """Test the add-to-cart form is rendered per request around cached cards"""
+        from django.contrib.auth.models import User
+        self.client.get(reverse('book_outlet:book_list'))
+        self.assertNotContains(self.client.get(reverse('book_outlet:book_list')), 'Add to Cart')
+        user = User.objects.create_user(username='reader', password='pass12345')
+        self.client.force_login(user)
+        response = self.client.get(reverse('book_outlet:book_list'))
+        self.assertContains(response, 'Cached Card')
+        self.assertContains(response, 'Add to Cart')
+        self.assertContains(response, reverse('book_outlet:book_details', args=[self.book.id]))
+
+
+# React Page Tests
+class ReactBooksPageTest(TestCase):
+    def test_books_are_embedded_and_scripts_are_static(self):
+        """Test the React page embeds the book list as JSON and loads no in-browser compiler"""
+        import json
+        import re
+        book = Book.objects.create(title="Embedded </script> Book", author="Test Author")
+        response = self.client.get(reverse('book_outlet:react_books'))
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        data = re.search(r'<script id="react-books-data" type="application/json">(.*?)</script>', content, re.S)
+        self.assertEqual(json.loads(data.group(1)), [{'id': book.id, 'title': book.title, 'author': 'Test Author'}])
+        self.assertNotIn('babel', content)
+        self.assertNotIn('react.development.js', content)
+        self.assertIn('book_outlet/js/react_books.js', content)
+
+
+# Infinite Scroll Tests
+@override_settings(BOOK_LIST_PAGE_SIZE=2)
+class BookListPageTest(TestCase):
+    def setUp(self):
+        self.books = [Book.objects.create(title=f"Paged Book {n}", author="Test Author") for n in range(5)]
+    
+    def test_first_page_links_to_the_next_fragment(self):
+        """Test the book list renders one page and a sentinel pointing at the fragment endpoint"""
+        response = self.client.get(reverse('book_outlet:book_list'))
+        self.assertEqual([book.title for book in response.context['books']], ["Paged Book 4", "Paged Book 3"])
+        self.assertContains(response, f'data-next-url="{reverse("book_outlet:book_list_page")}?after={self.books[3].id}"')
+        self.assertContains(response, "Browse our collection of 5 books")
+    
+    def test_fragments_walk_the_whole_list(self):
+        """Test following the cursors returns every book once and ends without a sentinel"""
+        import re
+        url, titles = reverse('book_outlet:book_list_page'), []
+        while url:
+            response = self.client.get(url)
+            self.assertNotContains(response, '<html')
+            titles += [book.title for book in response.context['books']]
+            match = re.search(r'data-next-url="([^"]+)"', response.content.decode())
+            url = match.group(1).replace('&amp;', '&') if match else None
+        self.assertEqual(titles, [f"Paged Book {n}" for n in range(4, -1, -1)])
+    
+    def test_fragment_is_one_query(self):
+        """Test a deep page is a single keyset query"""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('book_outlet:book_list_page'), {'after': self.books[2].id})
+    
+    def test_bad_cursor(self):
+        """Test a malformed cursor is a bad request"""
+        response = self.client.get(reverse('book_outlet:book_list_page'), {'after': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+# Throttling Tests
+@override_settings(
+    THROTTLE_ENABLED=True,
+    THROTTLE_RATES={'search': {'anon': '2/min', 'user': '3/min'}, 'api': {'anon': '1/min', 'user': '1/min'}},
+)
+class ThrottlingTest(TestCase):
+    def test_buckets_burst_then_refill(self):
+        """Test both backends allow a burst of the capacity and then one request per refilled token"""
+        from .throttling import DatabaseBuckets, MemoryBuckets
+        for buckets in (DatabaseBuckets(), MemoryBuckets()):
+            take = lambda now: buckets.take('search:ip:1.2.3.4', 2, 2 / 60, now)
+            self.assertEqual(take(1000.0), (1.0, True))
+            self.assertEqual(take(1000.0), (0.0, True))
+            self.assertFalse(take(1000.0)[1])
+            self.assertFalse(take(1015.0)[1])
+            self.assertTrue(take(1031.0)[1])
+            # Idle buckets never grow past their capacity
+            self.assertEqual(take(5000.0), (1.0, True))
+    
+    def test_search_returns_429_with_retry_after(self):
+        """Test an anonymous client gets a 429 with Retry-After once its search bucket is empty"""
+        url = reverse('book_outlet:book_search')
+        first = self.client.get(url)
+        self.assertEqual(first['X-RateLimit-Limit'], '2')
+        self.assertEqual(first['X-RateLimit-Remaining'], '1')
+        self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(response['X-RateLimit-Remaining'], '0')
+        # Other clients have their own buckets
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+    
+    def test_users_are_limited_by_account(self):
+        """Test signed-in users get the user rate, whatever their IP"""
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user(username='searcher', password='pass12345'))
+        url = reverse('book_outlet:book_search')
+        statuses = [self.client.get(url, REMOTE_ADDR=f'10.0.0.{n}').status_code for n in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+    
+    def test_api_throttle(self):
+        """Test the DRF views answer 429 with Retry-After"""
+        self.assertEqual(self.client.get('/api/books/').status_code, 200)
+        response = self.client.get('/api/books/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+    
+    async def test_async_api_takes_one_token(self):
+        """Test a write through the async API view isn't counted again by the DRF view it falls back to"""
+        from django.test import AsyncRequestFactory
+        from django.contrib.auth.models import AnonymousUser
+        from books_api import async_views
+        from .models import ThrottleBucket
+        request = AsyncRequestFactory().post('/api/books/', {}, content_type='application/json')
+        request.user = AnonymousUser()
+        response = await async_views.book_list(request)
+        self.assertEqual(response.status_code, 400)
+        
+        bucket = await ThrottleBucket.objects.aget(key='api:ip:127.0.0.1')
+        self.assertEqual((bucket.tokens, bucket.granted), (0, True))
+    
+    async def test_async_api_limits_basic_auth_users_per_account(self):
+        """Test the async API views throttle HTTP Basic clients by account, not IP"""
+        import base64
+        from asgiref.sync import sync_to_async
+        from django.contrib.auth.models import AnonymousUser, User
+        from django.test import AsyncRequestFactory
+        from books_api import async_views
+        from .models import ThrottleBucket
+        user = await sync_to_async(User.objects.create_user)(username='apiclient', password='pass12345')
+        credentials = base64.b64encode(b'apiclient:pass12345').decode()
+        request = AsyncRequestFactory().get('/api/books/', headers={'Authorization': f'Basic {credentials}'})
+        request.user = AnonymousUser()
+        response = await async_views.book_list(request)
+        self.assertEqual(response.status_code, 200)
+        
+        keys = [key async for key in ThrottleBucket.objects.values_list('key', flat=True)]
+        self.assertEqual(keys, [f'api:user:{user.pk}'])
+    
+    def test_purge_idle_buckets(self):
+        """Test only buckets idle for a whole period are purged"""
+        import time
+        from .models import ThrottleBucket
+        from .throttling import purge_idle_buckets
+        ThrottleBucket.objects.create(key='search:ip:old', tokens=0, updated_at=time.time() - 120)
+        ThrottleBucket.objects.create(key='search:ip:new', tokens=0, updated_at=time.time())
+        self.assertEqual(purge_idle_buckets(), 1)
+        self.assertEqual(list(ThrottleBucket.objects.values_list('key', flat=True)), ['search:ip:new'])
+
+
+# Review Listing Tests
+@override_settings(REVIEWS_PAGE_SIZE=2)
+class ReviewListingTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        from .models import Review
+        cache.clear()
+        self.book = Book.objects.create(title="Reviewed Book", author="Test Author")
+        self.users = [User.objects.create_user(username=f'reader{n}', password='pass12345') for n in range(3)]
+        self.reviews = [
+            Review.objects.create(book=self.book, user=user, rating=4, comment=f"Review by {user.username}")
+            for user in self.users
+        ]
+    
+    def test_pages_newest_first_with_cached_first_page(self):
+        """Test reviews come a page at a time and the first page is served from the cache"""
+        from .reviews import review_page
+        page = review_page(self.book.pk)
+        self.assertEqual([review.user.username for review in page], ['reader2', 'reader1'])
+        self.assertEqual(page.paginator.num_pages, 2)
+        with self.assertNumQueries(0):
+            cached = review_page(self.book.pk)
+            self.assertEqual([review.user.username for review in cached], ['reader2', 'reader1'])
+            self.assertTrue(cached.has_next())
+        self.assertEqual([review.user.username for review in review_page(self.book.pk, number=2)], ['reader0'])
+    
+    def test_saving_and_deleting_reviews_drop_the_cached_page(self):
+        """Test a review change shows up on the cached first page"""
+        from .reviews import review_page
+        review_page(self.book.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reviews[2].delete()
+        self.assertEqual([review.user.username for review in review_page(self.book.pk)], ['reader1', 'reader0'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reviews[0].comment = "Changed my mind"
+            self.reviews[0].save()
+        self.assertEqual(review_page(self.book.pk)[1].comment, "Changed my mind")
+    
+    def test_helpful_votes(self):
+        """Test each user's helpful vote counts once, not for their own review, and reorders the helpful sort"""
+        from .reviews import review_page
+        review_page(self.book.pk, 'helpful')
+        self.client.force_login(self.users[1])
+        url = reverse('book_outlet:mark_review_helpful', args=[self.reviews[0].id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+            self.client.post(url)
+            self.client.post(reverse('book_outlet:mark_review_helpful', args=[self.reviews[1].id]))
+        self.reviews[0].refresh_from_db()
+        self.assertEqual(self.reviews[0].helpful_count, 1)
+        self.assertEqual([review.user.username for review in review_page(self.book.pk, 'helpful')], ['reader0', 'reader2'])
+    
+    def test_detail_page_shows_a_page_of_reviews(self):
+        """Test the detail page lists one page of reviews with their authors and links to the next"""
+        response = self.client.get(reverse('book_outlet:book_details', args=[self.book.pk]), {'reviews_sort': 'bogus'})
+        self.assertContains(response, "Review by reader2")
+        self.assertNotContains(response, "Review by reader0")
+        self.assertContains(response, "Reviews (3)")
+        self.assertContains(response, "?reviews_sort=recent&amp;reviews_page=2#reviews")
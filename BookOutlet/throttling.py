@@ -0,0 +1,221 @@
+"""
+Rate limiting.
+
+Throttled routes are grouped in scopes (``search``, ``api``) and every client
+gets a token bucket per scope: the signed-in user, or the IP address of an
+anonymous request. A rate of ``"60/min"`` lets a client burst up to 60
+requests and then refills one token a second. Every request takes a token;
+a request that finds the bucket empty gets a 429 whose ``Retry-After`` says
+when the next token arrives. ``settings.THROTTLE_RATES`` sets the rates per
+scope, separately for anonymous clients and users.
+
+The buckets live in the store chosen by ``THROTTLE_BACKEND``:
+
+- ``database``: the ThrottleBucket table. Taking a token is a single
+  ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING`` on the bucket's primary
+  key that refills and takes in one atomic step, so all web processes share
+  the limits (RETURNING needs SQLite >= 3.35 or PostgreSQL);
+- ``memory``: a dict in each process, for single-process servers and
+  development.
+
+Either way a request costs one keyed lookup. A bucket that has been idle for
+a whole period is full again, so ``purge_throttle_buckets`` can delete those
+rows from cron without changing any limit.
+
+``@throttle('search')`` limits a sync or async view; DRF views use
+books_api.throttling.TokenBucketThrottle, and the API's async views pass
+``get_user`` so API clients are limited per account like in DRF.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics as store_metrics
+from .models import ThrottleBucket
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+BUCKETS = ThrottleBucket._meta.db_table
+
+# The bucket's tokens after refilling for the time since its last request
+_REFILLED = (
+    f'CASE WHEN {BUCKETS}.tokens + (excluded.updated_at - {BUCKETS}.updated_at) * %(rate)s > %(capacity)s '
+    f'THEN %(capacity)s '
+    f'ELSE {BUCKETS}.tokens + (excluded.updated_at - {BUCKETS}.updated_at) * %(rate)s END'
+)
+
+TAKE_TOKEN = f'''
+    INSERT INTO {BUCKETS} ("key", tokens, updated_at, granted)
+    VALUES (%(key)s, %(capacity)s - 1, %(now)s, TRUE)
+    ON CONFLICT ("key") DO UPDATE SET
+        tokens = CASE WHEN {_REFILLED} >= 1 THEN {_REFILLED} - 1 ELSE {_REFILLED} END,
+        updated_at = excluded.updated_at,
+        granted = {_REFILLED} >= 1
+    RETURNING tokens, granted
+'''
+
+# Buckets kept by each process with the memory backend; the least recently
+# used are dropped beyond this (a dropped bucket starts full again)
+MEMORY_BUCKETS = 100_000
+
+
+def parse_rate(rate):
+    """``"60/min"`` as ``(capacity, tokens per second)``"""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    return count, count / PERIODS[period[0]]
+
+
+class DatabaseBuckets:
+    def take(self, key, capacity, rate, now):
+        """``(tokens left, granted)`` after taking a token from ``key``'s bucket if it has one"""
+        params = {'key': key, 'capacity': float(capacity), 'rate': rate, 'now': now}
+        # Straight to the primary: the router would pin the request's reads to it
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(TAKE_TOKEN, params)
+            tokens, granted = cursor.fetchone()
+        return tokens, bool(granted)
+
+
+class MemoryBuckets:
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(capacity), now]
+                if len(self._buckets) > MEMORY_BUCKETS:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            granted = tokens >= 1
+            if granted:
+                tokens -= 1
+            bucket[:] = [tokens, now]
+        return tokens, granted
+
+
+BACKENDS = {'database': DatabaseBuckets, 'memory': MemoryBuckets}
+_backends = {}
+
+
+def get_backend():
+    name = settings.THROTTLE_BACKEND
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+class Decision:
+    def __init__(self, scope, limit, tokens, rate, granted):
+        self.scope = scope
+        self.limit = limit
+        self.granted = granted
+        self.remaining = max(0, int(tokens))
+        # Seconds until the bucket holds a whole token again
+        self.retry_after = 0 if granted else (1 - tokens) / rate
+
+
+def client_ip(request):
+    """
+    The client's address: ``REMOTE_ADDR``, or behind ``THROTTLE_NUM_PROXIES``
+    reverse proxies the address the outermost of them saw
+    """
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded and settings.THROTTLE_NUM_PROXIES:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(settings.THROTTLE_NUM_PROXIES, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check(request, scope, user=None):
+    """
+    Take a token for the request's client in ``scope``; None if the scope
+    isn't limited. ``user`` replaces ``request.user`` for views that
+    authenticate their clients some other way.
+    """
+    if not settings.THROTTLE_ENABLED:
+        return None
+    if user is None:
+        user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        kind, ident = 'user', f'user:{user.pk}'
+    else:
+        kind, ident = 'anon', f'ip:{client_ip(request)}'
+    rate = settings.THROTTLE_RATES.get(scope, {}).get(kind)
+    if not rate:
+        return None
+
+    capacity, per_second = parse_rate(rate)
+    tokens, granted = get_backend().take(f'{scope}:{ident}', capacity, per_second, time.time())
+    if not granted:
+        store_metrics.THROTTLED.inc(scope=scope)
+    return Decision(scope, capacity, tokens, per_second, granted)
+
+
+def too_many_requests(request, decision):
+    retry_after = math.ceil(decision.retry_after)
+    message = f'Request was throttled. Expected available in {retry_after} seconds.'
+    if 'text/html' in request.headers.get('Accept', ''):
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    else:
+        response = JsonResponse({'detail': message}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return add_rate_limit_headers(response, decision)
+
+
+def add_rate_limit_headers(response, decision):
+    if decision is not None:
+        response['X-RateLimit-Limit'] = str(decision.limit)
+        response['X-RateLimit-Remaining'] = str(decision.remaining)
+    return response
+
+
+def throttle(scope, get_user=None):
+    """
+    Limit a view to the ``scope`` rates of ``THROTTLE_RATES``, per
+    ``get_user(request)`` if given and otherwise per ``request.user``
+    """
+    def take(request):
+        return check(request, scope, get_user(request) if get_user else None)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            async def throttled_view(request, *args, **kwargs):
+                # Finding the user may still need a query, so check off the event loop
+                decision = await sync_to_async(take)(request)
+                if decision is not None and not decision.granted:
+                    return too_many_requests(request, decision)
+                request.throttle_checked = True
+                return add_rate_limit_headers(await view(request, *args, **kwargs), decision)
+            markcoroutinefunction(throttled_view)
+        else:
+            def throttled_view(request, *args, **kwargs):
+                decision = take(request)
+                if decision is not None and not decision.granted:
+                    return too_many_requests(request, decision)
+                request.throttle_checked = True
+                return add_rate_limit_headers(view(request, *args, **kwargs), decision)
+        return wraps(view)(throttled_view)
+    return decorator
+
+
+def purge_idle_buckets():
+    """Delete buckets idle long enough to be full again; returns how many"""
+    longest = max(
+        (PERIODS[rate.partition('/')[2][0]] for rates in settings.THROTTLE_RATES.values() for rate in rates.values()),
+        default=0,
+    )
+    deleted, _ = ThrottleBucket.objects.filter(updated_at__lt=time.time() - longest).delete()
+    return deleted
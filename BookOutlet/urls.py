@@ -1,18 +1,23 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, async_views
 
 app_name = 'book_outlet'
 
+# Hot read paths get their async versions when running under ASGI
+catalog_views = async_views if settings.ASYNC_CATALOG_VIEWS else views
+
 urlpatterns = [
     # Home page - KEEP ONLY ONE
     path("", views.home_view, name="home"),
     
     # Book list views
     path("books/raw/", views.book_list, name="book_list_raw"),
-    path("books/", views.book_list_template, name="book_list"),
-    path("books/<int:pk>/", views.book_detail, name="book_details"),
+    path("books/", catalog_views.book_list_template, name="book_list"),
+    path("books/page/", catalog_views.book_list_page, name="book_list_page"),
+    path("books/<int:pk>/", catalog_views.book_detail, name="book_details"),
     path("cbv/books/", views.BookListView.as_view(), name="cbv_book_list"),
     path("cbv/books/<int:pk>/", views.BookDetailView.as_view(), name="cbv_book_details"),
     
@@ -25,20 +30,25 @@ urlpatterns = [
     
     # Admin view 
     path("admin-submissions/", views.admin_submissions, name="admin_submissions"),
+    path("inventory/report/", views.inventory_report, name="inventory_report"),
+    path("profiling/", views.profiling_report, name="profiling_report"),
+    path("metrics/", views.metrics, name="metrics"),
     
     # React URLs
     path("react-books/", views.react_books_view, name="react_books"),
     
     # API endpoints
-    path("api/books/json/", views.books_api_json, name="books_api_json"),
-    path("api/stats/", views.book_stats_api, name="book_stats_api"),
+    path("api/books/json/", catalog_views.books_api_json, name="books_api_json"),
+    path("api/stats/", catalog_views.book_stats_api, name="book_stats_api"),
     
     # Authentication URLs - USE EITHER THESE OR THE ONES BELOW, NOT BOTH
     path("register/", views.register_view, name="register"),
-    path("search/", views.book_search_view, name="book_search"),
+    path("search/", catalog_views.book_search_view, name="book_search"),
+    path("search/suggest/", views.book_suggest, name="book_suggest"),
     path("profile/", views.profile_view, name="profile"),
     path("book/<int:book_id>/review/", views.add_review, name="add_review"),
     path("review/<int:review_id>/delete/", views.delete_review, name="delete_review"),
+    path("review/<int:review_id>/helpful/", views.mark_review_helpful, name="mark_review_helpful"),
     
     
     # Use Django's built-in auth views instead of your custom ones
@@ -55,6 +65,7 @@ urlpatterns = [
     # Order URLs
     path("order/place/", views.place_order, name="place_order"),
     path("orders/", views.order_list, name="order_list"),
+    path("orders/archive/", views.order_archive, name="order_archive"),
     path("order/<int:order_id>/", views.order_detail, name="order_detail"),
     path("order/<int:order_id>/payment/", views.process_payment, name="process_payment"),
 
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views import View
@@ -8,9 +9,22 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import Paginator
 from django.db.models import Q, Avg
-from .models import Book, UserInfo, UserProfile, Review, Cart, CartItem, Order, OrderItem, User
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from .models import Book, UserInfo, UserProfile, Review, Cart, CartItem, Order, OrderItem, User, ArchivedOrder
 from .forms import BookForm, UserInfoForm, ReviewForm
+from .catalog import search_books, genre_choices, store_stats, book_page_queryset, parse_book_cursor, split_book_page
+from . import search_index
+from .feeds import get_home_feed, request_home_feed
+from .inventory_report import low_stock_alerts, report_summary, top_sellers
+from .profiling import profiling_snapshot
+from .reviews import mark_helpful, review_page, parse_review_sort
+from . import metrics as store_metrics
+from .order_states import InvalidTransition, confirm_payment
+from .tasks import enqueue
+from .throttling import throttle
 import time
 
 # ===== AUTHENTICATION VIEWS =====
@@ -66,13 +80,24 @@ def book_list(request):
     output = ", ".join([str(book) for book in books])
     return HttpResponse(output)
 
+def _book_list_page(request):
+    rows = list(book_page_queryset(parse_book_cursor(request.GET.get('after'))))
+    books, next_cursor = split_book_page(rows)
+    return {"books": books, "next_cursor": next_cursor}
+
 def book_list_template(request):
-    books = Book.objects.all().order_by('-id')
-    return render(request, "book_outlet/book_list.html", {"books": books})
+    context = _book_list_page(request)
+    context["total_books"] = store_stats()['total_books']
+    return render(request, "book_outlet/book_list.html", context)
+
+def book_list_page(request):
+    """The next page of book cards as an HTML fragment, fetched while scrolling"""
+    return render(request, "book_outlet/includes/book_list_page.html", _book_list_page(request))
 
 def book_detail(request, pk):
     book = get_object_or_404(Book, pk=pk)
-    reviews = book.reviews.all().order_by('-created_at')
+    review_sort = parse_review_sort(request.GET.get('reviews_sort'))
+    reviews = review_page(book.pk, review_sort, request.GET.get('reviews_page'))
     user_review = None
     
     if request.user.is_authenticated:
@@ -81,18 +106,22 @@ def book_detail(request, pk):
     return render(request, "book_outlet/book_details.html", {
         "book": book,
         "reviews": reviews,
-        "user_review": user_review
+        "review_sort": review_sort,
+        "user_review": user_review,
+        "recommendations": book.recommendations.select_related('recommended')
     })
 
 class BookListView(View):
     def get(self, request):
-        books = Book.objects.all().order_by('-id')
-        return render(request, "book_outlet/book_list.html", {"books": books})
+        context = _book_list_page(request)
+        context["total_books"] = store_stats()['total_books']
+        return render(request, "book_outlet/book_list.html", context)
 
 class BookDetailView(View):
     def get(self, request, pk):
         book = get_object_or_404(Book, pk=pk)
-        reviews = book.reviews.all().order_by('-created_at')
+        review_sort = parse_review_sort(request.GET.get('reviews_sort'))
+        reviews = review_page(book.pk, review_sort, request.GET.get('reviews_page'))
         user_review = None
         
         if request.user.is_authenticated:
@@ -101,75 +130,26 @@ class BookDetailView(View):
         return render(request, "book_outlet/book_details.html", {
             "book": book,
             "reviews": reviews,
-            "user_review": user_review
+            "review_sort": review_sort,
+            "user_review": user_review,
+            "recommendations": book.recommendations.select_related('recommended')
         })
 
 # ===== ADVANCED SEARCH VIEW =====
+@throttle('search')
 def book_search_view(request):
-    books = Book.objects.all()
-    
-    # Get filter parameters
-    search_query = request.GET.get('q', '')
-    genre_filter = request.GET.get('genre', '')
-    min_price = request.GET.get('min_price', '')
-    max_price = request.GET.get('max_price', '')
-    min_rating = request.GET.get('min_rating', '')
-    sort_by = request.GET.get('sort_by', 'newest')
-    
-    # Apply filters
-    if search_query:
-        books = books.filter(
-            Q(title__icontains=search_query) |
-            Q(author__icontains=search_query)
-        )
-    
-    if genre_filter:
-        books = books.filter(genre__iexact=genre_filter)
-    
-    if min_price:
-        try:
-            books = books.filter(price__gte=float(min_price))
-        except ValueError:
-            pass
-    
-    if max_price:
-        try:
-            books = books.filter(price__lte=float(max_price))
-        except ValueError:
-            pass
-    
-    if min_rating:
-        try:
-            books = books.filter(rating__gte=float(min_rating))
-        except ValueError:
-            pass
-    
-    # Apply sorting
-    if sort_by == 'price_low':
-        books = books.order_by('price')
-    elif sort_by == 'price_high':
-        books = books.order_by('-price')
-    elif sort_by == 'rating':
-        books = books.order_by('-rating')
-    elif sort_by == 'title':
-        books = books.order_by('title')
-    else:  # newest
-        books = books.order_by('-created_at')
+    books, current_filters = search_books(request.GET)
+    # Cards show who added the book
+    books = books.select_related('created_by')
     
     # Get unique genres for filter dropdown
-    genres = Book.objects.exclude(genre__isnull=True).exclude(genre='').values_list('genre', flat=True).distinct()
+    genres = genre_choices()
     
     context = {
         'books': books,
         'genres': genres,
-        'search_query': search_query,
-        'current_filters': {
-            'genre': genre_filter,
-            'min_price': min_price,
-            'max_price': max_price,
-            'min_rating': min_rating,
-            'sort_by': sort_by,
-        }
+        'search_query': request.GET.get('q', ''),
+        'current_filters': current_filters,
     }
     
     return render(request, 'book_outlet/book_search.html', context)
@@ -263,6 +243,13 @@ def delete_review(request, review_id):
     messages.success(request, 'Review deleted successfully!')
     return redirect('book_outlet:book_detail', pk=book_id)
 
+@login_required
+def mark_review_helpful(request, review_id):
+    review = get_object_or_404(Review, id=review_id)
+    if request.method == 'POST' and review.user_id != request.user.id:
+        mark_helpful(review, request.user)
+    return redirect(reverse('book_outlet:book_details', args=[review.book_id]) + '#reviews')
+
 # ===== USER INFO FORM VIEWS =====
 def add_user_info(request):
     if request.method == 'POST':
@@ -322,9 +309,49 @@ def admin_submissions(request):
         'reviews': reviews
     })
 
+def inventory_report(request):
+    """Staff dashboard over the precomputed InventoryReport table"""
+    if not request.user.is_staff:
+        messages.error(request, 'Access denied. Staff permission required.')
+        return redirect(reverse('book_outlet:book_list'))
+    
+    summary = report_summary()
+    refreshed_at = summary['refreshed_at'] if summary else None
+    if refreshed_at is None or (timezone.now() - refreshed_at).total_seconds() > settings.INVENTORY_REPORT_MAX_AGE:
+        enqueue('refresh_inventory_report')
+    
+    return render(request, 'book_outlet/inventory_report.html', {
+        'summary': summary,
+        'alerts': low_stock_alerts(),
+        'top_sellers': top_sellers(),
+        'window_days': settings.INVENTORY_SALES_WINDOW_DAYS,
+    })
+
+def profiling_report(request):
+    """Per-route timings collected by ProfilingMiddleware in this process"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff permission required.'}, status=403)
+    return JsonResponse(profiling_snapshot())
+
+def metrics(request):
+    """Prometheus scrape endpoint (all worker processes when METRICS_DIR is shared)"""
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not constant_time_compare(request.headers.get('Authorization', ''), expected):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    elif not settings.DEBUG and not request.user.is_staff:
+        # Without a token only staff may read route names and traffic outside development
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    return HttpResponse(
+        store_metrics.render(store_metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
 def react_books_view(request):
     """View that combines Django templates with React components"""
-    books = Book.objects.all().order_by('-id')
+    # Plain dicts: the same list is rendered server-side and embedded as JSON
+    # for the React search, which then needs no API round trip
+    books = list(Book.objects.order_by('-id').values('id', 'title', 'author'))
     return render(request, 'book_outlet/react_books.html', {
         'books': books
     })
@@ -373,9 +400,15 @@ def react_books_view(request):
     })'''
 def home_view(request):
     """Home page with dashboard and about us section"""
-    # Get some books for featured sections
-    all_books = Book.objects.all()
-    recent_books = all_books.order_by('-id')[:4]  # 4 most recent books
+    # Signed-in users get their precomputed feed; everyone else the newest books
+    recent_books = None
+    if request.user.is_authenticated:
+        recent_books = get_home_feed(request.user.id)
+        if recent_books is None:
+            request_home_feed(request.user.id)
+    personalized = recent_books is not None
+    if not personalized:
+        recent_books = Book.objects.all().order_by('-id')[:4]  # 4 most recent books
     
     cart_items_count = 0
     if request.user.is_authenticated:
@@ -386,18 +419,32 @@ def home_view(request):
             pass
 
     stats = {
-        'total_books': all_books.count(),
-        'total_reviews': Review.objects.count(),
-        'total_users': User.objects.count(),
+        **store_stats(),
         'cart_items_count': cart_items_count,  
     }
     
     return render(request, 'book_outlet/home.html', {
         'recent_books': recent_books,
+        'personalized': personalized,
         'stats': stats
     })
 
+def book_suggest(request):
+    """Search-as-you-type suggestions, served from the in-memory prefix index"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(int(request.GET.get('limit', 8)), 20)
+    except ValueError:
+        limit = 8
+    
+    results = [
+        {'id': book_id, 'title': title, 'author': author, 'url': reverse('book_outlet:book_details', args=[book_id])}
+        for book_id, title, author in search_index.suggest(query, limit)
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
 # ===== API-LIKE VIEWS FOR REACT COMPONENTS =====
+@throttle('api')
 def books_api_json(request):
     """Simple JSON API for React components"""
     books = Book.objects.all().values('id', 'title', 'author', 'genre', 'price', 'rating')
@@ -405,20 +452,20 @@ def books_api_json(request):
 
 def book_stats_api(request):
     """API endpoint for book statistics"""
-    stats = {
-        'total_books': Book.objects.count(),
-        'total_reviews': Review.objects.count(),
-        'average_rating': Book.objects.exclude(rating__isnull=True).aggregate(Avg('rating'))['rating__avg'] or 0,
-        'featured_books': Book.objects.filter(is_featured=True).count(),
-    }
+    stats = store_stats()
     
-    return JsonResponse(stats)
+    return JsonResponse({
+        'total_books': stats['total_books'],
+        'total_reviews': stats['total_reviews'],
+        'average_rating': stats['average_rating'],
+        'featured_books': stats['featured_books'],
+    })
 
 @login_required
 def cart(request):
     # Get or create cart for the user
     cart, created = Cart.objects.get_or_create(user=request.user)
-    cart_items = CartItem.objects.filter(cart=cart)
+    cart_items = CartItem.objects.filter(cart=cart).select_related('book')
     
     total_price = sum(item.get_total_price() for item in cart_items)
     total_quantity = sum(item.quantity for item in cart_items)
@@ -451,6 +498,7 @@ def add_to_cart(request, book_id):
                 # If item already exists, update quantity
                 cart_item.quantity += quantity
                 cart_item.save()
+            store_metrics.CART_ADDITIONS.inc(quantity)
             
             messages.success(request, f"Added {book.title} to cart!")
             
@@ -495,7 +543,7 @@ def remove_from_cart(request, item_id):
 def view_cart(request):
     try:
         cart = Cart.objects.get(user=request.user)
-        cart_items = cart.items.all()
+        cart_items = cart.items.select_related('book')
         total_price = cart.get_total_price()
         total_quantity = cart.get_total_quantity()  # Add this line
         
@@ -520,9 +568,11 @@ def view_cart(request):
 @login_required
 def place_order(request):
     cart = get_object_or_404(Cart, user=request.user)
-    cart_items = cart.items.all()
+    cart_items = cart.items.select_related('book')
     
     if not cart_items:
+        if request.method == 'POST':
+            store_metrics.CHECKOUTS.inc(outcome='empty_cart')
         messages.error(request, 'Your cart is empty!')
         return redirect('book_outlet:view_cart')
     
@@ -530,6 +580,7 @@ def place_order(request):
         shipping_address = request.POST.get('shipping_address', '')
         
         if not shipping_address:
+            store_metrics.CHECKOUTS.inc(outcome='missing_address')
             messages.error(request, 'Please provide a shipping address!')
             return redirect('book_outlet:checkout')
         
@@ -551,6 +602,7 @@ def place_order(request):
         
         # Clear cart
         cart.items.all().delete()
+        store_metrics.CHECKOUTS.inc(outcome='success')
         
         messages.success(request, f'Order #{order.order_number} placed successfully!')
         return redirect('book_outlet:order_detail', order_id=order.id)
@@ -564,9 +616,25 @@ def place_order(request):
 
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    # Only the hot table; archived history is loaded on demand by order_archive
+    orders = Order.objects.filter(user=request.user).order_by('-created_at').prefetch_related('items__book')
+    has_archived_orders = ArchivedOrder.objects.filter(user=request.user).exists()
     return render(request, 'book_outlet/order_list.html', {
-        'orders': orders
+        'orders': orders,
+        'has_archived_orders': has_archived_orders,
+    })
+
+@login_required
+def order_archive(request):
+    archived_orders = (
+        ArchivedOrder.objects.filter(user=request.user)
+        .order_by('-created_at')
+        .prefetch_related('items')
+    )
+    page = Paginator(archived_orders, 20).get_page(request.GET.get('page'))
+    return render(request, 'book_outlet/order_archive.html', {
+        'page_obj': page,
+        'archived_orders': page.object_list,
     })
 
 @login_required
@@ -580,14 +648,23 @@ def order_detail(request, order_id):
 def process_payment(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
     
-    if order.payment_status:
-        messages.info(request, 'Payment already processed!')
-        return redirect('book_outlet:order_detail', order_id=order.id)
+    # Clients may send their own key; otherwise an order can only be paid once anyway
+    idempotency_key = (
+        request.headers.get('Idempotency-Key')
+        or request.POST.get('idempotency_key')
+        or f'payment:{order.id}'
+    )[:64]
     
     # Simulate payment processing
-    order.payment_status = True
-    order.status = 'confirmed'
-    order.save()
+    try:
+        paid = confirm_payment(order, idempotency_key=idempotency_key)
+    except InvalidTransition:
+        messages.error(request, f'Order #{order.order_number} is {order.get_status_display().lower()} and cannot be paid.')
+        return redirect('book_outlet:order_detail', order_id=order.id)
+    
+    if not paid:
+        messages.info(request, 'Payment already processed!')
+        return redirect('book_outlet:order_detail', order_id=order.id)
     
     messages.success(request, f'Payment successful for Order #{order.order_number}!')
     return redirect('book_outlet:order_detail', order_id=order.id)
@@ -613,7 +690,7 @@ def checkout(request):
         # Get the user's cart
         cart = Cart.objects.get(user=request.user)
         # Get cart items through the cart relationship
-        cart_items = CartItem.objects.filter(cart=cart)
+        cart_items = CartItem.objects.filter(cart=cart).select_related('book')
         
         total_price = sum(item.get_total_price() for item in cart_items)
         
@@ -622,6 +699,7 @@ def checkout(request):
             shipping_address = request.POST.get('shipping_address', '')
             
             if not shipping_address.strip():
+                store_metrics.CHECKOUTS.inc(outcome='missing_address')
                 messages.error(request, "Please provide a shipping address.")
                 return render(request, 'book_outlet/checkout.html', {
                     'cart_items': cart_items,
@@ -647,12 +725,15 @@ def checkout(request):
             
             # Clear the cart after order creation
             cart_items.delete()
+            store_metrics.CHECKOUTS.inc(outcome='success')
             
             messages.success(request, f"Order #{order.order_number} created successfully!")
             return redirect('book_outlet:order_detail', order_id=order.id)
         
     except Cart.DoesNotExist:
         # If user doesn't have a cart yet
+        if request.method == 'POST':
+            store_metrics.CHECKOUTS.inc(outcome='empty_cart')
         cart_items = CartItem.objects.none()
         total_price = 0
         messages.error(request, "Your cart is empty.")
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "BookStore.settings")
+os.environ.setdefault("BOOKVERSE_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
+
+# Build the search suggestion index in each worker before the first keystroke needs it
+from BookOutlet import search_index  # noqa: E402
+
+search_index.preload()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "BookOutlet.routers.PrimaryPinningMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -54,14 +56,52 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Opt-in request profiling (BookOutlet.profiling): a PROFILING_SAMPLE_RATE share
+# of requests gets per-view SQL, template and cache timings, logged as JSON and
+# aggregated per route at /book-outlet/profiling/ for staff
+PROFILING_ENABLED = os.environ.get("BOOKVERSE_PROFILING", "0") == "1"
+PROFILING_SAMPLE_RATE = float(os.environ.get("BOOKVERSE_PROFILING_SAMPLE_RATE", "0.05"))
+PROFILING_TOP_QUERIES = 5
+PROFILING_WINDOW = 1000
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, "BookOutlet.profiling.ProfilingMiddleware")
+
+# Prometheus metrics (BookOutlet.metrics) served at /book-outlet/metrics/.
+# With several worker processes, point METRICS_DIR at a directory they share
+# so a scrape adds up all of them; METRICS_TOKEN, if set, is required as a
+# "Authorization: Bearer <token>" header. Without a token only staff can scrape
+# unless DEBUG is on.
+METRICS_ENABLED = os.environ.get("BOOKVERSE_METRICS", "1") == "1"
+METRICS_DIR = os.environ.get("BOOKVERSE_METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get("BOOKVERSE_METRICS_TOKEN", "")
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, "BookOutlet.metrics.MetricsMiddleware")
+
+# Slow query log and N+1 detector (BookOutlet.query_watch), on by default with
+# DEBUG. Set BOOKVERSE_N_PLUS_ONE_RAISE=1 in CI to turn N+1 reports into errors.
+QUERY_WATCH_ENABLED = os.environ.get("BOOKVERSE_QUERY_WATCH", "1" if DEBUG else "0") == "1"
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("BOOKVERSE_N_PLUS_ONE_THRESHOLD", "5"))
+N_PLUS_ONE_RAISE = os.environ.get("BOOKVERSE_N_PLUS_ONE_RAISE", "0") == "1"
+SLOW_QUERY_MS = float(os.environ.get("BOOKVERSE_SLOW_QUERY_MS", "100"))
+if QUERY_WATCH_ENABLED:
+    MIDDLEWARE.append("BookOutlet.query_watch.QueryWatchMiddleware")
+
 ROOT_URLCONF = "BookStore.urls"
 
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Parse each template once per process (the dev server's autoreloader
+            # clears it when a template changes)
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -73,18 +113,174 @@ TEMPLATES = [
     },
 ]
 
+# Seconds a rendered book card stays cached (BookOutlet/templatetags/book_cards.py);
+# cards are keyed by Book.stock_version, so edits show up immediately anyway
+BOOK_CARD_CACHE_TTL = 3600
+
+# Books per page of the book list; further pages are fetched as HTML fragments
+# while scrolling (BookOutlet.catalog.book_page_queryset)
+BOOK_LIST_PAGE_SIZE = 24
+
 WSGI_APPLICATION = "BookStore.wsgi.application"
 
+# Serve the catalog/API read paths with the async views (BookOutlet.async_views).
+# BookStore/asgi.py switches this on; under WSGI the sync views are faster.
+ASYNC_CATALOG_VIEWS = os.environ.get("BOOKVERSE_ASYNC_VIEWS", "0") == "1"
+
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
-
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+#
+# BOOKVERSE_DB_PROFILE=production keeps connections open between requests and,
+# for SQLite, switches to WAL mode with IMMEDIATE write transactions so
+# concurrent checkouts wait for the write lock instead of failing with
+# "database is locked". Set BOOKVERSE_DB_ENGINE=postgresql to use PostgreSQL.
+
+DB_PROFILE = os.environ.get("BOOKVERSE_DB_PROFILE", "development")
+DB_ENGINE = os.environ.get("BOOKVERSE_DB_ENGINE", "sqlite3")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("BOOKVERSE_DB_NAME", "bookverse"),
+            "USER": os.environ.get("BOOKVERSE_DB_USER", ""),
+            "PASSWORD": os.environ.get("BOOKVERSE_DB_PASSWORD", ""),
+            "HOST": os.environ.get("BOOKVERSE_DB_HOST", ""),
+            "PORT": os.environ.get("BOOKVERSE_DB_PORT", ""),
+        }
     }
-}
+    if DB_PROFILE == "production":
+        if os.environ.get("BOOKVERSE_DB_POOL", "1") == "1":
+            # psycopg 3 connection pool; Django requires CONN_MAX_AGE = 0 with it
+            DATABASES["default"]["OPTIONS"] = {
+                "pool": {
+                    "min_size": int(os.environ.get("BOOKVERSE_DB_POOL_MIN", "2")),
+                    "max_size": int(os.environ.get("BOOKVERSE_DB_POOL_MAX", "10")),
+                    "timeout": 10,
+                },
+            }
+        else:
+            DATABASES["default"]["CONN_MAX_AGE"] = 600
+            DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("BOOKVERSE_DB_PATH", BASE_DIR / "db.sqlite3"),
+        }
+    }
+    if DB_PROFILE == "production":
+        DATABASES["default"].update({
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Run on every new connection
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA mmap_size=134217728;"
+                    "PRAGMA cache_size=-20000;"
+                    "PRAGMA temp_store=MEMORY;"
+                    # Refresh planner statistics (sqlite_stat1) of tables that
+                    # need it, with a bounded ANALYZE; the admin's estimated
+                    # counts read them too. Needs SQLite >= 3.46 (older
+                    # versions skip it: run ANALYZE after bulk loads there)
+                    "PRAGMA analysis_limit=400;"
+                    "PRAGMA optimize=0x10002;"
+                ),
+                "transaction_mode": "IMMEDIATE",
+                # Seconds to wait for the write lock (sqlite busy timeout)
+                "timeout": 20,
+            },
+        })
+
+# Read replicas for catalog queries (see BookOutlet.routers). For SQLite give a
+# comma-separated list of database files, refreshed with `manage.py
+# sync_replicas`; for PostgreSQL give the replica hosts.
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get("BOOKVERSE_DB_REPLICAS", "").split(",")), 1):
+    alias = f"replica{index}"
+    location = {"NAME": replica} if DB_ENGINE == "sqlite3" else {"HOST": replica}
+    DATABASES[alias] = {**DATABASES["default"], **location, "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["BookOutlet.routers.ReplicaRouter"]
+
+# How long a session keeps reading from the primary after it writes
+REPLICA_PIN_SECONDS = 5
+
+# Delivered orders older than this move to the archive tables (archive_orders)
+ORDER_ARCHIVE_AFTER_MONTHS = 12
+
+# "Customers also bought" (build_recommendations): neighbours kept per book,
+# and the rating at which a review counts as a positive signal. Incremental
+# runs never subtract deleted or cancelled orders, so a run rebuilds from
+# scratch once the last full rebuild is this many days old.
+RECOMMENDATIONS_TOP_K = 8
+RECOMMENDATION_MIN_RATING = 4
+RECOMMENDATIONS_FULL_REBUILD_DAYS = 7
+
+# Cache: per-process memory by default; set BOOKVERSE_REDIS_URL so web
+# processes and task workers share one cache.
+if os.environ.get("BOOKVERSE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["BOOKVERSE_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            # Least recently used entries are evicted past this size (configure
+            # Redis with an allkeys-lru maxmemory-policy for the same effect)
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+STORE_STATS_CACHE_TTL = 300
+
+# Reviews per page on the book pages; the first page of each sort order is
+# cached per book and dropped whenever one of its reviews changes (BookOutlet.reviews)
+REVIEWS_PAGE_SIZE = 10
+REVIEW_PAGE_CACHE_TTL = 60 * 60
+
+# How often (seconds) a process checks whether another one changed books
+# and applies those changes to its search suggestion index. The changes are
+# passed through CACHES, so several web processes need the shared Redis
+# cache: with LocMemCache each only sees its own changes.
+SEARCH_INDEX_CHECK_INTERVAL = 5
+
+# Personalised home page feeds (BookOutlet.feeds, build_home_feeds)
+HOME_FEED_SIZE = 4
+HOME_FEED_CACHE_TTL = 6 * 60 * 60
+
+# Inventory analytics (BookOutlet.inventory_report, refresh_inventory_report):
+# sales are counted over the last INVENTORY_SALES_WINDOW_DAYS; a book is low on
+# stock at LOW_STOCK_COPIES copies or fewer, or when it would sell out within
+# LOW_STOCK_DAYS. The dashboard queues a refresh when the report is older than
+# INVENTORY_REPORT_MAX_AGE seconds.
+INVENTORY_SALES_WINDOW_DAYS = 30
+LOW_STOCK_COPIES = 5
+LOW_STOCK_DAYS = 14
+INVENTORY_REPORT_MAX_AGE = 15 * 60
+
+# Admin changelists for very large tables: estimated counts, deferred-join
+# pagination, prefix searches and no date drill-down (BookOutlet.admin_performance)
+ADMIN_PERFORMANCE_MODE = os.environ.get("BOOKVERSE_ADMIN_PERFORMANCE_MODE", "0") == "1"
+
+
+# Background tasks (BookOutlet.tasks, run with `manage.py run_task_worker`)
+TASKS_RUN_EAGERLY = os.environ.get("BOOKVERSE_TASKS_EAGER", "0") == "1"
+# Seconds before the first retry; doubles on every further attempt
+TASK_RETRY_DELAY = 30
+# Running tasks locked longer than this are assumed lost and requeued
+TASK_LOCK_TIMEOUT = 600
+
+EMAIL_BACKEND = os.environ.get("BOOKVERSE_EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+DEFAULT_FROM_EMAIL = "BookVerse <orders@bookverse.local>"
 
 
 # Password validation
@@ -133,8 +329,6 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # For development
-
-import os
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'BookOutlet/static'),
 ]
@@ -142,10 +336,27 @@ STATICFILES_DIRS = [
 # For production (when you run collectstatic)
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Outside DEBUG, collectstatic writes content-hashed copies (main.3f2a9c.js) and
+# {% static %} links to them, so browsers can cache static files indefinitely
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+            else "django.contrib.staticfiles.storage.ManifestStaticFilesStorage"
+        ),
+    },
+}
+
 # Media files (if you want to upload images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Cover thumbnails generated by BookOutlet.covers (see build_cover_variants)
+COVER_SOURCE_DIR = os.path.join(BASE_DIR, 'BookOutlet/static/book_outlet/images/book_covers')
+COVER_VARIANTS_DIR = os.path.join(MEDIA_ROOT, 'covers')
+COVER_VARIANTS_URL = MEDIA_URL + 'covers/'
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -156,8 +367,39 @@ CORS_ALLOWED_ORIGINS = [
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # Views pick their THROTTLE_RATES scope with throttle_scope ("api" by default)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'books_api.throttling.TokenBucketThrottle',
+    ],
+}
+
+# Token-bucket rate limits (BookOutlet.throttling) per scope for anonymous
+# clients (by IP) and signed-in users, as "requests/period": a client may burst
+# up to the count, then gets count/period requests a second
+THROTTLE_ENABLED = os.environ.get("BOOKVERSE_THROTTLE", "1") == "1"
+THROTTLE_RATES = {
+    'search': {'anon': '30/min', 'user': '120/min'},
+    'api': {'anon': '60/min', 'user': '300/min'},
 }
+# "database" shares the buckets between processes; "memory" keeps them per process
+THROTTLE_BACKEND = os.environ.get("BOOKVERSE_THROTTLE_BACKEND", "database")
+# Reverse proxies in front of the app; the client IP is read from X-Forwarded-For
+THROTTLE_NUM_PROXIES = int(os.environ.get("BOOKVERSE_NUM_PROXIES", "0"))
 # Add these lines at the bottom of settings.py
 LOGIN_REDIRECT_URL = '/book-outlet/'  # Redirect to home after login
-LOGOUT_REDIRECT_URL = '/book-outlet/'  # Redirect to home after logout
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/book-outlet/'  # Redirect to home after logout
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        # One JSON object per profiled request
+        "BookOutlet.profiling": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        # Slow queries and N+1 reports
+        "BookOutlet.query_watch": {"handlers": ["console"], "level": "WARNING", "propagate": False},
+    },
+}
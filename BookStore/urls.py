@@ -1,4 +1,6 @@
 # BookStore/urls.py
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
@@ -11,4 +13,7 @@ urlpatterns = [
     # Authentication URLs
     path('accounts/login/', auth_views.LoginView.as_view(template_name='book_outlet/login.html'), name='login'),
     path('accounts/logout/', auth_views.LogoutView.as_view(next_page='/book-outlet/'), name='logout'),
-]
\ No newline at end of file
+]
+
+# Serve uploaded media and generated cover thumbnails in development
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "BookStore.settings")
 
 application = get_wsgi_application()
+
+# Build the search suggestion index in each worker before the first keystroke needs it
+from BookOutlet import search_index  # noqa: E402
+
+search_index.preload()
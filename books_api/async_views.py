@@ -0,0 +1,48 @@
+# books_api/async_views.py
+"""
+Async GET paths for the book API, used when settings.ASYNC_CATALOG_VIEWS is on.
+
+DRF views are synchronous, so reads are served here with the async ORM and
+BookSerializer; writes and the browsable API fall through to the DRF views.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from BookOutlet.catalog import filter_api_books
+from BookOutlet.models import Book
+from BookOutlet.throttling import throttle
+from . import views
+from .serializers import BookSerializer
+from .throttling import api_user
+
+
+def _wants_browsable_api(request):
+    return 'text/html' in request.headers.get('Accept', '')
+
+
+@csrf_exempt
+@throttle('api', get_user=api_user)
+async def book_list(request):
+    if request.method != 'GET' or _wants_browsable_api(request):
+        return await sync_to_async(views.book_list)(request)
+
+    try:
+        # Picking the ISBN or text path runs a sync EXISTS query
+        books = await sync_to_async(filter_api_books)(request.GET)
+    except ValueError as e:
+        return JsonResponse({'isbn': [str(e)]}, status=400)
+    books = [book async for book in books]
+    serializer = BookSerializer(books, many=True)
+    return JsonResponse(serializer.data, safe=False)
+
+
+@csrf_exempt
+@throttle('api', get_user=api_user)
+async def book_detail(request, pk):
+    if request.method != 'GET' or _wants_browsable_api(request):
+        return await sync_to_async(views.book_detail)(request, pk)
+
+    book = await Book.objects.filter(pk=pk).afirst()
+    if book is None:
+        return HttpResponse(status=404)
+    return JsonResponse(BookSerializer(book).data)
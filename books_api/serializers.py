@@ -1,8 +1,67 @@
 # books_api/serializers.py
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
+from BookOutlet.isbn import normalize_isbn
 from BookOutlet.models import Book  # assuming you have Book model
 
 class BookSerializer(serializers.ModelSerializer):
+    isbn = serializers.CharField(max_length=17, required=False, allow_null=True, allow_blank=True)
+
     class Meta:
         model = Book
-        fields = ['id', 'title', 'author']
\ No newline at end of file
+        fields = ['id', 'title', 'author', 'isbn']
+
+    def validate_isbn(self, value):
+        if not value:
+            return None
+        try:
+            isbn = normalize_isbn(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        duplicates = Book.objects.filter(isbn=isbn)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError('A book with this ISBN already exists.')
+        return isbn
+
+
+class StockChangeSerializer(serializers.Serializer):
+    book = serializers.IntegerField()
+    set = serializers.IntegerField(required=False, min_value=0)
+    delta = serializers.IntegerField(required=False)
+    version = serializers.IntegerField(required=False, min_value=0)
+
+    def validate(self, data):
+        if ('set' in data) == ('delta' in data):
+            raise serializers.ValidationError('Give exactly one of "set" or "delta".')
+        return data
+
+
+class BulkInventorySerializer(serializers.Serializer):
+    changes = StockChangeSerializer(many=True, allow_empty=False)
+    source = serializers.ChoiceField(choices=['api', 'sync'], default='api')
+    reason = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+
+
+class SalesRollupQuerySerializer(serializers.Serializer):
+    granularity = serializers.ChoiceField(choices=['day', 'hour'], default='day')
+    dimension = serializers.ChoiceField(choices=['total', 'genre', 'author', 'book'], default='total')
+    key = serializers.CharField(required=False, allow_blank=True)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    # Hourly ranges are capped so a response stays small
+    MAX_HOURLY_RANGE = timedelta(days=31)
+
+    def validate(self, data):
+        data.setdefault('end', timezone.now())
+        data.setdefault('start', data['end'] - timedelta(days=30))
+        if data['start'] >= data['end']:
+            raise serializers.ValidationError('start must be before end.')
+        if data['granularity'] == 'hour' and data['end'] - data['start'] > self.MAX_HOURLY_RANGE:
+            raise serializers.ValidationError('Hourly ranges can span at most 31 days.')
+        return data
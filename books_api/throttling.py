@@ -0,0 +1,31 @@
+# books_api/throttling.py
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from BookOutlet.throttling import check
+
+
+def api_user(request):
+    """The user DRF's authentication classes find for a plain Django request"""
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        return Request(request, authenticators=authenticators).user
+    except APIException:
+        # Bad credentials count against the client's IP; the DRF view rejects them
+        return AnonymousUser()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """BookOutlet.throttling limits for DRF views, in the view's ``throttle_scope`` (``api`` by default)"""
+
+    def allow_request(self, request, view):
+        # The async GET views fall back to these views after taking their token
+        if getattr(request._request, 'throttle_checked', False):
+            return True
+        self.decision = check(request, getattr(view, 'throttle_scope', 'api'))
+        return self.decision is None or self.decision.granted
+
+    def wait(self):
+        return self.decision.retry_after
@@ -1,8 +1,13 @@
 # books_api/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+book_views = async_views if settings.ASYNC_CATALOG_VIEWS else views
 
 urlpatterns = [
-    path('books/', views.book_list, name='book_list'),
-    path('books/<int:pk>/', views.book_detail, name='book_detail'),
+    path('books/', book_views.book_list, name='book_list'),
+    path('books/<int:pk>/', book_views.book_detail, name='book_detail'),
+    path('inventory/bulk/', views.inventory_bulk, name='inventory_bulk'),
+    path('sales/rollups/', views.sales_rollups, name='sales_rollups'),
 ]
\ No newline at end of file
@@ -1,14 +1,21 @@
 # books_api/views.py
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from BookOutlet.catalog import filter_api_books
+from BookOutlet.inventory import apply_stock_changes
 from BookOutlet.models import Book
-from .serializers import BookSerializer
+from BookOutlet.sales_rollups import rollup_series, top_keys
+from .serializers import BookSerializer, BulkInventorySerializer, SalesRollupQuerySerializer
 
 @api_view(['GET', 'POST'])
 def book_list(request):
     if request.method == 'GET':
-        books = Book.objects.all().order_by('-id')
+        try:
+            books = filter_api_books(request.query_params)
+        except ValueError as e:
+            return Response({'isbn': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
         serializer = BookSerializer(books, many=True)
         return Response(serializer.data)
 
@@ -39,4 +46,45 @@ def book_detail(request, pk):
 
     elif request.method == 'DELETE':
         book.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def inventory_bulk(request):
+    """Set or adjust stock for many books at once; stale versions are reported as conflicts"""
+    serializer = BulkInventorySerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    result = apply_stock_changes(
+        serializer.validated_data['changes'],
+        source=serializer.validated_data['source'],
+        user=request.user,
+        reason=serializer.validated_data['reason'],
+    )
+    return Response(result)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def sales_rollups(request):
+    """
+    Sales figures from the rollup tables. With a ``key`` (or for the
+    'total' dimension) returns a per-bucket series; otherwise the top keys
+    of the dimension over the range.
+    """
+    serializer = SalesRollupQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    query = serializer.validated_data
+    span = (query['granularity'], query['dimension'], query['start'], query['end'])
+    response = {
+        'granularity': query['granularity'],
+        'dimension': query['dimension'],
+        'start': query['start'],
+        'end': query['end'],
+    }
+    if query['dimension'] == 'total' or 'key' in query:
+        response['key'] = query.get('key', '')
+        response['series'] = rollup_series(*span, key=response['key'])
+    else:
+        response['top'] = top_keys(*span, limit=query['limit'])
+    return Response(response)